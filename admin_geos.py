@@ -0,0 +1,106 @@
+import os
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from constants import AREA_CRS
+from detroit_geos import get_detroit_census_geos
+from scipy import sparse
+
+from crosswalk import BlockCrosswalk
+from util_detroit import kml_to_gpd
+
+# City administrative grains: the kml file (without extension, within data_path) and the column identifying each geo.
+# Council districts are dissolved from the neighborhood polygons, which carry their district.
+ADMIN_GEO_SOURCES = {
+    "neighborhood": {"filename": "Current_City_of_Detroit_Neighborhoods", "id_column": "nhood_num"},
+    "council district": {"filename": "Current_City_of_Detroit_Neighborhoods", "id_column": "council_district"},
+    "precinct": {"filename": "DPD_Precincts", "id_column": "precinct"},
+}
+
+
+def is_admin_grain(target_geo_grain: str) -> bool:
+    return target_geo_grain in ADMIN_GEO_SOURCES
+
+
+def get_admin_geos(target_geo_grain: str, data_path: Optional[str] = ".") -> gpd.GeoDataFrame:
+    """Polygons of a city administrative grain, one row per geo with a float geo_id, sorted by geo_id"""
+    if not is_admin_grain(target_geo_grain):
+        raise ValueError(f"target_geo_grain must be one of {tuple(ADMIN_GEO_SOURCES)}")
+    source = ADMIN_GEO_SOURCES[target_geo_grain]
+    geos = kml_to_gpd(os.path.join(data_path, source["filename"]))
+    return (
+        geos.loc[:, [source["id_column"], "geometry"]]
+        .rename(columns={source["id_column"]: "geo_id"})
+        .astype({"geo_id": float})
+        .dissolve(by="geo_id")
+        .reset_index()
+        .sort_values("geo_id")
+        .reset_index(drop=True)
+    )
+
+
+def point_to_admin_id(
+    geometry: gpd.GeoSeries, target_geo_grain: str, data_path: Optional[str] = "."
+) -> pd.Series:
+    """Administrative geo id of the polygon each point falls in, indexed like geometry
+
+    Points on a border get the smaller of the geo ids, points outside every polygon get NaN.
+    """
+    admin_geos = get_admin_geos(target_geo_grain, data_path)
+    points = gpd.GeoDataFrame(
+        {"point_position": np.arange(len(geometry))},
+        geometry=geometry.to_crs(admin_geos.crs).to_numpy(),
+        crs=admin_geos.crs,
+    )
+    joined = gpd.sjoin(points, admin_geos, how="left", predicate="intersects")
+    joined = joined.sort_values(["point_position", "geo_id"], kind="stable").drop_duplicates("point_position")
+    return pd.Series(joined.geo_id.to_numpy(dtype=float), index=geometry.index, name="geo_id")
+
+
+def build_block_assignment(
+    target_geo_grain: str, decennial_census_year: int, data_path: Optional[str] = "."
+) -> BlockCrosswalk:
+    """Area-weighted assignment of census blocks to administrative geos
+
+    Blocks that straddle a border are split by the share of their area on each side. Blocks outside every
+    administrative geo are left out. Rolling block counts up with it assumes events spread evenly over each block,
+    so counts come out fractional. Features with point geometries are binned with point_to_admin_id() instead.
+    """
+    blocks = get_detroit_census_geos(decennial_census_year, data_path).to_crs(AREA_CRS)
+    admin_geos = get_admin_geos(target_geo_grain, data_path).to_crs(AREA_CRS)
+    pieces = gpd.overlay(
+        blocks.loc[:, ["geo_id", "geometry"]].rename(columns={"geo_id": "from_id"}),
+        admin_geos.rename(columns={"geo_id": "to_id"}),
+        how="intersection",
+        keep_geom_type=True,
+    )
+    block_ids = blocks.geo_id.to_numpy(dtype=float)
+    admin_ids = admin_geos.geo_id.to_numpy(dtype=float)
+    overlap = sparse.csr_matrix(
+        (
+            pieces.geometry.area.to_numpy(),
+            (pd.Index(admin_ids).get_indexer(pieces.to_id), pd.Index(block_ids).get_indexer(pieces.from_id)),
+        ),
+        shape=(len(admin_ids), len(block_ids)),
+    )
+    return BlockCrosswalk(
+        overlap, block_ids, admin_ids, decennial_census_year, decennial_census_year, "area", target_geo_grain
+    )
+
+
+def get_block_assignment(
+    target_geo_grain: str,
+    decennial_census_year: int,
+    data_path: Optional[str] = ".",
+    cache_path: Optional[str] = "cache",
+) -> BlockCrosswalk:
+    """Loads the block assignment from cache_path, building and caching it on first use"""
+    fn = f"{cache_path.rstrip('/')}/assignment_{decennial_census_year}_{target_geo_grain.replace(' ', '_')}.npz"
+    if os.path.isfile(fn):
+        return BlockCrosswalk.load(fn)
+    assignment = build_block_assignment(target_geo_grain, decennial_census_year, data_path)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    assignment.save(fn)
+    return assignment
@@ -0,0 +1,130 @@
+"""A classification raster of census blocks, so most points are geolocated by array indexing
+
+Each cell of a fine raster over the blocks holds the position of the block that contains the whole cell, OUTSIDE if
+the cell is in no block, or BOUNDARY if a block edge runs through it or next to it. Only points in BOUNDARY cells need
+an exact point-in-polygon test.
+
+Built without rasterizing polygons one by one:
+    1. every block edge is sampled at under half a cell, and the cells of the samples (dilated by one) are BOUNDARY
+    2. the remaining cells split into connected components with scipy.ndimage.label. No component crosses an edge, so
+       all its cells are in the same block (or none), and one exact test of one cell center per component labels it
+
+Cell sizes are in the units of the blocks' crs. For geographic crs, the resolution in meters is converted at the
+raster's center latitude.
+
+    raster = get_block_raster(2010)
+    positions = raster.classify(x, y)  # BOUNDARY cells still need GeometryStore.locate
+"""
+import json
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from geometry_store import GeometryStore, get_geometry_store
+
+OUTSIDE = -1
+BOUNDARY = -2
+METERS_PER_DEGREE = 111_320.0
+
+
+class BlockRaster:
+    """Block position (or OUTSIDE / BOUNDARY) per cell of a raster with origin (x0, y0) and cell size (dx, dy)"""
+
+    def __init__(self, cells: np.ndarray, x0: float, y0: float, dx: float, dy: float) -> None:
+        self.cells = cells
+        self.x0, self.y0, self.dx, self.dy = x0, y0, dx, dy
+
+    def __repr__(self) -> str:
+        share = np.mean(self.cells == BOUNDARY)
+        return f"BlockRaster {self.cells.shape[1]} x {self.cells.shape[0]} cells, {share:.1%} boundary"
+
+    def cell_index(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row, column, inside) of each point's cell, inside is False off the raster"""
+        col = np.floor((np.asarray(x, dtype=float) - self.x0) / self.dx)
+        row = np.floor((np.asarray(y, dtype=float) - self.y0) / self.dy)
+        inside = (col >= 0) & (col < self.cells.shape[1]) & (row >= 0) & (row < self.cells.shape[0])
+        return np.where(inside, row, 0).astype(np.int64), np.where(inside, col, 0).astype(np.int64), inside
+
+    def classify(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Block position of each point, OUTSIDE, or BOUNDARY for points that need an exact test"""
+        row, col, inside = self.cell_index(x, y)
+        return np.where(inside, self.cells[row, col], OUTSIDE)
+
+    def save(self, fn: str) -> None:
+        """cells as .npy, so load() can memory-map them, with the raster geometry in a json next to it"""
+        np.save(fn + ".npy", self.cells)
+        with open(fn + ".json", "wt") as f:
+            json.dump({"x0": self.x0, "y0": self.y0, "dx": self.dx, "dy": self.dy}, f)
+
+    @classmethod
+    def load(cls, fn: str) -> "BlockRaster":
+        with open(fn + ".json", "rt") as f:
+            geometry = json.load(f)
+        return cls(np.load(fn + ".npy", mmap_mode="r"), **geometry)
+
+
+def build_block_raster(
+    store: GeometryStore, resolution: float = 5.0, is_geographic: Optional[bool] = None
+) -> BlockRaster:
+    """Raster of the geos in store with cells of about resolution meters
+
+    is_geographic defaults to whether the store's crs is in degrees
+    """
+    import shapely
+    from scipy import ndimage
+
+    if is_geographic is None:
+        is_geographic = store.crs is not None and _is_geographic(store.crs)
+    bounds = np.asarray(store.bounds)
+    xmin, ymin = bounds[:, 0].min(), bounds[:, 1].min()
+    xmax, ymax = bounds[:, 2].max(), bounds[:, 3].max()
+    if is_geographic:
+        dy = resolution / METERS_PER_DEGREE
+        dx = dy / np.cos(np.radians((ymin + ymax) / 2))
+    else:
+        dx = dy = resolution
+    # one cell of margin, so no block touches the raster's edge
+    x0, y0 = xmin - dx, ymin - dy
+    shape = (int(np.ceil((ymax - y0) / dy)) + 2, int(np.ceil((xmax - x0) / dx)) + 2)
+    raster = BlockRaster(np.zeros(shape, dtype=np.int32), x0, y0, dx, dy)
+
+    boundary = np.zeros(shape, dtype=bool)
+    edges = shapely.segmentize(shapely.boundary(store.geometries()), min(dx, dy) / 2)
+    row, col, _ = raster.cell_index(*shapely.get_coordinates(edges).T)
+    boundary[row, col] = True
+    boundary = ndimage.binary_dilation(boundary, structure=np.ones((3, 3), dtype=bool))
+
+    components, n_components = ndimage.label(~boundary)
+    # one cell center per component: the first cell of each label in raster order
+    labels, first = np.unique(components.ravel(), return_index=True)
+    first, labels = first[labels > 0], labels[labels > 0]
+    rows, cols = np.unravel_index(first, shape)
+    centers = np.column_stack([x0 + (cols + 0.5) * dx, y0 + (rows + 0.5) * dy])
+    component_block = np.full(n_components + 1, BOUNDARY, dtype=np.int32)
+    component_block[labels] = store.locate(centers)
+    raster.cells[:] = component_block[components]
+    return raster
+
+
+def get_block_raster(
+    decennial_census_year: int,
+    data_path: Optional[str] = ".",
+    cache_path: Optional[str] = "cache",
+    resolution: float = 5.0,
+) -> BlockRaster:
+    """Loads the block raster of a census year from cache_path, building and caching it on first use"""
+    fn = f"{cache_path.rstrip('/')}/block_raster_{decennial_census_year}_{resolution:g}m"
+    if os.path.isfile(fn + ".json"):
+        return BlockRaster.load(fn)
+    store = get_geometry_store(decennial_census_year, "block", data_path, cache_path)
+    raster = build_block_raster(store, resolution)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    raster.save(fn)
+    return raster
+
+
+def _is_geographic(crs: str) -> bool:
+    from pyproj import CRS
+
+    return CRS.from_user_input(crs).is_geographic
@@ -0,0 +1,134 @@
+"""Counts of events within several radii of many locations over several time windows, in one neighbor query
+
+For each location (Green Light camera, liquor license, bus stop) and each event (911 call) within the largest radius,
+one dual tree query (KDTree.sparse_distance_matrix) returns the pair and its distance. Everything after that is
+vectorized over the pairs:
+    radius -- each pair counts for the smallest radius that reaches it, and a cumulative sum over radii makes the
+        counts "within r" for every r
+    window -- the event time relative to the location's reference time (e.g. its live_date) falls in any of the
+        windows, which may overlap
+
+    counts = buffer_counts(greenlights, calls, radii=(50, 100, 250, 500), windows=[(-365, 0), (0, 365)],
+                           location_time_column="live_date", event_time_column="call_timestamp")
+    counts.loc[:, (100, "0 to 365 days")]
+"""
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def buffer_count_tensor(
+    location_xy: np.ndarray,
+    event_xy: np.ndarray,
+    radii: Sequence[float],
+    event_times: Optional[np.ndarray] = None,
+    windows: Sequence[Tuple[float, float]] = (),
+    reference_times: Optional[np.ndarray] = None,
+    after_reference: bool = False,
+) -> np.ndarray:
+    """Counts of shape (locations, radii, windows), or (locations, radii, 1) without windows
+
+    Arguments:
+        location_xy, event_xy -- (n, 2) coordinates in meters
+        radii -- increasing distances in meters
+        event_times -- event times in days (any origin), required for windows or after_reference
+        windows -- [start, end) intervals in days. Relative to each location's reference time if reference_times is
+            given, so (-365, 0) is the year before it, otherwise on the event_times scale
+        reference_times -- each location's reference time in days, e.g. its live_date. NaN drops the location's
+            events from relative windows
+        after_reference -- only count events at or after each location's reference time
+
+    Events without finite coordinates are never counted, locations without them get zero counts.
+    """
+    radii = np.asarray(radii, dtype=float)
+    if len(radii) == 0 or np.any(np.diff(radii) <= 0):
+        raise ValueError("radii must be increasing")
+    if (len(windows) or after_reference) and event_times is None:
+        raise ValueError("event_times are required for windows and after_reference")
+    if after_reference and reference_times is None:
+        raise ValueError("reference_times are required for after_reference")
+    from scipy.spatial import KDTree
+
+    n_windows = max(len(windows), 1)
+    counts = np.zeros((len(location_xy), len(radii), n_windows), dtype=np.int64)
+    # the trees reject NaN coordinates, e.g. calls geolocated by block_id that have no lat/long
+    location_xy, event_xy = np.asarray(location_xy, dtype=float), np.asarray(event_xy, dtype=float)
+    finite_locations = np.flatnonzero(np.isfinite(location_xy).all(axis=1))
+    finite_events = np.flatnonzero(np.isfinite(event_xy).all(axis=1))
+    if len(finite_locations) == 0 or len(finite_events) == 0:
+        return counts
+    pairs = KDTree(location_xy[finite_locations]).sparse_distance_matrix(
+        KDTree(event_xy[finite_events]), radii[-1], output_type="ndarray"
+    )
+    location, event, distance = finite_locations[pairs["i"]], finite_events[pairs["j"]], pairs["v"]
+    radius = np.searchsorted(radii, distance, side="left")
+
+    if event_times is not None:
+        times = np.asarray(event_times, dtype=float)[event]
+        if reference_times is not None:
+            times = times - np.asarray(reference_times, dtype=float)[location]
+        if after_reference:
+            keep = times >= 0
+            location, radius, times = location[keep], radius[keep], times[keep]
+    for k in range(n_windows):
+        if len(windows):
+            start, end = windows[k]
+            in_window = (times >= start) & (times < end)
+            np.add.at(counts[:, :, k], (location[in_window], radius[in_window]), 1)
+        else:
+            np.add.at(counts[:, :, k], (location, radius), 1)
+    # pairs counted at their smallest radius, so within r is everything up to r
+    return np.cumsum(counts, axis=1)
+
+
+def local_xy(geometry: "gpd.GeoSeries") -> np.ndarray:
+    """Point coordinates in meters: projected crs as they are, lon/lat by an equirectangular projection at the mean
+    latitude, accurate to well under 0.1% across the city (web mercator would stretch distances by about a third)
+    """
+    x, y = geometry.x.to_numpy(dtype=float), geometry.y.to_numpy(dtype=float)
+    if geometry.crs is not None and not geometry.crs.is_geographic:
+        return np.column_stack([x, y])
+    lat0 = np.radians(np.nanmean(y))
+    return np.column_stack([EARTH_RADIUS_M * np.radians(x) * np.cos(lat0), EARTH_RADIUS_M * np.radians(y)])
+
+
+def buffer_counts(
+    locations: "gpd.GeoDataFrame",
+    events: "gpd.GeoDataFrame",
+    radii: Sequence[float] = (50, 100, 250, 500),
+    windows: Sequence[Tuple[float, float]] = (),
+    location_time_column: Optional[str] = None,
+    event_time_column: Optional[str] = None,
+    after_reference: bool = False,
+) -> pd.DataFrame:
+    """Event counts around each location, indexed like locations with (radius, window) columns
+
+    Windows are in days relative to locations[location_time_column] (e.g. "live_date"), or calendar days since
+    1970-01-01 without it. after_reference only counts events on or after each location's time. Events and locations
+    are put in the same crs as locations before measuring distances.
+    """
+    if events.crs is not None and locations.crs is not None and not events.crs.equals(locations.crs):
+        events = events.to_crs(locations.crs)
+    xy = local_xy(pd.concat([locations.geometry, events.geometry]))
+    location_xy, event_xy = xy[: len(locations)], xy[len(locations) :]
+
+    event_times = None if event_time_column is None else _days(events[event_time_column])
+    reference_times = None if location_time_column is None else _days(locations[location_time_column])
+    tensor = buffer_count_tensor(
+        location_xy, event_xy, radii, event_times, windows, reference_times, after_reference
+    )
+    window_labels = [f"{start:g} to {end:g} days" for start, end in windows] or ["all"]
+    columns = pd.MultiIndex.from_product([list(radii), window_labels], names=["radius", "window"])
+    return pd.DataFrame(tensor.reshape(len(locations), -1), index=locations.index, columns=columns)
+
+
+def _days(times: pd.Series) -> np.ndarray:
+    """Days since 1970-01-01 as floats, NaN for missing times"""
+    times = pd.to_datetime(times, errors="coerce", utc=True).dt.tz_localize(None)
+    return ((times - pd.Timestamp(0)) / pd.Timedelta(days=1)).to_numpy(dtype=float, na_value=np.nan)
@@ -1,5 +1,11 @@
 GEO_GRAIN_LEN_MAP = {"block": 15, "lat/long": 15, "block group": 12, "tract": 11}
 
+# Projection in ground meters used for areas and distances: UTM zone 17N, see https://epsg.io/26917
+# (web mercator units are ~1.35x shorter than meters at Detroit's latitude, so it's not used for measuring)
+AREA_CRS = "EPSG:26917"
+# (x_min, y_min, x_max, y_max) in AREA_CRS covered by grid grains: Detroit plus ~10km on every side
+GRID_BOUNDS = (300_000, 4_670_000, 355_000, 4_715_000)
+
 # Go from code-friendly to human-friendly
 # Obviously not comprehensive, but add to this as needed.
 COLNAME_MAP = {
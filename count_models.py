@@ -0,0 +1,251 @@
+"""Poisson and NB2 regressions of event counts with a log-exposure offset, fitted by batched IRLS
+
+Counts like violence_calls are modeled directly instead of as rates:
+    log E[count] = log(population * years) + X b
+so the exposure enters as an offset rather than a hard-coded divisor, and coefficients are log rate ratios per
+person-year.
+
+Every outcome column sharing a design matrix is fitted at once. Each IRLS step needs the weighted Gram matrix X'WX of
+every outcome, which is one product of the weights with the row-wise outer products of X, and one stacked solve.
+NB2 alternates those steps with Newton steps on each outcome's dispersion. Different designs (formulas, grains) run on
+a thread pool with fit_many, BLAS releases the GIL.
+
+    Y, X, offset, names = count_design(df, feat_df.loc[:, ["violence_calls", "rms_crime"]], feat_df.population, 4.5)
+    results = fit_count_model(X, Y, offset, family="nb2", names=names)
+    results.summary("violence_calls")
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+COUNT_FAMILIES = ("poisson", "nb2")
+
+
+class CountModelResults:
+    """Fitted coefficients of one design matrix against several count outcomes
+
+    Attributes:
+        params {pd.DataFrame}: coefficients, one row per design column and one column per outcome
+        bse {pd.DataFrame}: standard errors from the inverse Fisher information at convergence
+        alpha {pd.Series}: NB2 dispersion per outcome (Var = mu + alpha * mu^2), 0 for poisson
+        llf {pd.Series}: log likelihood per outcome
+        converged {pd.Series}: whether each outcome converged within max_iter
+    """
+
+    def __init__(
+        self,
+        family: str,
+        params: np.ndarray,
+        bse: np.ndarray,
+        alpha: np.ndarray,
+        llf: np.ndarray,
+        converged: np.ndarray,
+        n_iter: int,
+        names: Sequence[str],
+        outcomes: Sequence[str],
+    ) -> None:
+        self.family = family
+        self.params = pd.DataFrame(params, index=names, columns=outcomes)
+        self.bse = pd.DataFrame(bse, index=names, columns=outcomes)
+        self.alpha = pd.Series(alpha, index=outcomes, name="alpha")
+        self.llf = pd.Series(llf, index=outcomes, name="llf")
+        self.converged = pd.Series(converged, index=outcomes, name="converged")
+        self.n_iter = n_iter
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.family} fits of {self.params.shape[1]} outcomes on {self.params.shape[0]} columns, "
+            f"{self.converged.sum()} converged in {self.n_iter} iterations"
+        )
+
+    def summary(self, outcome: str) -> pd.DataFrame:
+        """Coefficient, standard error, z, p-value and rate ratio of every column for one outcome"""
+        z = self.params[outcome] / self.bse[outcome]
+        return pd.DataFrame(
+            {
+                "coefficient": self.params[outcome],
+                "std_error": self.bse[outcome],
+                "z": z,
+                "p_value": 2 * stats.norm.sf(np.abs(z)),
+                "rate_ratio": np.exp(self.params[outcome]),
+            }
+        )
+
+    def predict(self, X: np.ndarray, offset: np.ndarray) -> pd.DataFrame:
+        """Expected counts of every outcome"""
+        return pd.DataFrame(np.exp(offset[:, None] + X @ self.params.to_numpy()), columns=self.params.columns)
+
+
+def count_design(
+    df: pd.DataFrame,
+    counts: pd.DataFrame,
+    exposure: pd.Series,
+    years: float = 1.0,
+    columns: Optional[Sequence[str]] = None,
+    intercept: bool = True,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    """(Y, X, offset, column names) for geos in df's index
+
+    Arguments:
+        df -- modeling frame, e.g. the transform_1 output. columns defaults to all but call_rate
+        counts -- raw count outcomes indexed by geo_id, one column each (violence_calls, rms_crime, ...)
+        exposure -- population indexed by geo_id
+        years -- years of events in the counts, so coefficients are per person-year
+    """
+    if columns is None:
+        columns = [c for c in df.columns if c != "call_rate"]
+    X = df.loc[:, list(columns)].to_numpy(dtype=float)
+    names = list(columns)
+    if intercept:
+        X = np.column_stack([np.ones(len(X)), X])
+        names = ["Intercept"] + names
+    Y = counts.reindex(df.index).to_numpy(dtype=float)
+    exposure = exposure.reindex(df.index).to_numpy(dtype=float) * years
+    if not (exposure > 0).all():
+        raise ValueError("exposure must be positive for every geo, drop unpopulated geos first")
+    offset = np.log(exposure)
+    if not (np.isfinite(X).all() and np.isfinite(Y).all()):
+        raise ValueError("design and counts must not contain missing or infinite values")
+    if (Y < 0).any():
+        raise ValueError("counts must be non-negative")
+    return Y, X, offset, names
+
+
+def fit_count_model(
+    X: np.ndarray,
+    Y: np.ndarray,
+    offset: Optional[np.ndarray] = None,
+    family: str = "poisson",
+    names: Optional[Sequence[str]] = None,
+    outcomes: Optional[Sequence[str]] = None,
+    max_iter: int = 100,
+    tol: float = 1e-8,
+) -> CountModelResults:
+    """Fits every column of Y on X by IRLS, all columns at once
+
+    Arguments:
+        X -- design matrix (n, p), with an intercept column if wanted
+        Y -- counts (n,) or (n, m)
+        offset -- log exposure (n,), 0 if None
+        family -- "poisson" or "nb2"
+        tol -- convergence tolerance on the relative change in deviance of every outcome
+    """
+    if family not in COUNT_FAMILIES:
+        raise ValueError(f"family must be one of {COUNT_FAMILIES}")
+    if isinstance(Y, pd.DataFrame):
+        outcomes = list(Y.columns) if outcomes is None else outcomes
+    Y = np.asarray(Y, dtype=float)
+    Y = Y[:, None] if Y.ndim == 1 else Y
+    X = np.asarray(X, dtype=float)
+    n, p = X.shape
+    m = Y.shape[1]
+    offset = np.zeros(n) if offset is None else np.asarray(offset, dtype=float)
+    names = [f"x{i}" for i in range(p)] if names is None else list(names)
+    outcomes = [f"y{j}" for j in range(m)] if outcomes is None else list(outcomes)
+
+    xx = (X[:, :, None] * X[:, None, :]).reshape(n, p * p)
+    # start from the intercept-only rate of each outcome, a safe point for the log link
+    eta = offset[:, None] + np.log((Y.sum(axis=0) + 0.5) / np.exp(offset).sum())[None, :]
+    mu = np.exp(eta)
+    alpha = np.zeros(m) if family == "poisson" else np.full(m, 0.1)
+    deviance = np.full(m, np.inf)
+    converged = np.zeros(m, dtype=bool)
+
+    for n_iter in range(1, max_iter + 1):
+        weights = mu / (1 + alpha[None, :] * mu)
+        z = eta - offset[:, None] + (Y - mu) / mu
+        gram = (weights.T @ xx).reshape(m, p, p)
+        beta = _solve_stacked(gram, (X.T @ (weights * z)).T)
+        eta = offset[:, None] + X @ beta.T
+        mu = np.exp(np.clip(eta, -30, 30))
+        if family == "nb2":
+            alpha = _update_alpha(Y, mu, alpha)
+        new_deviance = _deviance(Y, mu, alpha)
+        converged = np.abs(new_deviance - deviance) <= tol * (np.abs(new_deviance) + 0.1)
+        deviance = new_deviance
+        if converged.all():
+            break
+
+    weights = mu / (1 + alpha[None, :] * mu)
+    gram = (weights.T @ xx).reshape(m, p, p)
+    bse = np.sqrt(np.diagonal(np.linalg.pinv(gram), axis1=1, axis2=2))
+    return CountModelResults(
+        family, beta.T, bse.T, alpha, _loglik(Y, mu, alpha), converged, n_iter, names, outcomes
+    )
+
+
+def fit_many(
+    specs: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    family: str = "poisson",
+    n_jobs: Optional[int] = None,
+    **kwargs,
+) -> Dict[str, CountModelResults]:
+    """Fits several designs in parallel, e.g. one per formula or grain
+
+    specs maps a name to (X, Y, offset), or to (X, Y, offset, names) to label the coefficients.
+    kwargs are passed to fit_count_model.
+    """
+
+    def fit(spec: Tuple) -> CountModelResults:
+        X, Y, offset, *names = spec
+        return fit_count_model(X, Y, offset, family=family, names=names[0] if names else None, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return dict(zip(specs, executor.map(fit, specs.values())))
+
+
+def _solve_stacked(gram: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+    try:
+        return np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(gram) @ rhs[:, :, None])[:, :, 0]
+
+
+def _update_alpha(Y: np.ndarray, mu: np.ndarray, alpha: np.ndarray, n_steps: int = 5) -> np.ndarray:
+    """Newton steps on log(1 / alpha) maximizing the NB2 likelihood of each outcome at fixed mu"""
+    log_r = -np.log(np.clip(alpha, np.exp(-18), None))
+    for _ in range(n_steps):
+        r = np.exp(log_r)[None, :]
+        gradient = np.sum(
+            special.digamma(Y + r) - special.digamma(r) + np.log(r / (r + mu)) + 1 - (r + Y) / (r + mu), axis=0
+        )
+        hessian = np.sum(
+            special.polygamma(1, Y + r) - special.polygamma(1, r) + 1 / r - 1 / (r + mu) - (mu - Y) / (r + mu) ** 2,
+            axis=0,
+        )
+        r = r[0]
+        gradient_log, hessian_log = gradient * r, hessian * r**2 + gradient * r
+        # Newton where the likelihood is concave in log r, otherwise a plain step uphill
+        step = np.where(hessian_log < 0, -gradient_log / np.where(hessian_log < 0, hessian_log, -1), np.sign(gradient))
+        log_r = np.clip(log_r + np.clip(step, -2, 2), -10, 18)
+    # the score of alpha at 0 is sum((y - mu)^2 - y) / 2, outcomes that aren't overdispersed are poisson
+    return np.where(np.sum((Y - mu) ** 2 - Y, axis=0) > 0, np.exp(-log_r), 0.0)
+
+
+def _loglik(Y: np.ndarray, mu: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    poisson = np.sum(Y * np.log(mu) - mu - special.gammaln(Y + 1), axis=0)
+    is_nb = alpha > 0
+    if not is_nb.any():
+        return poisson
+    r = 1 / np.where(is_nb, alpha, 1)[None, :]
+    nb = np.sum(
+        special.gammaln(Y + r) - special.gammaln(r) - special.gammaln(Y + 1)
+        + r * np.log(r / (r + mu)) + Y * np.log(mu / (r + mu)),
+        axis=0,
+    )
+    return np.where(is_nb, nb, poisson)
+
+
+def _deviance(Y: np.ndarray, mu: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """Poisson deviance, or NB2 deviance at each outcome's alpha"""
+    y_log_y_mu = special.xlogy(Y, Y) - special.xlogy(Y, mu)
+    if not (alpha > 0).any():
+        return 2 * np.sum(y_log_y_mu - (Y - mu), axis=0)
+    r = 1 / np.where(alpha > 0, alpha, 1)[None, :]
+    # log1p keeps the deviance exact as alpha goes to 0 (r to infinity), where it tends to the poisson deviance
+    nb = y_log_y_mu - (Y + r) * np.log1p((Y - mu) / (mu + r))
+    poisson = y_log_y_mu - (Y - mu)
+    return 2 * np.sum(np.where(alpha[None, :] > 0, nb, poisson), axis=0)
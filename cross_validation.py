@@ -0,0 +1,177 @@
+"""Spatially blocked cross-validation of OLS / ridge fits over many feature subsets at once
+
+Random splits leak through spatial autocorrelation: a block's neighbors in the training set know its outcome. Folds
+here hold out whole clusters of geos instead, tracts (for block or block group data) or grid cells of any size.
+
+Every fit and score is done from per-fold Gram matrices of [X, y], computed once from one design matrix:
+    train Gram = total Gram - fold Gram, so a fit is a |subset| x |subset| solve
+    test SSE = y'y - 2 b'X'y + b'X'X b over the fold Gram, so scoring never touches the rows again
+Subsets of the same size are solved as one stacked np.linalg.solve, and folds run on a thread pool.
+
+    df, df0 = transform_1(feat_df)
+    folds = spatial_folds(df.index, n_folds=5, by="tract")
+    scores = cross_validate_subsets(df, folds, all_subsets(columns, max_size=4), alphas=(0, 1))
+"""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from inference import design_matrix, spatial_clusters
+
+
+def grid_clusters(
+    geo_ids: Sequence[float],
+    grid_grain: str,
+    decennial_census_year: int,
+    target_geo_grain: str,
+    data_path: Optional[str] = ".",
+) -> np.ndarray:
+    """Grid cell (e.g. "grid 2000m") containing the centroid of each geo"""
+    import geopandas as gpd
+    from constants import AREA_CRS
+    from detroit_geos import get_detroit_census_geos
+    from grid import GridSpec
+
+    geos = get_detroit_census_geos(decennial_census_year, data_path, target_geo_grain)
+    centroids = gpd.GeoSeries(geos.geometry.to_crs(AREA_CRS).centroid.values, index=geos.geo_id.to_numpy(dtype=float))
+    centroids = centroids.reindex(np.asarray(geo_ids, dtype=float))
+    if centroids.isna().any():
+        raise ValueError(f"Some geo ids are not {decennial_census_year} {target_geo_grain}s")
+    return GridSpec(grid_grain).cell_ids(centroids.x.to_numpy(), centroids.y.to_numpy())
+
+
+def spatial_folds(
+    geo_ids: Sequence[float],
+    n_folds: int = 5,
+    by: str = "tract",
+    seed: int = 0,
+    decennial_census_year: Optional[int] = None,
+    target_geo_grain: Optional[str] = None,
+    data_path: Optional[str] = ".",
+) -> np.ndarray:
+    """Fold number (0 to n_folds - 1) of each geo, holding out whole spatial clusters
+
+    Arguments:
+        by -- "tract" or "block group" to cluster by the containing census geo, or a grid grain like "grid 2000m" to
+            cluster by grid cells. Grid clusters need decennial_census_year and target_geo_grain to find centroids
+    """
+    from grid import is_grid_grain
+
+    if is_grid_grain(by):
+        if decennial_census_year is None or target_geo_grain is None:
+            raise ValueError("decennial_census_year and target_geo_grain are required to cluster by grid cells")
+        clusters = grid_clusters(geo_ids, by, decennial_census_year, target_geo_grain, data_path)
+    else:
+        clusters = spatial_clusters(geo_ids, by)
+    labels, cluster_index = np.unique(clusters, return_inverse=True)
+    if len(labels) < n_folds:
+        raise ValueError(f"Only {len(labels)} clusters for {n_folds} folds")
+    # shuffle clusters, then deal them out so folds get about the same number of clusters
+    cluster_folds = np.empty(len(labels), dtype=int)
+    cluster_folds[np.random.default_rng(seed).permutation(len(labels))] = np.arange(len(labels)) % n_folds
+    return cluster_folds[cluster_index]
+
+
+def all_subsets(
+    columns: Sequence[str],
+    min_size: int = 1,
+    max_size: Optional[int] = None,
+    always_include: Sequence[str] = (),
+) -> List[List[str]]:
+    """Every subset of columns with min_size to max_size columns, plus the always_include columns"""
+    optional = [c for c in columns if c not in always_include]
+    max_size = len(optional) if max_size is None else max_size
+    return [
+        list(always_include) + list(subset)
+        for size in range(min_size, max_size + 1)
+        for subset in combinations(optional, size)
+    ]
+
+
+def cross_validate_subsets(
+    df: pd.DataFrame,
+    folds: np.ndarray,
+    subsets: Sequence[Sequence[str]],
+    outcome: str = "call_rate",
+    alphas: Sequence[float] = (0,),
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """Out-of-sample scores of an OLS (alpha=0) or ridge fit for every subset and alpha, sorted by mse
+
+    Every model has an intercept. Ridge penalties are alpha times each column's mean square in the training folds,
+    the same as penalizing coefficients on standardized columns, and don't apply to the intercept.
+
+    Returns one row per (subset, alpha) with the pooled out-of-sample mse and r2 (against each fold's training mean),
+    and the mse of each fold.
+    """
+    columns = list(dict.fromkeys(c for subset in subsets for c in subset))
+    y, X, names = design_matrix(df, outcome, columns)
+    folds = np.asarray(folds)
+    fold_ids = np.unique(folds)
+    fold_grams = [_augmented_gram(X[folds == f], y[folds == f]) for f in fold_ids]
+    total_gram = np.sum(fold_grams, axis=0)
+    position = {name: i for i, name in enumerate(names)}
+    subset_index = [[0] + [position[c] for c in subset] for subset in subsets]
+
+    def score_fold(fold_gram: np.ndarray) -> np.ndarray:
+        """Test SSE and SST of every (subset, alpha) for one held out fold"""
+        train_gram = total_gram - fold_gram
+        n_train, n_test = train_gram[0, 0], fold_gram[0, 0]
+        train_mean = train_gram[0, -1] / n_train
+        # test sum of squares around the training mean
+        sst = fold_gram[-1, -1] - 2 * train_mean * fold_gram[0, -1] + n_test * train_mean**2
+        mean_squares = np.diag(train_gram)[:-1] / n_train
+        sse = np.empty((len(subsets), len(alphas)))
+        for size in {len(index) for index in subset_index}:
+            rows = [i for i, index in enumerate(subset_index) if len(index) == size]
+            index = np.array([subset_index[i] for i in rows])
+            xtx = train_gram[index[:, :, None], index[:, None, :]]
+            xty = train_gram[index, -1]
+            test_xtx = fold_gram[index[:, :, None], index[:, None, :]]
+            test_xty = fold_gram[index, -1]
+            penalty = mean_squares[index] * (index != 0)
+            for k, alpha in enumerate(alphas):
+                ridge = xtx + alpha * penalty[:, :, None] * np.eye(size)
+                beta = _solve(ridge, xty)
+                sse[rows, k] = (
+                    fold_gram[-1, -1]
+                    - 2 * np.einsum("si,si->s", beta, test_xty)
+                    + np.einsum("si,sij,sj->s", beta, test_xtx, beta)
+                )
+        return np.stack([sse, np.full_like(sse, sst), np.full_like(sse, n_test)])
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        fold_scores = list(executor.map(score_fold, fold_grams))
+    sse = np.stack([s[0] for s in fold_scores])
+    sst = np.stack([s[1] for s in fold_scores])
+    n_test = np.stack([s[2] for s in fold_scores])
+
+    scores = pd.DataFrame(
+        {
+            "features": [" + ".join(subset) for subset in subsets for _ in alphas],
+            "n_features": [len(subset) for subset in subsets for _ in alphas],
+            "alpha": [alpha for _ in subsets for alpha in alphas],
+            "mse": (sse.sum(axis=0) / n_test.sum(axis=0)).ravel(),
+            "r2": (1 - sse.sum(axis=0) / sst.sum(axis=0)).ravel(),
+        }
+    )
+    for f, fold in enumerate(fold_ids):
+        scores[f"mse_fold_{fold}"] = (sse[f] / n_test[f]).ravel()
+    return scores.sort_values("mse").reset_index(drop=True)
+
+
+def _augmented_gram(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """[X, y]' [X, y]"""
+    Xy = np.column_stack([X, y])
+    return Xy.T @ Xy
+
+
+def _solve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Stacked solve, least squares for stacks with a singular matrix (e.g. a constant column in a training fold)"""
+    try:
+        return np.linalg.solve(a, b[:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(a) @ b[:, :, None])[:, :, 0]
@@ -0,0 +1,242 @@
+import os
+from typing import Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from constants import AREA_CRS, GEO_GRAIN_LEN_MAP
+from detroit_geos import get_detroit_census_geos
+from scipy import sparse
+
+
+class BlockCrosswalk:
+    """Sparse overlap weights between the census geos of two decennial census years
+
+    The weights are stored as one sparse matrix, overlap[i, j] = the amount (sq m, or estimated people) of from-year
+    geo j that falls inside to-year geo i. Converting a feature is then a sparse product per column:
+        additive columns (counts) are split across targets by each source's share of overlap (columns sum to 1)
+        intensive columns (rates, incomes) are overlap-weighted means of the sources in each target (rows sum to 1)
+
+    Build with BlockCrosswalk.build() or get_block_crosswalk(), which caches the result.
+
+    Arguments:
+        overlap -- sparse matrix of shape (len(to_ids), len(from_ids))
+        from_ids -- geo ids of the from_year geos, in column order
+        to_ids -- geo ids of the to_year geos, in row order
+        from_year -- census year of the source geos
+        to_year -- census year of the target geos
+        method -- "area" or "population", how the overlap was measured
+        grain -- geo grain of both id arrays. Crosswalks from blocks to other geos (see grid.cell_block_crosswalk)
+            use the grain of the target ids
+    """
+
+    def __init__(
+        self,
+        overlap: sparse.spmatrix,
+        from_ids: np.ndarray,
+        to_ids: np.ndarray,
+        from_year: int,
+        to_year: int,
+        method: str = "area",
+        grain: str = "block",
+    ) -> None:
+        if overlap.shape != (len(to_ids), len(from_ids)):
+            raise ValueError("overlap must be of shape (len(to_ids), len(from_ids))")
+        self.overlap = sparse.csr_matrix(overlap)
+        self.from_ids = np.asarray(from_ids, dtype=float)
+        self.to_ids = np.asarray(to_ids, dtype=float)
+        self.from_year = from_year
+        self.to_year = to_year
+        self.method = method
+        self.grain = grain
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.method}-weighted {self.grain} crosswalk from {self.from_year} to {self.to_year}: "
+            f"{len(self.from_ids)} x {len(self.to_ids)} geos, {self.overlap.nnz} overlaps"
+        )
+
+    @classmethod
+    def build(
+        cls,
+        from_year: int,
+        to_year: int,
+        method: str = "area",
+        data_path: Optional[str] = ".",
+        population: Optional[pd.Series] = None,
+        min_overlap_sq_m: float = 1.0,
+    ) -> "BlockCrosswalk":
+        """Intersects the census blocks of both years and measures each overlap
+
+        Arguments:
+            method -- "area" weights overlaps by area. "population" weights them by the to_year population living in
+                the overlap, assuming uniform density within each to_year block. Source blocks with no population in
+                any overlap fall back to area weights.
+            population -- to_year block population indexed by geo_id. Loaded with the Population feature if None.
+            min_overlap_sq_m -- overlaps smaller than this are digitization slivers and are dropped
+        """
+        if method not in ("area", "population"):
+            raise ValueError("method must be one of 'area', 'population'")
+        if from_year == to_year:
+            raise ValueError("from_year and to_year must differ")
+        from_blocks = get_detroit_census_geos(from_year, data_path).to_crs(AREA_CRS)
+        to_blocks = get_detroit_census_geos(to_year, data_path).to_crs(AREA_CRS)
+        from_ids = from_blocks.geo_id.to_numpy(dtype=float)
+        to_ids = to_blocks.geo_id.to_numpy(dtype=float)
+
+        pieces = gpd.overlay(
+            from_blocks.loc[:, ["geo_id", "geometry"]].rename(columns={"geo_id": "from_id"}),
+            to_blocks.loc[:, ["geo_id", "geometry"]].rename(columns={"geo_id": "to_id"}),
+            how="intersection",
+            keep_geom_type=True,
+        ).assign(area=lambda x: x.geometry.area)
+        pieces = pieces.loc[pieces.area >= min_overlap_sq_m]
+        rows = pd.Index(to_ids).get_indexer(pieces.to_id)
+        cols = pd.Index(from_ids).get_indexer(pieces.from_id)
+        area = sparse.csr_matrix((pieces.area.to_numpy(), (rows, cols)), shape=(len(to_ids), len(from_ids)))
+        if method == "area":
+            return cls(area, from_ids, to_ids, from_year, to_year, method)
+
+        if population is None:
+            from features.population import Population
+
+            population = Population(to_year, population_data_path="population", data_path=data_path, verbose=False)
+            population = population.construct_feature("block").population
+        density = population.reindex(to_ids).fillna(0).to_numpy() / to_blocks.geometry.area.to_numpy()
+        people = sparse.diags(density) @ area
+        unpopulated = np.asarray(people.sum(axis=0)).ravel() == 0
+        overlap = people + area @ sparse.diags(unpopulated.astype(float))
+        return cls(overlap, from_ids, to_ids, from_year, to_year, method)
+
+    def save(self, fn: str) -> None:
+        overlap = self.overlap.tocsr()
+        np.savez_compressed(
+            fn,
+            data=overlap.data,
+            indices=overlap.indices,
+            indptr=overlap.indptr,
+            from_ids=self.from_ids,
+            to_ids=self.to_ids,
+            meta=np.array([self.from_year, self.to_year]),
+            method=np.array(self.method),
+            grain=np.array(self.grain),
+        )
+
+    @classmethod
+    def load(cls, fn: str) -> "BlockCrosswalk":
+        with np.load(fn) as f:
+            overlap = sparse.csr_matrix(
+                (f["data"], f["indices"], f["indptr"]), shape=(len(f["to_ids"]), len(f["from_ids"]))
+            )
+            from_year, to_year = f["meta"]
+            return cls(
+                overlap, f["from_ids"], f["to_ids"], int(from_year), int(to_year), str(f["method"]), str(f["grain"])
+            )
+
+    def reverse(self) -> "BlockCrosswalk":
+        """The to_year -> from_year crosswalk over the same overlaps
+
+        Only exact for area weights; population weights were measured with to_year people, so build the reverse
+        direction with BlockCrosswalk.build() if that matters.
+        """
+        return BlockCrosswalk(
+            self.overlap.T, self.to_ids, self.from_ids, self.to_year, self.from_year, self.method, self.grain
+        )
+
+    def at_grain(self, target_geo_grain: str) -> "BlockCrosswalk":
+        """Aggregates the block overlaps up to block group or tract geos of both years"""
+        if self.grain != "block":
+            raise ValueError("Only block crosswalks can be aggregated")
+        if target_geo_grain == "block":
+            return self
+        from_agg, from_ids = _aggregation_matrix(self.from_ids, target_geo_grain)
+        to_agg, to_ids = _aggregation_matrix(self.to_ids, target_geo_grain)
+        overlap = to_agg @ self.overlap @ from_agg.T
+        return BlockCrosswalk(overlap, from_ids, to_ids, self.from_year, self.to_year, self.method, target_geo_grain)
+
+    def additive_weights(self) -> sparse.csr_matrix:
+        """Column-normalized overlaps: the share of each source geo that goes to each target geo"""
+        return self.overlap @ sparse.diags(_safe_reciprocal(np.asarray(self.overlap.sum(axis=0)).ravel()))
+
+    def intensive_weights(self) -> sparse.csr_matrix:
+        """Row-normalized overlaps: the weight of each source geo in the mean of each target geo"""
+        return sparse.diags(_safe_reciprocal(np.asarray(self.overlap.sum(axis=1)).ravel())) @ self.overlap
+
+    def convert(self, df: pd.DataFrame, intensive_columns: Sequence[str] = ()) -> pd.DataFrame:
+        """Converts a feature frame indexed by from_year geo ids to one indexed by to_year geo ids
+
+        Additive columns treat missing geos as 0. Intensive columns ignore missing geos, and are null where no
+        overlapping source has a value.
+        """
+        is_series = isinstance(df, pd.Series)
+        df = df.to_frame() if is_series else df
+        x = df.reindex(self.from_ids).to_numpy(dtype=float)
+        is_intensive = df.columns.isin(intensive_columns)
+        out = np.empty((len(self.to_ids), df.shape[1]))
+
+        if (~is_intensive).any():
+            out[:, ~is_intensive] = self.additive_weights() @ np.nan_to_num(x[:, ~is_intensive])
+        if is_intensive.any():
+            known = ~np.isnan(x[:, is_intensive])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[:, is_intensive] = (self.overlap @ np.where(known, x[:, is_intensive], 0)) / (
+                    self.overlap @ known.astype(float)
+                )
+
+        converted = pd.DataFrame(out, index=pd.Index(self.to_ids, name=df.index.name), columns=df.columns)
+        return converted.iloc[:, 0] if is_series else converted
+
+
+def _aggregation_matrix(block_ids: np.ndarray, target_geo_grain: str):
+    """Sparse indicator matrix of shape (n target geos, n blocks), and the target geo ids"""
+    n_chars = GEO_GRAIN_LEN_MAP.get("block") - GEO_GRAIN_LEN_MAP.get(target_geo_grain)
+    target_ids, cols = np.unique(block_ids // 10**n_chars, return_inverse=True)
+    indicator = sparse.csr_matrix(
+        (np.ones(len(block_ids)), (cols, np.arange(len(block_ids)))), shape=(len(target_ids), len(block_ids))
+    )
+    return indicator, target_ids
+
+
+def _safe_reciprocal(x: np.ndarray) -> np.ndarray:
+    return np.divide(1, x, out=np.zeros_like(x, dtype=float), where=x != 0)
+
+
+def get_block_crosswalk(
+    from_year: int,
+    to_year: int,
+    method: str = "area",
+    data_path: Optional[str] = ".",
+    cache_path: Optional[str] = "cache",
+    **kwargs,
+) -> BlockCrosswalk:
+    """Loads the crosswalk from cache_path, building and caching it on first use"""
+    fn = f"{cache_path.rstrip('/')}/crosswalk_{from_year}_{to_year}_{method}.npz"
+    if os.path.isfile(fn):
+        return BlockCrosswalk.load(fn)
+    crosswalk = BlockCrosswalk.build(from_year, to_year, method, data_path, **kwargs)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    crosswalk.save(fn)
+    return crosswalk
+
+
+def convert_cached_features(
+    feature,
+    to_year: int,
+    target_geo_grain: str,
+    method: str = "area",
+    cache_path: Optional[str] = "cache",
+) -> pd.DataFrame:
+    """Returns a feature's cached output converted to another census vintage, without re-geolocating anything
+
+    The feature must be cached for its own decennial_census_year. Columns listed in meta["intensive_features"] are
+    converted as weighted means, all others as counts.
+    """
+    if to_year == feature.decennial_census_year:
+        return feature.load_cached_features(target_geo_grain)
+    crosswalk = get_block_crosswalk(
+        feature.decennial_census_year, to_year, method, feature.data_path, cache_path
+    ).at_grain(target_geo_grain)
+    return crosswalk.convert(
+        feature.load_cached_features(target_geo_grain),
+        intensive_columns=feature.meta.get("intensive_features", ()),
+    )
@@ -0,0 +1,120 @@
+"""An embedded, file-backed DuckDB database of raw feature events with geo ids attached, for ad hoc SQL
+
+Each feature's cleansed events (geo ids from load_data, i.e. from our geolocator with use_lat_long) go in a table named
+by Feature.event_table(), e.g. "ViolenceCalls_2010", without the point geometry. DuckDB runs queries in parallel and
+spills to temp_directory when an aggregation doesn't fit in memory_limit, so questions over the full history don't
+re-read the csv into pandas. Requires duckdb
+
+    with EventStore("cache/events.duckdb") as store:
+        ViolenceCalls(verbose=False).ingest_events(store, call_whitelist_strings=None)
+        daily = store.query('SELECT call_timestamp::DATE AS day, count(*) AS calls FROM "ViolenceCalls_2010" GROUP BY 1')
+        calls = ViolenceCalls(verbose=False).construct_feature_sql(store, "block group")
+"""
+import os
+from typing import Optional, Sequence
+
+import pandas as pd
+
+
+class EventStore:
+    """DuckDB database at path, created if missing
+
+    Arguments:
+        threads -- DuckDB worker threads, all cores if None
+        memory_limit -- e.g. "4GB", beyond which DuckDB spills to temp_directory. DuckDB's default if None
+        temp_directory -- spill directory, path + ".tmp" if None
+    """
+
+    def __init__(
+        self,
+        path: str = "cache/events.duckdb",
+        read_only: bool = False,
+        threads: Optional[int] = None,
+        memory_limit: Optional[str] = None,
+        temp_directory: Optional[str] = None,
+    ) -> None:
+        import duckdb
+
+        if not read_only and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        config = {"temp_directory": path + ".tmp" if temp_directory is None else temp_directory}
+        if threads is not None:
+            config["threads"] = threads
+        if memory_limit is not None:
+            config["memory_limit"] = memory_limit
+        self.path = path
+        self.connection = duckdb.connect(path, read_only=read_only, config=config)
+
+    def __repr__(self) -> str:
+        return f"EventStore {self.path}, tables {', '.join(self.tables()) or 'none'}"
+
+    def __enter__(self) -> "EventStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def tables(self) -> Sequence[str]:
+        return [name for (name,) in self.connection.execute("SHOW TABLES").fetchall()]
+
+    def has_table(self, table: str) -> bool:
+        return table in self.tables()
+
+    def ingest(self, table: str, df: pd.DataFrame, replace: bool = True) -> int:
+        """Writes df to table, replacing it or with replace=False appending to it. Returns the number of rows written
+
+        Geometry columns are dropped, keep coordinate columns to query locations
+        """
+        geometry_columns = [column for column in df.columns if str(df[column].dtype) == "geometry"]
+        events = pd.DataFrame(df.drop(columns=geometry_columns))
+        self.connection.register("_ingest", events)
+        try:
+            if replace or not self.has_table(table):
+                self.connection.execute(f"CREATE OR REPLACE TABLE {_quote(table)} AS SELECT * FROM _ingest")
+            else:
+                self.connection.execute(f"INSERT INTO {_quote(table)} BY NAME SELECT * FROM _ingest")
+        finally:
+            self.connection.unregister("_ingest")
+        return len(events)
+
+    def query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        """Result of sql as a DataFrame, with ? placeholders bound to params"""
+        return self.connection.execute(sql, list(params)).df()
+
+    def count_by_geo(
+        self,
+        table: str,
+        n_chars_dropped: int = 0,
+        where: str = "TRUE",
+        params: Sequence = (),
+        column: str = "oid",
+        unique: bool = False,
+    ) -> pd.Series:
+        """Non-null (or with unique, distinct) values of column per geo, like Feature.count_by_geo()
+
+        Geos are the table's geo_id with its last n_chars_dropped digits dropped, rows are filtered by the where clause
+        with ? placeholders bound to params
+        """
+        if n_chars_dropped < 0:
+            raise ValueError("n_chars_dropped must be non-negative")
+        value = f"DISTINCT {_quote(column)}" if unique else _quote(column)
+        counts = self.query(
+            f"""
+            SELECT CAST(CAST(geo_id AS BIGINT) // {10 ** n_chars_dropped} AS DOUBLE) AS geo, count({value}) AS n
+            FROM {_quote(table)}
+            WHERE geo_id IS NOT NULL AND ({where})
+            GROUP BY geo
+            ORDER BY geo
+            """,
+            params,
+        )
+        return pd.Series(
+            counts["n"].to_numpy(dtype="int64"), index=pd.Index(counts["geo"].to_numpy(), name="geo"), name=column
+        )
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
@@ -0,0 +1,16 @@
+"""Feature classes, imported on first use
+
+Registered classes are attributes of the package, but their modules (and pandas, geopandas, ...) are only imported when
+one is accessed, so `import features` and `features.cli` start without loading any data dependency:
+
+    from features import ViolenceCalls
+"""
+
+
+def __getattr__(name: str):
+    from features.registry import FEATURE_REGISTRY, import_feature_class
+
+    class_paths = {class_path.split(":")[1]: class_path for class_path, _, _ in FEATURE_REGISTRY.values()}
+    if name in class_paths:
+        return import_feature_class(class_paths[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
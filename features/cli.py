@@ -0,0 +1,120 @@
+"""Builds and caches every registered feature in parallel
+
+    python -m features.cli build --year 2010 --grains tract,block --jobs 8 --out cache
+
+Each feature class is built in its own process, so a build uses --jobs cores (all of them by default). Features whose
+cache is fresh (every requested grain, current class definition, newer than the source file) are skipped unless
+--force is passed, as are features that don't support --year. One line is printed per feature as it finishes, with
+its timing, then a summary. The exit code is 1 if any feature failed, so unattended builds can alert on it.
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from features.registry import import_feature_class, registered_classes
+
+DEFAULT_GRAINS = ("block", "block group", "tract")
+
+
+def build_feature(
+    class_path: str,
+    feature_kwargs: Dict,
+    decennial_census_year: int,
+    grains: Sequence[str],
+    out: str,
+    data_path: str = ".",
+    force: bool = False,
+) -> Tuple[str, str, float, Optional[str]]:
+    """Builds and caches one feature. Returns (class_path, "built" | "fresh" | "failed", seconds, error)
+
+    Registered features that don't support decennial_census_year are reported as "skipped" by build()
+    """
+    start = time.perf_counter()
+    try:
+        feature = import_feature_class(class_path)(
+            decennial_census_year=decennial_census_year,
+            data_path=data_path,
+            feature_cache_path=out,
+            verbose=False,
+            **feature_kwargs,
+        )
+        if not force and feature.is_cache_fresh(grains):
+            return class_path, "fresh", time.perf_counter() - start, None
+        feature.cache_features(grains)
+        return class_path, "built", time.perf_counter() - start, None
+    except Exception:
+        return class_path, "failed", time.perf_counter() - start, traceback.format_exc()
+
+
+def build(
+    decennial_census_year: int,
+    grains: Sequence[str] = DEFAULT_GRAINS,
+    out: str = "cache",
+    jobs: Optional[int] = None,
+    data_path: str = ".",
+    columns: Optional[Sequence[str]] = None,
+    force: bool = False,
+) -> List[Tuple[str, str, float, Optional[str]]]:
+    """Builds the registered features that emit columns (all of them if None) on jobs processes"""
+    entries = registered_classes(columns)
+    results = [
+        (class_path, "skipped", 0.0, None) for class_path, _, years in entries if decennial_census_year not in years
+    ]
+    for result in results:
+        print(f"{result[1]:>7}  {result[2]:8.1f}s  {result[0]}", flush=True)
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(build_feature, class_path, kwargs, decennial_census_year, grains, out, data_path, force)
+            for class_path, kwargs, years in entries
+            if decennial_census_year in years
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            class_path, status, seconds, _ = result
+            print(f"{status:>7}  {seconds:8.1f}s  {class_path}", flush=True)
+            results.append(result)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and cache the Detroit feature matrix")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="build and cache registered features")
+    build_parser.add_argument("--year", type=int, required=True, choices=(2010, 2020))
+    build_parser.add_argument("--grains", default=",".join(DEFAULT_GRAINS), help="comma separated, e.g. 'tract,block'")
+    build_parser.add_argument("--jobs", type=int, default=None, help="worker processes, defaults to every core")
+    build_parser.add_argument("--out", default="cache", help="feature cache directory")
+    build_parser.add_argument("--data-path", default=".")
+    build_parser.add_argument("--features", default=None, help="comma separated output columns, defaults to all")
+    build_parser.add_argument("--force", action="store_true", help="rebuild fresh caches too")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = build(
+        args.year,
+        grains=[grain.strip() for grain in args.grains.split(",")],
+        out=args.out,
+        jobs=args.jobs,
+        data_path=args.data_path,
+        columns=None if args.features is None else [column.strip() for column in args.features.split(",")],
+        force=args.force,
+    )
+    failed = [(class_path, error) for class_path, status, _, error in results if status == "failed"]
+    for class_path, error in failed:
+        print(f"\n{class_path} failed:\n{error}", file=sys.stderr)
+    n_built = sum(status == "built" for _, status, _, _ in results)
+    n_fresh = sum(status == "fresh" for _, status, _, _ in results)
+    n_skipped = sum(status == "skipped" for _, status, _, _ in results)
+    print(
+        f"{n_built} built, {n_fresh} fresh, {n_skipped} skipped, {len(failed)} failed "
+        f"in {time.perf_counter() - start:.1f}s ({args.year}, {args.grains} -> {args.out})"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
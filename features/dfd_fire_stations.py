@@ -2,7 +2,6 @@ import re
 from logging import warn
 from typing import List, Optional, Union
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
@@ -17,6 +16,8 @@ class dfdfirestations(Feature):
         "FID",
     ]
     TYPES_fire_stations = [float, float, int]
+    SOURCE_SCHEMA = dict(zip(COLS_fire_stations, TYPES_fire_stations))
+    POINT_COLUMNS = ("Lat", "Long")
 
     def __init__(
         self,
@@ -49,16 +50,9 @@ class dfdfirestations(Feature):
 
         # use a generator function to select rows we want in chunks rather than loading everything into memory at once
 
-        df = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_fire_stations,
-            dtype=dict(zip(self.COLS_fire_stations, self.TYPES_fire_stations)),
-        )
+        df = self.fetch_raw_data(sample_rows)
 
-        stations = gpd.GeoDataFrame(
-            df, geometry=gpd.points_from_xy(df.Lat, df.Long), crs="epsg:4326"
-        ).rename(columns={"FID": "oid"})
+        stations = self.points_from_source(df).rename(columns={"FID": "oid"})
         stations = stations.assign(
             block_id=point_to_geo_id(
                 stations.loc[:, ["oid", "geometry"]],
@@ -0,0 +1,148 @@
+from typing import Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from constants import AREA_CRS
+from detroit_geos import get_detroit_census_geos
+from util_detroit import point_to_geo_id
+
+from features.feature_constructor import Feature, cleanse_decorator, data_loader
+
+
+class EventKernelDensity(Feature):
+    """Kernel density estimate of event intensity (events per sq km), averaged over each geo
+
+    Wraps a point event feature (ViolenceCalls, RmsCrime, ...). The events are binned onto a raster in meters, and the
+    raster is smoothed with a gaussian kernel for every bandwidth by multiplying in the frequency domain, so the cost
+    is a couple of FFTs of the raster no matter how many events there are. No pairwise distances are computed.
+
+    Each block gets the mean intensity of the raster cells whose centers fall inside it. Coarser grains average over
+    all of their cells, not over their blocks. Blocks too small to contain a cell center are sampled at a
+    representative point instead.
+
+    Arguments:
+        event_feature -- a Feature whose clean_data has point geometries. Loaded and cleansed if it isn't already
+        bandwidths -- gaussian kernel standard deviations in meters, one output column per bandwidth
+        cell_size -- raster resolution in meters
+    """
+
+    def __init__(
+        self,
+        event_feature: Feature,
+        bandwidths: Sequence[float] = (100, 250, 500),
+        cell_size: float = 25,
+        **kwargs,
+    ) -> None:
+        self.event_feature = event_feature
+        self.bandwidths = tuple(bandwidths)
+        self.cell_size = cell_size
+        name = event_feature.meta.get("supported_features")
+        name = name[0] if isinstance(name, tuple) else type(event_feature).__name__.lower()
+        super().__init__(
+            meta={
+                "supported_features": tuple(f"{name}_kde_{bandwidth:g}m" for bandwidth in self.bandwidths),
+                "intensive_features": tuple(f"{name}_kde_{bandwidth:g}m" for bandwidth in self.bandwidths),
+                "box_url": event_feature.meta.get("box_url"),
+                "source_url": event_feature.meta.get("source_url"),
+                "min_geo_grain": "block",
+                "filename": event_feature.meta.get("filename"),
+            },
+            decennial_census_year=kwargs.pop("decennial_census_year", event_feature.decennial_census_year),
+            data_path=kwargs.pop("data_path", event_feature.data_path),
+            **kwargs,
+        )
+
+    def __repr__(self) -> str:
+        super_str = super().__repr__()
+        return f"Kernel density of {type(self.event_feature).__name__} events\n\n" + super_str
+
+    def load_data(self) -> None:
+        """Projected event coordinates from the event feature's clean data"""
+        if self.event_feature.clean_data is None:
+            if self.event_feature.data is None:
+                self.event_feature.load_data()
+            self.event_feature.cleanse_data()
+        events = self.event_feature.clean_data
+        events = events.loc[events.geometry.notna() & ~events.geometry.is_empty]
+        events = gpd.GeoSeries(events.geometry, crs=events.crs or "epsg:4326").to_crs(AREA_CRS)
+        self.data = pd.DataFrame({"x": events.x.to_numpy(), "y": events.y.to_numpy()}).dropna()
+        if self.verbose:
+            print(f"Loaded {self.data.shape[0]:,} events")
+
+    @cleanse_decorator
+    def cleanse_data(self) -> pd.DataFrame:
+        """Per block sums of cell intensities and cell counts, so any coarser grain can take an exact mean"""
+        blocks = get_detroit_census_geos(self.decennial_census_year, self.data_path)
+        blocks_projected = blocks.to_crs(AREA_CRS)
+        pad = 4 * max(self.bandwidths)
+        x_min, y_min, x_max, y_max = blocks_projected.total_bounds + np.array([-pad, -pad, pad, pad])
+        x_edges = np.arange(x_min, x_max + self.cell_size, self.cell_size)
+        y_edges = np.arange(y_min, y_max + self.cell_size, self.cell_size)
+
+        rasters = self.kernel_density_rasters(x_edges, y_edges)
+
+        # geolocate every cell center once, plus one representative point per block for blocks smaller than a cell
+        x_centers, y_centers = np.meshgrid(x_edges[:-1] + self.cell_size / 2, y_edges[:-1] + self.cell_size / 2)
+        samples = gpd.GeoDataFrame(
+            {"oid": np.arange(x_centers.size)},
+            geometry=gpd.points_from_xy(x_centers.ravel(), y_centers.ravel()),
+            crs=AREA_CRS,
+        )
+        representative = blocks_projected.geometry.representative_point()
+        samples = pd.concat(
+            [
+                samples,
+                gpd.GeoDataFrame(
+                    {"oid": np.arange(x_centers.size, x_centers.size + len(representative))},
+                    geometry=representative.values,
+                    crs=AREA_CRS,
+                ),
+            ],
+            ignore_index=True,
+        )
+        samples = samples.assign(
+            geo_id=point_to_geo_id(samples.to_crs(blocks.crs), self.decennial_census_year, blocks=blocks).to_numpy(),
+            is_cell=lambda x: x.oid < x_centers.size,
+            row=lambda x: np.clip(((x.geometry.y - y_min) // self.cell_size).astype(int), 0, len(y_edges) - 2),
+            col=lambda x: np.clip(((x.geometry.x - x_min) // self.cell_size).astype(int), 0, len(x_edges) - 2),
+        ).dropna(subset=["geo_id"])
+        blocks_with_cells = samples.loc[samples.is_cell, "geo_id"].unique()
+        samples = samples.loc[samples.is_cell | ~samples.geo_id.isin(blocks_with_cells)]
+
+        values = pd.DataFrame(
+            {column: raster[samples.row.to_numpy(), samples.col.to_numpy()] for column, raster in rasters.items()}
+        ).assign(geo_id=samples.geo_id.to_numpy(dtype=float), n_cells=1)
+        return values.groupby("geo_id").sum().reset_index()
+
+    def kernel_density_rasters(self, x_edges: np.ndarray, y_edges: np.ndarray) -> dict:
+        """Events per sq km on the raster defined by the edges, one raster per bandwidth
+
+        The gaussian kernel is applied through its analytic frequency response on the zero padded raster, which
+        needs one forward FFT for all bandwidths and one inverse FFT per bandwidth.
+        """
+        counts, _, _ = np.histogram2d(self.data.y, self.data.x, bins=[y_edges, x_edges])
+        pad = int(np.ceil(4 * max(self.bandwidths) / self.cell_size))
+        shape = (counts.shape[0] + pad, counts.shape[1] + pad)
+        spectrum = np.fft.rfft2(counts, s=shape)
+        freq_y = np.fft.fftfreq(shape[0])[:, None]
+        freq_x = np.fft.rfftfreq(shape[1])[None, :]
+        cell_area_sq_km = self.cell_size**2 / 1e6
+
+        rasters = {}
+        for column, bandwidth in zip(self.meta.get("supported_features"), self.bandwidths):
+            sigma = bandwidth / self.cell_size
+            response = np.exp(-2 * np.pi**2 * sigma**2 * (freq_x**2 + freq_y**2))
+            smoothed = np.fft.irfft2(spectrum * response, s=shape)[: counts.shape[0], : counts.shape[1]]
+            rasters[column] = np.clip(smoothed, 0, None) / cell_area_sq_km
+        return rasters
+
+    @data_loader
+    def construct_feature(self, target_geo_grain: str) -> pd.DataFrame:
+        """Mean event intensity (events per sq km) over the raster cells in each geo entity
+
+        target_geo_grain should be one of "block", "block group", "tract"
+        """
+        sums = self.assign_geo_column(target_geo_grain).drop(columns=["geo_id"]).groupby("geo").sum()
+        columns = list(self.meta.get("supported_features"))
+        return sums.loc[:, columns].div(sums.n_cells, axis=0).reindex(self.index)
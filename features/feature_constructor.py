@@ -1,19 +1,34 @@
+import functools
 import hashlib
 import inspect
+import json
 import os
 import pickle
 import pprint
+import shutil
+import tempfile
 import webbrowser
+from concurrent.futures import Executor, Future
 from logging import warn
-from typing import BinaryIO, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, BinaryIO, Dict, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 from constants import GEO_GRAIN_LEN_MAP
-from detroit_geos import get_detroit_census_geos
+from util_detroit import points_to_gpd, read_csv_columnar, read_csv_lazy, read_parquet_frame
+
+# the geo modules pull in geopandas, shapely and scipy, so they're imported by the methods that need them. Importing a
+# feature or reading its cache then stays fast
+if TYPE_CHECKING:
+    import geopandas as gpd
+    from crosswalk import BlockCrosswalk
+    from event_store import EventStore
+
+FEATURE_BACKENDS = ("pandas", "polars")
 
 
 def cleanse_decorator(func):
+    @functools.wraps(func)
     def standardize_and_validate(self, *args, **kwargs):
         self.clean_data = func(self)
         if self.verbose:
@@ -25,29 +40,70 @@ def cleanse_decorator(func):
 
 
 def data_loader(func):
-    """Loads and cleans data + assigns index. Useful for methods that require all three"""
+    """Loads and cleans data + assigns index. Useful for methods that require all three
 
-    def load_data(self, target_geo_grain: str, features: Tuple[str] = None, *kwargs) -> pd.DataFrame:
-        if self.data is None:
+    features are passed on to func, and to load_data() when it takes them, so only the requested columns are read.
+    Data loaded for other features is reloaded. If func doesn't take features, its output columns are selected
+    """
+    forwards_features = "features" in inspect.signature(func).parameters
+
+    @functools.wraps(func)
+    def load_data(self, target_geo_grain: str, features: Optional[Sequence[str]] = None, *args, **kwargs):
+        if isinstance(features, str):
+            features = (features,)
+        if self.data is not None and not self.has_loaded_features(features):
             if self.verbose:
-                print("Data not yet loaded, loading all data")
-            self.load_data()
+                print(f"Loaded data lacks some of {features}, reloading")
+            self.data = self.clean_data = None
+        load_data_kwargs = self.load_data_kwargs_for(features)
+        if self.data is None:
+            self.loaded_features = load_data_kwargs.get("features")
+            if not (self.checkpoint and self.read_checkpoint(load_data_kwargs)):
+                if self.verbose:
+                    print("Data not yet loaded, loading all data")
+                self.load_data(**load_data_kwargs)
+                if self.checkpoint:
+                    self.cleanse_data()
+                    self.write_checkpoint(load_data_kwargs)
         if self.clean_data is None:
             if self.verbose:
                 print("Data not yet cleansed, cleaning")
             self.cleanse_data()
 
+        from admin_geos import is_admin_grain
+        from grid import is_grid_grain
+
+        if (is_admin_grain(target_geo_grain) or is_grid_grain(target_geo_grain)) and not self.has_point_geometry():
+            # roll the block level feature up by area share, no points to bin or geometry to join
+            return self.roll_up_blocks(load_data(self, "block", features, *args, **kwargs), target_geo_grain)
+
         if (self.index is None) or (self.index.name != target_geo_grain):
             if self.verbose:
                 print(
                     f"Generate index not run, or was run on the wrong grain. Creating index on {target_geo_grain} grain"
                 )
             self.generate_index(target_geo_grain)
-        return func(self, target_geo_grain, *kwargs)
+        if forwards_features:
+            return func(self, target_geo_grain, *args, features=features, **kwargs)
+        return select_features(func(self, target_geo_grain, *args, **kwargs), features)
 
     return load_data
 
 
+def select_features(constructed: pd.DataFrame, features: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """The features columns of a construct_feature() output, all of it if features is None"""
+    if features is None:
+        return constructed
+    if isinstance(constructed, pd.Series):
+        if constructed.name not in features:
+            raise ValueError(f"{constructed.name} is the only feature")
+        return constructed
+    missing = [feature for feature in features if feature not in constructed.columns]
+    if missing:
+        raise ValueError(f"unknown features {missing}")
+    return constructed.loc[:, list(features)]
+
+
 class Feature:
     """Parent class from which additional features constructors inherit
 
@@ -62,12 +118,24 @@ class Feature:
         meta -- metadata for the feature, hardcoded into child class
         data_path -- path to local data files
         decennial_census_year -- year of reference geo data
+        disaggregation -- how features coarser than the target grain reach finer geos. None copies the coarse value to
+            every finer geo. "population" splits counts by block population and broadcasts intensive features, see
+            self.disaggregate()
+        backend -- "pandas", or "polars" to read SOURCE_SCHEMA csvs with a lazy polars scan and run count_by_geo()
+            on polars' multithreaded groupby. Outputs are the same either way. "polars" requires polars
+        load_data_kwargs -- arguments of the load_data() call made by construct_feature() when data isn't loaded yet
+        checkpoint -- have construct_feature() restart from parquet checkpoints of data and clean_data when their
+            load is unchanged, see self.checkpoint_dir(). Changes to construct_feature() then skip loading and
+            geolocation
 
     Attributes:
-        meta {dict}: A dictionary of metadata about the feature, including where to get the data, the minimum granularity, and the feature name
+        meta {dict}: A dictionary of metadata about the feature, including where to get the data, the minimum granularity, and the feature name.
+            Optional meta["intensive_features"] lists output columns that are rates or means rather than counts, which
+            matters whenever a feature is re-apportioned across geos (e.g. crosswalk.convert_cached_features)
         data {pd.Dataframe}: An opinionated initial load of the data
         clean_data {pd.Dataframe}: data ready for feature construction
         index {pd.Index}: The geo index of the feature
+        loaded_features {tuple}: The features data was loaded for by construct_feature(features=...), None for all
 
     The following methods must be implemented in the child classes:
         - load_data(), which should be an opinionated import of the raw data, selecting appropriate columns, performing
@@ -75,8 +143,15 @@ class Feature:
         - cleanse_data(), which should be where experimentation on the roughly cleaned data happens. geo_id must be
           assigned_here
         - construct_feature(), which should reshape the data to output a Series indexed by the geo entity.
+
+    Features read from a csv declare its schema as class attributes, and get read_raw_data() for free:
+        SOURCE_SCHEMA -- column -> type of the columns to read from meta["filename"]
+        POINT_COLUMNS -- (x, y) coordinate columns, for points_from_source()
     """
 
+    SOURCE_SCHEMA: Optional[Dict[str, type]] = None
+    POINT_COLUMNS: Optional[Tuple[str, str]] = None
+
     def __init__(
         self,
         meta: Dict,
@@ -84,19 +159,34 @@ class Feature:
         decennial_census_year: Optional[int] = 2020,
         verbose: Optional[bool] = True,
         feature_cache_path: Optional[str] = None,
+        disaggregation: Optional[str] = None,
+        backend: str = "pandas",
+        load_data_kwargs: Optional[Dict] = None,
+        checkpoint: bool = False,
         **kwargs,
     ) -> None:
         if meta.get("min_geo_grain") not in ("lat/long", "block", "block group", "tract"):
             raise ValueError("min_geo_grain must be one of 'lat/long', 'block', 'block group', 'tract'")
         if decennial_census_year not in (2010, 2020):
             raise ValueError("decennial_census_year must be one of 2010, 2020")
+        if disaggregation not in (None, "population"):
+            raise ValueError("disaggregation must be one of None, 'population'")
+        if backend not in FEATURE_BACKENDS:
+            raise ValueError(f"backend must be one of {FEATURE_BACKENDS}")
         self.meta = meta
         self.data = None
         self.clean_data = None
         self.index = None
+        self._raw_data_future = None
+        self._raw_data_request = None
         self.data_path = data_path.rstrip("/") + "/"
         self.decennial_census_year = decennial_census_year
         self.verbose = verbose
+        self.disaggregation = disaggregation
+        self.backend = backend
+        self.load_data_kwargs = {} if load_data_kwargs is None else dict(load_data_kwargs)
+        self.loaded_features = None
+        self.checkpoint = checkpoint
         if feature_cache_path is None:
             self.feature_cache_path = "cache"
         else:
@@ -140,6 +230,63 @@ class Feature:
         """
         raise NotImplementedError("load_data() must be implemented")
 
+    def read_raw_data(self, sample_rows: Optional[int] = None) -> pd.DataFrame:
+        """Reads and parses the raw source file, without any geolocation
+
+        Features that declare SOURCE_SCHEMA get read_source_csv() here. Others can override it, which lets the read be
+        prefetched on a background thread with prefetch_raw_data(). load_data() should get its raw frame from
+        self.fetch_raw_data() so it picks up a prefetched result.
+        """
+        if self.SOURCE_SCHEMA is None:
+            raise NotImplementedError("read_raw_data() must be implemented to support prefetching")
+        return self.read_source_csv(sample_rows)
+
+    def read_source_csv(
+        self,
+        sample_rows: Optional[int] = None,
+        filters: Sequence[Tuple] = (),
+        parse_dates: Sequence[str] = (),
+    ) -> pd.DataFrame:
+        """Reads the SOURCE_SCHEMA columns of meta["filename"] with typed parsing on the multithreaded Arrow reader, or
+        a lazy polars scan with backend="polars"
+
+        filters and parse_dates are passed to util_detroit.read_csv_columnar() (or read_csv_lazy())
+        """
+        read_csv = read_csv_lazy if self.backend == "polars" else read_csv_columnar
+        return read_csv(
+            self.data_path + self.meta.get("filename"),
+            columns=list(self.SOURCE_SCHEMA),
+            dtypes=self.SOURCE_SCHEMA,
+            sample_rows=sample_rows,
+            filters=filters,
+            parse_dates=parse_dates,
+        )
+
+    def points_from_source(self, df: pd.DataFrame) -> "gpd.GeoDataFrame":
+        """Point GeoDataFrame (epsg:4326) of raw source rows, from the POINT_COLUMNS coordinates"""
+        return points_to_gpd(df, *self.POINT_COLUMNS)
+
+    def prefetch_raw_data(self, executor: Executor, sample_rows: Optional[int] = None, **kwargs) -> Optional[Future]:
+        """Submits read_raw_data() to executor so the read overlaps with other work. No-op if it isn't implemented"""
+        if self.SOURCE_SCHEMA is None and type(self).read_raw_data is Feature.read_raw_data:
+            return None
+        self._raw_data_request = self._read_request(sample_rows, **kwargs)
+        self._raw_data_future = executor.submit(self.read_raw_data, sample_rows, **kwargs)
+        return self._raw_data_future
+
+    def fetch_raw_data(self, sample_rows: Optional[int] = None, **kwargs) -> pd.DataFrame:
+        """Returns the prefetched raw data if it was requested with the same arguments, otherwise reads it now"""
+        future, self._raw_data_future = self._raw_data_future, None
+        if future is not None and self._raw_data_request == self._read_request(sample_rows, **kwargs):
+            return future.result()
+        return self.read_raw_data(sample_rows, **kwargs)
+
+    def _read_request(self, *args, **kwargs) -> Dict:
+        """read_raw_data() arguments with defaults filled in, so equivalent calls compare equal"""
+        bound = inspect.signature(self.read_raw_data).bind(*args, **kwargs)
+        bound.apply_defaults()
+        return bound.arguments
+
     def cleanse_data(self):
         """This method should be where experimentation on the rough cleaned data happens
 
@@ -153,7 +300,21 @@ class Feature:
         raise NotImplementedError("clean_data() must be implemented")
 
     def generate_index(self, target_geo_grain: str) -> pd.Index:
-        """Reads in the census blocks in detroit and generates a pandas index for the target_geo_grain"""
+        """Reads in the census blocks in detroit and generates a pandas index for the target_geo_grain
+
+        For grid grains, the index is every cell that intersects a census block. For administrative grains
+        (neighborhood, council district, precinct) it is every geo in the city's polygons
+        """
+        from admin_geos import get_admin_geos, is_admin_grain
+        from detroit_geos import get_detroit_census_geos
+        from grid import get_grid_index, is_grid_grain
+
+        if is_grid_grain(target_geo_grain):
+            self.index = get_grid_index(target_geo_grain, self.decennial_census_year, self.data_path)
+            return
+        if is_admin_grain(target_geo_grain):
+            self.index = pd.Index(get_admin_geos(target_geo_grain, self.data_path).geo_id, name=target_geo_grain)
+            return
         geos = get_detroit_census_geos(
             self.decennial_census_year,
             data_path=self.data_path,
@@ -192,8 +353,24 @@ class Feature:
     def assign_geo_column(self, target_geo_grain: str) -> pd.DataFrame:
         """
         take block_id from self.clean_data and truncates or extends it to the desired granularity
-        """
 
+        For grid grains (e.g. "grid 250m", "hex 500m"), point features are binned by their coordinates instead, and
+        for administrative grains by the polygon they fall in
+        """
+        from admin_geos import is_admin_grain, point_to_admin_id
+        from detroit_geos import get_detroit_census_geos
+        from grid import is_grid_grain, point_to_cell_id
+
+        if is_grid_grain(target_geo_grain):
+            if not self.has_point_geometry():
+                raise ValueError("Only features with point geometries can be binned to grid grains")
+            return self.clean_data.assign(geo=point_to_cell_id(self.clean_data.geometry, target_geo_grain))
+        if is_admin_grain(target_geo_grain):
+            if not self.has_point_geometry():
+                raise ValueError("Only features with point geometries can be binned to administrative grains")
+            return self.clean_data.assign(
+                geo=point_to_admin_id(self.clean_data.geometry, target_geo_grain, self.data_path)
+            )
         if target_geo_grain not in ("block", "block group", "tract"):
             raise ValueError("target_geo_grain must be one of 'block', 'block group', 'tract'")
         if self.clean_data.geo_id.dtype != "float64":
@@ -222,6 +399,200 @@ class Feature:
         else:
             return self.clean_data.assign(geo=lambda x: x.geo_id // (10 ** n_chars_from_target_to_min))
 
+    def count_by_geo(self, target_geo_grain: str, column: str, unique: bool = False) -> pd.Series:
+        """Non-null (or with unique, distinct) values of column per geo of assign_geo_column(target_geo_grain)
+
+        Same as assign_geo_column(target_geo_grain).groupby("geo")[column].count() (or .nunique()), which is what runs
+        with the pandas backend. With backend="polars" the groupby runs on polars' thread pool
+        """
+        geo_data = self.assign_geo_column(target_geo_grain)
+        if self.backend != "polars":
+            grouped = geo_data.groupby("geo")[column]
+            return grouped.nunique() if unique else grouped.count()
+        import polars as pl
+
+        values = pl.col(column).drop_nulls()
+        counts = (
+            pl.from_pandas(pd.DataFrame(geo_data.loc[:, ["geo", column]]))
+            .lazy()
+            .drop_nulls("geo")
+            .group_by("geo")
+            .agg(values.n_unique() if unique else values.count())
+            .sort("geo")
+            .collect()
+        )
+        return pd.Series(
+            counts[column].to_numpy().astype(np.int64),
+            index=pd.Index(counts["geo"].to_numpy(), name="geo"),
+            name=column,
+        )
+
+    def event_table(self) -> str:
+        """Table of this feature's events in an event_store.EventStore"""
+        return f"{type(self).__name__}_{self.decennial_census_year}"
+
+    def ingest_events(self, store: "EventStore", replace: bool = True, **load_data_kwargs) -> int:
+        """Loads and cleanses the data with load_data(**load_data_kwargs) and writes clean_data to event_table() in
+        store, so construct_feature_sql() and ad hoc queries can run in DuckDB. Returns the number of rows written
+        """
+        self.load_data(**load_data_kwargs)
+        self.cleanse_data()
+        return store.ingest(self.event_table(), self.clean_data, replace=replace)
+
+    def count_events_sql(
+        self,
+        store: "EventStore",
+        target_geo_grain: str,
+        where: str = "TRUE",
+        params: Sequence = (),
+        column: str = "oid",
+        unique: bool = False,
+    ) -> pd.Series:
+        """count_by_geo() over event_table() in store, with the where filter and the groupby run in DuckDB
+
+        Only for census grains no finer than min_geo_grain. Generates the index of target_geo_grain if needed, for
+        the reindex in construct_feature_sql()
+        """
+        if target_geo_grain not in ("block", "block group", "tract") or self.is_coarser_than(target_geo_grain):
+            raise ValueError("target_geo_grain must be a census grain no finer than min_geo_grain")
+        if (self.index is None) or (self.index.name != target_geo_grain):
+            self.generate_index(target_geo_grain)
+        n_chars_from_target_to_min = GEO_GRAIN_LEN_MAP.get(self.meta.get("min_geo_grain")) - GEO_GRAIN_LEN_MAP.get(
+            target_geo_grain
+        )
+        return store.count_by_geo(self.event_table(), n_chars_from_target_to_min, where, params, column, unique)
+
+    def block_crosswalk(self, target_geo_grain: str) -> "BlockCrosswalk":
+        """Area-weighted crosswalk from census blocks to a grid or administrative grain"""
+        from admin_geos import get_block_assignment, is_admin_grain
+        from grid import cell_block_crosswalk
+
+        if is_admin_grain(target_geo_grain):
+            return get_block_assignment(
+                target_geo_grain, self.decennial_census_year, self.data_path, cache_path=self.feature_cache_path
+            )
+        return cell_block_crosswalk(target_geo_grain, self.decennial_census_year, self.data_path)
+
+    def roll_up_blocks(self, block_feature: pd.DataFrame, target_geo_grain: str) -> pd.DataFrame:
+        """Rolls a block level output of construct_feature up to a grid or administrative grain
+
+        Counts are split across target geos by area share, meta["intensive_features"] are area-weighted means.
+        Block outputs of tract or block group features carry the whole coarse value on every block, so without
+        population disaggregation their counts are first split across the blocks of each geo by area share.
+        """
+        if self.meta.get("min_geo_grain") in ("tract", "block group") and self.disaggregation is None:
+            block_feature = self.split_across_blocks(block_feature)
+        rolled_up = self.block_crosswalk(target_geo_grain).convert(
+            block_feature, intensive_columns=self.meta.get("intensive_features", ())
+        )
+        rolled_up.index.name = target_geo_grain
+        return rolled_up
+
+    def split_across_blocks(self, block_feature: pd.DataFrame) -> pd.DataFrame:
+        """Splits the counts of a block output copied from min_geo_grain across its blocks by their share of its area
+
+        Columns in meta["intensive_features"] are left as copied.
+        """
+        from constants import AREA_CRS
+        from detroit_geos import get_detroit_census_geos
+
+        blocks = get_detroit_census_geos(self.decennial_census_year, self.data_path)
+        n_chars_from_block_to_min = GEO_GRAIN_LEN_MAP.get("block") - GEO_GRAIN_LEN_MAP.get(
+            self.meta.get("min_geo_grain")
+        )
+        area = pd.Series(blocks.to_crs(AREA_CRS).area.to_numpy(), index=blocks.geo_id.to_numpy(dtype=float))
+        share = (area / area.groupby(area.index // 10**n_chars_from_block_to_min).transform("sum")).reindex(
+            block_feature.index
+        )
+        if isinstance(block_feature, pd.Series):
+            if block_feature.name in self.meta.get("intensive_features", ()):
+                return block_feature
+            return block_feature * share
+        additive = ~block_feature.columns.isin(self.meta.get("intensive_features", ()))
+        split = block_feature.copy()
+        split.loc[:, additive] = block_feature.loc[:, additive].mul(share, axis=0)
+        return split
+
+    def has_point_geometry(self) -> bool:
+        return self.meta.get("min_geo_grain") == "lat/long" and "geometry" in self.clean_data.columns
+
+    def is_coarser_than(self, target_geo_grain: str) -> bool:
+        return GEO_GRAIN_LEN_MAP.get(self.meta.get("min_geo_grain")) < GEO_GRAIN_LEN_MAP.get(target_geo_grain)
+
+    def disaggregate(self, target_geo_grain: str, block_population: Optional[pd.Series] = None) -> pd.DataFrame:
+        """Dasymetric disaggregation of self.clean_data from min_geo_grain down to the finer target_geo_grain
+
+        Builds one sparse matrix of shape (target geos, source geos) from block populations, so the whole table is
+        disaggregated with a single product:
+            additive columns are split by each target's share of its source's population. Sources with no
+            population are split evenly across their blocks
+            columns in meta["intensive_features"] (incomes, rates) are broadcast to every target within the source
+
+        Arguments:
+            target_geo_grain -- one of "block", "block group", strictly finer than min_geo_grain
+            block_population -- population indexed by block geo_id. Loaded with the Population feature if None
+        """
+        from detroit_geos import get_detroit_census_geos
+        from scipy import sparse
+
+        if not self.is_coarser_than(target_geo_grain):
+            raise ValueError(f"target_geo_grain must be finer than {self.meta.get('min_geo_grain')}")
+        if self.clean_data.geo_id.duplicated().any():
+            raise ValueError("disaggregation requires one row per geo_id in clean_data")
+        if self.index is None or self.index.name != target_geo_grain:
+            self.generate_index(target_geo_grain)
+        if block_population is None:
+            block_population = self.get_block_population()
+
+        block_ids = get_detroit_census_geos(
+            self.decennial_census_year, self.data_path, return_polygons=False
+        ).geo_id.to_numpy(dtype=float)
+        population = block_population.reindex(block_ids).fillna(0).to_numpy(dtype=float)
+        n_chars_from_block_to_min = GEO_GRAIN_LEN_MAP.get("block") - GEO_GRAIN_LEN_MAP.get(
+            self.meta.get("min_geo_grain")
+        )
+        n_chars_from_block_to_target = GEO_GRAIN_LEN_MAP.get("block") - GEO_GRAIN_LEN_MAP.get(target_geo_grain)
+        source_ids = pd.Index(self.clean_data.geo_id)
+        rows = self.index.get_indexer(block_ids // 10**n_chars_from_block_to_target)
+        cols = source_ids.get_indexer(block_ids // 10**n_chars_from_block_to_min)
+        keep = (rows >= 0) & (cols >= 0)
+        rows, cols, population = rows[keep], cols[keep], population[keep]
+
+        source_population = np.bincount(cols, weights=population, minlength=len(source_ids))[cols]
+        source_blocks = np.bincount(cols, minlength=len(source_ids))[cols]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(source_population > 0, population / source_population, 1 / source_blocks)
+        shape = (len(self.index), len(source_ids))
+        # duplicate (row, col) entries are summed, which adds up the blocks of each target
+        additive = sparse.csr_matrix((share, (rows, cols)), shape=shape)
+        membership = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape).sign()
+
+        values = self.clean_data.drop(columns=["geo_id"]).select_dtypes("number")
+        is_intensive = values.columns.isin(self.meta.get("intensive_features", ()))
+        x = values.to_numpy(dtype=float)
+        out = np.empty((shape[0], x.shape[1]))
+        out[:, ~is_intensive] = additive @ x[:, ~is_intensive]
+        out[:, is_intensive] = membership @ x[:, is_intensive]
+        # targets without any source block are unknown rather than 0
+        out[np.asarray(membership.sum(axis=1)).ravel() == 0] = np.nan
+        return pd.DataFrame(out, index=self.index, columns=values.columns)
+
+    def get_block_population(self) -> pd.Series:
+        """Block population for self.decennial_census_year, from the Population feature cache if it exists"""
+        from features.population import Population
+
+        population = Population(
+            self.decennial_census_year,
+            population_data_path="population",
+            data_path=self.data_path,
+            feature_cache_path=self.feature_cache_path,
+            verbose=False,
+        )
+        try:
+            return population.load_cached_features("block").population
+        except FileNotFoundError:
+            return population.construct_feature("block").population
+
     def validate_cleansed_data(self):
         """
         Ensures loaded data has columns and datatypes required downstream
@@ -264,6 +635,8 @@ class Feature:
 
         Could easily be extended to use polygons to do this with geopandas.
         """
+        from detroit_geos import get_detroit_census_geos
+
         if target_geo_grain is None:
             target_geo_grain = self.meta.get("min_geo_grain")
         geos_in_detroit = get_detroit_census_geos(
@@ -276,28 +649,162 @@ class Feature:
         ).loc[:, ["geo_id"]]
         return pd.merge(df, geos_in_detroit, on="geo_id", how="inner")
 
-    def cache_features(self) -> BinaryIO:
-        """Creates a pickle file with a dict of the features at each grain"""
+    def checkpoint_dir(self, load_data_kwargs: Optional[Dict] = None) -> str:
+        """Checkpoint directory of a load with load_data_kwargs, by default the load configured on this feature
+
+        Keyed by load_data_kwargs (with defaults filled in), the feature's scalar settings (data_path, census year,
+        ...), the size and modification time of the source files, and the code of read_raw_data(), load_data() and
+        cleanse_data(). Changes anywhere else in the class, e.g. construct_feature(), keep the checkpoint
+        """
+        key = {
+            "load_data_kwargs": self._load_data_arguments(load_data_kwargs),
+            "settings": {
+                name: value
+                for name, value in vars(self).items()
+                if isinstance(value, (str, int, float, bool, type(None)))
+                and not name.startswith("_")
+                and name not in ("data", "clean_data", "index", "loaded_features", "verbose", "checkpoint")
+            },
+            "source": self.source_fingerprint(),
+            "code": [
+                inspect.getsource(inspect.unwrap(getattr(type(self), name)))
+                for name in ("read_raw_data", "load_data", "cleanse_data")
+            ],
+        }
+        digest = hashlib.md5(json.dumps(key, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+        return f"{self.feature_cache_path.rstrip('/')}/checkpoints/{type(self).__name__}_{digest}"
+
+    def source_fingerprint(self) -> Sequence[Tuple[str, int, int]]:
+        """(path, size, mtime_ns) of meta["filename"] in data_path and the files next to it with the same stem, like
+        the parts of a shapefile
+        """
+        filename = str(self.meta.get("filename"))
+        stem = os.path.splitext(self.data_path + filename)[0]
+        directory = os.path.dirname(stem) or "."
+        if not os.path.isdir(directory):
+            return []
+        paths = [
+            os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if os.path.splitext(os.path.join(directory, name))[0] == stem
+        ]
+        return [(path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths if os.path.isfile(path)]
+
+    def read_checkpoint(self, load_data_kwargs: Optional[Dict] = None) -> bool:
+        """Sets data and clean_data from checkpoint_dir(load_data_kwargs) if it exists. Returns whether it did"""
+        fn = self.checkpoint_dir(load_data_kwargs)
+        if not os.path.isdir(fn):
+            return False
+        self.data = read_parquet_frame(f"{fn}/data.parquet")
+        self.clean_data = read_parquet_frame(f"{fn}/clean_data.parquet")
+        if self.verbose:
+            print(f"read data and clean data from {fn}")
+        return True
+
+    def write_checkpoint(self, load_data_kwargs: Optional[Dict] = None) -> None:
+        """Writes data and clean_data to checkpoint_dir(load_data_kwargs) as parquet (GeoParquet for GeoDataFrames)
+
+        Frames parquet can't hold, e.g. with mixed type object columns, are warned about and not checkpointed
+        """
+        fn = self.checkpoint_dir(load_data_kwargs)
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=os.path.dirname(fn))
+        try:
+            self.data.to_parquet(f"{tmp_path}/data.parquet")
+            self.clean_data.to_parquet(f"{tmp_path}/clean_data.parquet")
+        except (TypeError, ValueError, NotImplementedError) as e:
+            shutil.rmtree(tmp_path)
+            warn(f"could not checkpoint {type(self).__name__}: {e}")
+            return
+        try:
+            os.replace(tmp_path, fn)
+        except OSError:
+            # the same checkpoint was written first by another process
+            shutil.rmtree(tmp_path)
+        if self.verbose:
+            print(f"wrote checkpoint to {fn}")
+
+    def load_data_kwargs_for(self, features: Optional[Sequence[str]] = None) -> Dict:
+        """load_data_kwargs, plus features when load_data() can restrict its read to them"""
+        if features is None or "features" not in inspect.signature(self.load_data).parameters:
+            return self.load_data_kwargs
+        return {**self.load_data_kwargs, "features": tuple(features)}
+
+    def has_loaded_features(self, features: Optional[Sequence[str]] = None) -> bool:
+        """Whether data was loaded for all of features (every feature if None)"""
+        if self.loaded_features is None:
+            return True
+        return features is not None and set(features) <= set(self.loaded_features)
+
+    def _load_data_arguments(self, load_data_kwargs: Optional[Dict] = None) -> Dict:
+        """load_data_kwargs with load_data()'s defaults filled in, so equivalent loads share a checkpoint"""
+        if load_data_kwargs is None:
+            load_data_kwargs = self.load_data_kwargs
+        bound = inspect.signature(self.load_data).bind(**load_data_kwargs)
+        bound.apply_defaults()
+        return dict(bound.arguments)
+
+    def cache_features(self, grains: Sequence[str] = ("block", "block group", "tract")) -> BinaryIO:
+        """Creates a pickle file with a dict of the features at each grain
+
+        Grains already in a cache written from the same class definition are kept, so grains can be built separately.
+        """
+        fn = self.cache_file()
         features = {}
-        class_definition_file = inspect.getfile(self.__class__)
-        with open(class_definition_file, "rt") as f:
-            features["class_definition_file_hash"] = hashlib.md5(f.read().encode("utf-8")).hexdigest()
-        for grain in ("block", "block group", "tract"):
+        class_definition_hash = self.class_definition_hash()
+        if os.path.isfile(fn):
+            with open(fn, "rb") as f:
+                cached = pickle.load(f)
+            if cached["class_definition_file_hash"] == class_definition_hash:
+                features = cached
+        features["class_definition_file_hash"] = class_definition_hash
+        for grain in grains:
             features[grain] = self.construct_feature(grain)
-        fn = f"{self.feature_cache_path}/{type(self).__name__}_{self.decennial_census_year}.pkl"
         os.makedirs(os.path.dirname(fn), exist_ok=True)
         with open(fn, "wb") as f:
             pickle.dump(features, f)
         if self.verbose:
             print(f"wrote features to {fn}")
 
-    def load_cached_features(self, target_geo_grain) -> Dict:
-        fn = f"{self.feature_cache_path}/{type(self).__name__}_{self.decennial_census_year}.pkl"
+    def cache_file(self) -> str:
+        return f"{self.feature_cache_path}/{type(self).__name__}_{self.decennial_census_year}.pkl"
 
+    def class_definition_hash(self) -> str:
         with open(inspect.getfile(self.__class__), "rt") as f:
-            current_hash = hashlib.md5(f.read().encode("utf-8")).hexdigest()
+            return hashlib.md5(f.read().encode("utf-8")).hexdigest()
+
+    def is_cache_fresh(self, grains: Sequence[str] = ("block", "block group", "tract")) -> bool:
+        """Whether the cache has every grain, was written from the current class definition and is newer than the
+        source file (when meta["filename"] is a file in data_path)
+        """
+        fn = self.cache_file()
+        if not os.path.isfile(fn):
+            return False
+        source = self.data_path + str(self.meta.get("filename"))
+        if os.path.isfile(source) and os.path.getmtime(source) > os.path.getmtime(fn):
+            return False
+        with open(fn, "rb") as f:
+            cached = pickle.load(f)
+        return cached["class_definition_file_hash"] == self.class_definition_hash() and all(
+            grain in cached for grain in grains
+        )
+
+    def load_cached_features(self, target_geo_grain) -> Dict:
+        """The cached features at target_geo_grain
+
+        Grid and administrative grains missing from the cache are rolled up from the cached block features by area
+        share, so counts are fractional even for point features. cache_features() those grains to bin the points.
+        """
+        fn = self.cache_file()
         with open(fn, "rb") as f:
             data = pickle.load(f)
-        if data["class_definition_file_hash"] != current_hash:
+        if data["class_definition_file_hash"] != self.class_definition_hash():
             warn(f"{fn} has changed since the cache was created\nYou may want to rerun self.cache_features()")
+        if target_geo_grain in data:
+            return data[target_geo_grain]
+        from admin_geos import is_admin_grain
+        from grid import is_grid_grain
+
+        if is_admin_grain(target_geo_grain) or is_grid_grain(target_geo_grain):
+            return self.roll_up_blocks(data["block"], target_geo_grain)
         return data[target_geo_grain]
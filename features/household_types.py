@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Optional
+from typing import Optional, Sequence
 
 import numpy as np
 import pandas as pd
@@ -41,7 +41,8 @@ class HouseholdTypes(Feature):
             **kwargs,
         )
 
-    def load_data(self):
+    def load_data(self, features: Optional[Sequence[str]] = None):
+        """features -- column labels (from the table's first row) to read along with the geo id, all of them if None"""
         # this is a smaller categorical file; we can read it in
         df = pd.read_csv(os.path.join(self.data_path + self.meta.get("filename")), nrows=2)
         if self.decennial_census_year == 2010:
@@ -56,6 +57,12 @@ class HouseholdTypes(Feature):
         elif self.decennial_census_year == 2020:
             cols = {}
             raise ValueError("Year must be 2010")
+        if features is not None:
+            missing = set(features) - set(cols.values())
+            if missing:
+                raise ValueError(f"unknown features {sorted(missing)}")
+            # only the requested columns are parsed
+            cols = {col: label for col, label in cols.items() if col == "GEO_ID" or label in features}
         data = (
             pd.read_csv(
                 os.path.join(self.data_path + self.meta.get("filename")),
@@ -71,7 +78,8 @@ class HouseholdTypes(Feature):
         data["geo_id"] = data["geo_id"].astype(float)
 
         # clean up Total column
-        data["Total"] = data["Total"].apply(lambda x: re.sub(r"\([^()]*\)", "", x)).astype(np.int64)
+        if "Total" in data.columns:
+            data["Total"] = data["Total"].apply(lambda x: re.sub(r"\([^()]*\)", "", x)).astype(np.int64)
         self.data = data
         self.data = self.remove_geos_outside_detroit(self.data)
 
@@ -83,8 +91,9 @@ class HouseholdTypes(Feature):
         return self.data.copy()
 
     @data_loader
-    def construct_feature(self, target_geo_grain: str) -> pd.Series:
-        housing_types = self.assign_geo_column(target_geo_grain).groupby("geo")[self.features].sum().reindex(self.index)
+    def construct_feature(self, target_geo_grain: str, features: Optional[Sequence[str]] = None) -> pd.Series:
+        features = self.features if features is None else list(features)
+        housing_types = self.assign_geo_column(target_geo_grain).groupby("geo")[features].sum().reindex(self.index)
 
         if self.verbose:
             print(
@@ -1,6 +1,5 @@
 from typing import Optional
 
-import geopandas as gpd
 import numpy as np
 import pandas as pd
 
@@ -14,8 +13,11 @@ class Households(Feature):
 
     def __init__(
         self,
+        decennial_census_year: Optional[int] = 2010,
         **kwargs,
     ) -> None:
+        if decennial_census_year != 2010:
+            raise ValueError("2019 ACS tracts are 2010 census tracts. Year must be 2010")
         super().__init__(
             meta={
                 "supported_features": ("households", "families", "married_families", "non_family_households"),
@@ -55,4 +57,6 @@ class Households(Feature):
 
     @data_loader
     def construct_feature(self, target_geo_grain: str = "block") -> pd.DataFrame:
+        if self.disaggregation == "population" and self.is_coarser_than(target_geo_grain):
+            return self.disaggregate(target_geo_grain)
         return self.assign_geo_column(target_geo_grain).set_index("geo").reindex(self.index).drop(columns=["geo_id"])
@@ -1,6 +1,5 @@
 from typing import Optional
 
-import geopandas as gpd
 import numpy as np
 import pandas as pd
 
@@ -14,11 +13,15 @@ class Income(Feature):
 
     def __init__(
         self,
+        decennial_census_year: Optional[int] = 2010,
         **kwargs,
     ) -> None:
+        if decennial_census_year != 2010:
+            raise ValueError("2019 ACS tracts are 2010 census tracts. Year must be 2010")
         super().__init__(
             meta={
                 "supported_features": ("mean_household_income", "per_capita_income"),
+                "intensive_features": ("per_capita_income", "per_household_income"),
                 "box_url": "https://bloombergdotorg.box.com/s/uuxakh9mt0b19zbadcyudoxyz1fufkhs",
                 "source_url": "https://data.census.gov/cedsci/table?q=income&g=0500000US26163%241400000",
                 "min_geo_grain": "tract",
@@ -57,4 +60,6 @@ class Income(Feature):
 
     @data_loader
     def construct_feature(self, target_geo_grain: str = "block") -> pd.DataFrame:
+        if self.disaggregation == "population" and self.is_coarser_than(target_geo_grain):
+            return self.disaggregate(target_geo_grain)
         return self.assign_geo_column(target_geo_grain).set_index("geo").reindex(self.index).drop(columns=["geo_id"])
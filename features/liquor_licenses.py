@@ -2,7 +2,6 @@ import re
 from logging import warn
 from typing import List, Optional, Union
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
@@ -19,7 +18,9 @@ class LiquorLicenses(Feature):
         "number",
         "ObjectId",
     ]
-    TYPES_LIQUOR_LICENSE = [float, float, int, str, str]
+    TYPES_LIQUOR_LICENSE = [float, float, int, str, str, int]
+    SOURCE_SCHEMA = dict(zip(COLS_LIQUOR_LICENSE, TYPES_LIQUOR_LICENSE))
+    POINT_COLUMNS = ("X", "Y")
 
     def __init__(
         self,
@@ -42,6 +43,10 @@ class LiquorLicenses(Feature):
         super_str = super().__repr__()
         return "Active Liquor Licenses\n\n" + super_str
 
+    def read_raw_data(self, sample_rows: Optional[int] = None) -> pd.DataFrame:
+        """Active licenses only, filtered in the reader before conversion to pandas"""
+        return self.read_source_csv(sample_rows, filters=[("status", "==", "Active")])
+
     def load_data(
         self,
         sample_rows: Optional[int] = None,
@@ -50,19 +55,9 @@ class LiquorLicenses(Feature):
         Number is the license id and should be used to filter out duplicates.
         """
 
-        df = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_LIQUOR_LICENSE,
-            dtype=dict(zip(self.COLS_LIQUOR_LICENSE, self.TYPES_LIQUOR_LICENSE)),
-        )
-
-        # Use only Active licenses
-        df = df[df.status == "Active"]
+        df = self.fetch_raw_data(sample_rows)
 
-        licenses = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.X, df.Y), crs="epsg:4326").rename(
-            columns={"ObjectId": "oid"}
-        )
+        licenses = self.points_from_source(df).rename(columns={"ObjectId": "oid"})
         licenses = (
             licenses.assign(
                 block_id=point_to_geo_id(
@@ -94,5 +89,5 @@ class LiquorLicenses(Feature):
 
         By default, will load and cleanse data if not already done
         """
-        stations = self.assign_geo_column(target_geo_grain).groupby("geo").number.nunique()
+        stations = self.count_by_geo(target_geo_grain, "number", unique=True)
         return stations.reindex(self.index).fillna(0).rename("liquor_licenses")
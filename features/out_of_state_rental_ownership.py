@@ -1,8 +1,7 @@
 from typing import Optional
 
-import geopandas as gpd
 import pandas as pd
-from util_detroit import point_to_geo_id
+from util_detroit import point_to_geo_id, points_to_gpd
 
 from features.feature_constructor import Feature, cleanse_decorator, data_loader
 
@@ -20,6 +19,7 @@ class OutOfStateRentalOwnership(Feature):
         super().__init__(
             meta={
                 "supported_features": ("out_of_state_rental_ownership",),
+                "intensive_features": ("out_of_state_rental_ownership",),
                 "box_url": "https://bloombergdotorg.box.com/s/a5vqlnjp0w7g6nkmndmcs54s4pd7zadj",
                 "source_url": "https://data.detroitmi.gov/datasets/detroitmi::rental-statuses-1/about",
                 "min_geo_grain": "lat/long",
@@ -33,7 +33,7 @@ class OutOfStateRentalOwnership(Feature):
         self,
     ) -> None:
         raw = pd.read_csv(self.meta.get("filename"))
-        df = gpd.GeoDataFrame(raw, geometry=gpd.points_from_xy(raw.X, raw.Y), crs="epsg:4326")
+        df = points_to_gpd(raw, "X", "Y")
         df = df.assign(
             geo_id=lambda df: point_to_geo_id(
                 df.loc[:, ["oid", "geometry"]],
@@ -1,9 +1,7 @@
 from logging import warn
 from typing import Optional
 
-import geopandas as gpd
 import pandas as pd
-from detroit_geos import get_detroit_census_geos
 from util_detroit import point_to_geo_id
 
 from features.population import Population, cleanse_decorator, data_loader
@@ -23,6 +21,7 @@ class PopulationDensity(Population):
         super().__init__(
             meta={
                 "supported_features": ("population_density",),
+                "intensive_features": ("population_density",),
                 "box_url": "Requires two files, specified in the superclass Population and get_detroit_census_geos",
                 "source_url": "Requires two files, specified in the superclass Population and get_detroit_census_geos",
                 "min_geo_grain": "block",
@@ -47,6 +46,8 @@ class PopulationDensity(Population):
         warn("No independent data source here. See Population class for details.")
 
     def construct_feature(self, target_geo_grain: str = "block") -> pd.DataFrame:
+        from detroit_geos import get_detroit_census_geos
+
         geo = get_detroit_census_geos(
             self.decennial_census_year,
             self.data_path,
@@ -1,8 +1,8 @@
 import re
 from logging import warn
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
-import geopandas as gpd
+import numpy as np
 import pandas as pd
 from util_detroit import point_to_geo_id
 
@@ -20,6 +20,8 @@ class ProjectGreenlightLocations(Feature):
         "ObjectId",
     ]
     TYPES_green_light_loc = [float, float, str, int, str, int]
+    SOURCE_SCHEMA = dict(zip(COLS_green_light_loc, TYPES_green_light_loc))
+    POINT_COLUMNS = ("X", "Y")
 
     def __init__(
         self,
@@ -54,16 +56,9 @@ class ProjectGreenlightLocations(Feature):
 
         # use a generator function to select rows we want in chunks rather than loading everything into memory at once
 
-        df = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_green_light_loc,
-            dtype=dict(zip(self.COLS_green_light_loc, self.TYPES_green_light_loc)),
-        )
+        df = self.fetch_raw_data(sample_rows)
 
-        locations = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.X, df.Y), crs="epsg:4326").rename(
-            columns={"ObjectId": "oid"}
-        )
+        locations = self.points_from_source(df).rename(columns={"ObjectId": "oid"})
 
         locations = (
             locations.assign(
@@ -96,3 +91,58 @@ class ProjectGreenlightLocations(Feature):
             self.assign_geo_column(target_geo_grain).groupby("geo").oid.count().rename("greenlights")
         )
         return green_light_locations.reindex(self.index).fillna(0)
+
+    def active_cameras(
+        self,
+        target_geo_grain: str,
+        freq: str = "D",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Cameras live in each geo by the end of each period, and cumulative camera-days since start
+
+        Both are geo x period frames, indexed like construct_feature() with one column per pd.Period of freq ("D" or
+        "M") from start to end (the first and last live dates by default). Event counts binned to the same periods
+        line up column for column, and camera-days within a period are the diff along columns.
+
+        Every camera is a +1 step at its live period, so the active counts are one np.add.at and a cumulative sum.
+        Camera-days through the end of period k are active[k] * end[k] minus the summed live days, the same sweep with
+        live days as the increments. Cameras live before start count from start.
+        """
+        if self.data is None:
+            self.load_data()
+        if self.clean_data is None:
+            self.cleanse_data()
+        if self.index is None or self.index.name != target_geo_grain:
+            self.generate_index(target_geo_grain)
+        located = self.assign_geo_column(target_geo_grain)
+        live_dates = pd.to_datetime(located.live_date, errors="coerce", utc=True).dt.tz_localize(None)
+        geo_position = self.index.get_indexer(located.geo)
+        keep = live_dates.notna().to_numpy() & (geo_position >= 0)
+        live_day = live_dates[keep].to_numpy().astype("datetime64[D]").astype(np.int64)
+        geo_position = geo_position[keep]
+
+        periods = pd.period_range(
+            start if start is not None else live_dates.min(), end if end is not None else live_dates.max(), freq=freq
+        )
+        first_day = periods[0].start_time.to_datetime64().astype("datetime64[D]").astype(np.int64)
+        # day after each period, relative to the first day
+        period_end = (periods + 1).start_time.to_numpy().astype("datetime64[D]").astype(np.int64) - first_day
+        live_day = np.maximum(live_day - first_day, 0)
+        live_period = np.searchsorted(period_end, live_day, side="right")
+        in_range = live_period < len(periods)
+
+        # int32 and in place sums, a daily block matrix is tens of millions of cells
+        shape = (len(self.index), len(periods))
+        active = np.zeros(shape, dtype=np.int32)
+        live_days = np.zeros(shape, dtype=np.int32)
+        np.add.at(active, (geo_position[in_range], live_period[in_range]), 1)
+        np.add.at(live_days, (geo_position[in_range], live_period[in_range]), live_day[in_range])
+        np.cumsum(active, axis=1, out=active)
+        np.cumsum(live_days, axis=1, out=live_days)
+        camera_days = active * period_end.astype(np.int32)
+        camera_days -= live_days
+        return (
+            pd.DataFrame(active, index=self.index, columns=periods),
+            pd.DataFrame(camera_days, index=self.index, columns=periods),
+        )
@@ -0,0 +1,79 @@
+"""Every Feature subclass that builds into the feature matrix, keyed by the columns it emits
+
+Classes are referenced as "module:Class" strings and only imported when a feature is made, so looking something up
+doesn't load every data dependency. Features whose columns depend on the source file (HouseholdTypes,
+HouseholdTypesAges) or that wrap another feature (EventKernelDensity) aren't registered.
+
+    make_feature("violence_calls", decennial_census_year=2010)
+    make_features(["population", "per_capita_income", "per_household_income"], decennial_census_year=2010)
+"""
+import importlib
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple, Type
+
+if TYPE_CHECKING:
+    from features.feature_constructor import Feature
+
+BOTH_YEARS = (2010, 2020)
+
+# output column -> ("module:Class", constructor kwargs used for builds, supported decennial census years)
+FEATURE_REGISTRY: Dict[str, Tuple[str, Dict, Tuple[int, ...]]] = {
+    "population": ("features.population:Population", {"population_data_path": "population"}, BOTH_YEARS),
+    "population_density": (
+        "features.population_density:PopulationDensity",
+        {"population_data_path": "population"},
+        BOTH_YEARS,
+    ),
+    # detroit assigns 2010 blocks to calls and crimes, mapping them to 2020 needs load_data(use_lat_long=True)
+    "violence_calls": ("features.violence_calls:ViolenceCalls", {}, (2010,)),
+    "rms_crime": ("features.rms_crime:RmsCrime", {}, (2010,)),
+    "per_capita_income": ("features.income:Income", {}, (2010,)),
+    "per_household_income": ("features.income:Income", {}, (2010,)),
+    "households": ("features.households:Households", {}, (2010,)),
+    "married_families": ("features.households:Households", {}, (2010,)),
+    "non_family_households": ("features.households:Households", {}, (2010,)),
+    "out_of_state_rental_ownership": (
+        "features.out_of_state_rental_ownership:OutOfStateRentalOwnership",
+        {},
+        BOTH_YEARS,
+    ),
+    "bus_stops": ("features.ddot_bus_stops:DDotBusStops", {}, BOTH_YEARS),
+    "smart_bus_stops": ("features.smart_bus_stops:SmartBusStops", {}, BOTH_YEARS),
+    "rental_counts": ("features.rental_statuses:RentalStatuses", {}, BOTH_YEARS),
+    "greenlights": ("features.project_green_light_locations:ProjectGreenlightLocations", {}, BOTH_YEARS),
+    "liquor_licenses": ("features.liquor_licenses:LiquorLicenses", {}, BOTH_YEARS),
+    "vacant_properties": ("features.vacant_property_registrations:VacantPropertyRegistrations", {}, BOTH_YEARS),
+}
+
+
+def import_feature_class(class_path: str) -> Type["Feature"]:
+    module_name, class_name = class_path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def registered_classes(columns: Sequence[str] = None) -> List[Tuple[str, Dict, Tuple[int, ...]]]:
+    """Unique ("module:Class", kwargs, years) entries that emit columns (every registered column if None), in registry
+    order
+    """
+    if columns is None:
+        columns = list(FEATURE_REGISTRY)
+    unknown = [column for column in columns if column not in FEATURE_REGISTRY]
+    if unknown:
+        raise ValueError(f"No registered feature emits {unknown}")
+    entries = []
+    for column in FEATURE_REGISTRY:
+        if column in columns and FEATURE_REGISTRY[column] not in entries:
+            entries.append(FEATURE_REGISTRY[column])
+    return entries
+
+
+def make_feature(column: str, decennial_census_year: int, **kwargs) -> "Feature":
+    """Instance of the feature that emits column, built with the registry kwargs updated by kwargs"""
+    return make_features([column], decennial_census_year, **kwargs)[0]
+
+
+def make_features(columns: Sequence[str], decennial_census_year: int, **kwargs) -> List["Feature"]:
+    """One instance per feature class needed for columns, ready for util_detroit.concatenate_features"""
+    return [
+        import_feature_class(class_path)(decennial_census_year=decennial_census_year, **{**registry_kwargs, **kwargs})
+        for class_path, registry_kwargs, _ in registered_classes(columns)
+    ]
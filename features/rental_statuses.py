@@ -2,7 +2,6 @@ import re
 from logging import warn
 from typing import List, Optional, Union
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
@@ -19,6 +18,8 @@ class RentalStatuses(Feature):
         "oid",
     ]
     TYPES_RENTALS = [float, float, str, str, int]
+    SOURCE_SCHEMA = dict(zip(COLS_RENTALS, TYPES_RENTALS))
+    POINT_COLUMNS = ("X", "Y")
 
     def __init__(
         self,
@@ -47,14 +48,9 @@ class RentalStatuses(Feature):
         kept record_type but unsure how to use it yet, has 3 values: Registion Only, Initial Registration, and Renewal Registration
         """
 
-        df = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_RENTALS,
-            dtype=dict(zip(self.COLS_RENTALS, self.TYPES_RENTALS)),
-        )
+        df = self.fetch_raw_data(sample_rows)
 
-        rentals = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.X, df.Y), crs="epsg:4326")
+        rentals = self.points_from_source(df)
         self.data = rentals.assign(
             geo_id=point_to_geo_id(
                 rentals.loc[:, ["oid", "geometry"]],
@@ -80,5 +76,5 @@ class RentalStatuses(Feature):
 
         By default, will load and cleanse data if not already done
         """
-        rentals = self.assign_geo_column(target_geo_grain).groupby("geo").oid.count().rename("rental_counts")
+        rentals = self.count_by_geo(target_geo_grain, "oid").rename("rental_counts")
         return rentals.reindex(self.index).fillna(0)
@@ -1,13 +1,15 @@
 import re
 from logging import warn
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
 from features.feature_constructor import Feature, cleanse_decorator, data_loader
 
+if TYPE_CHECKING:
+    from event_store import EventStore
+
 
 class RmsCrime(Feature):
     """A count of violent rms crime incidents in detroit"""
@@ -73,20 +75,27 @@ class RmsCrime(Feature):
         self,
         sample_rows: Optional[int] = None,
         use_lat_long: bool = False,
+        geolocation_jobs: int = 1,
+        all_offenses: bool = False,
     ) -> None:
         """Bring in the granular data as an attribute of the class of type gpd.GeoDataframe: self.data
 
         Arguments:
             sample_rows -- This is a big file (~4M rows). Getting 100k rows is enough to play with, but defaults to full load
             use_lat_long -- use coordinates and census tracts rather than assigned ID. If using 2010 census, it's more accurate to use their block_id
+            geolocation_jobs -- processes for point_to_geo_id with use_lat_long, worth it for millions of rows
+            all_offenses -- keep every offense rather than those matching WHITELIST_STRINGS, e.g. for ingest_events()
 
         arrest codes for michigan can be found at https://www.michigan.gov/documents/MICRArrestCodes_June06_163082_7.pdf
         """
 
+        import geopandas as gpd
+
         expr = re.compile("|".join(self.WHITELIST_STRINGS))
         raw = gpd.read_file(self.data_path + self.meta.get("filename"), rows=sample_rows)
         raw.columns = self.COLNAMES
-        df = raw.loc[lambda x: x.offense_description.fillna("").str.contains(expr), self.COLS_TO_KEEP]
+        is_whitelisted = raw.offense_description.fillna("").str.contains(expr) | all_offenses
+        df = raw.loc[is_whitelisted, self.COLS_TO_KEEP]
 
         if use_lat_long:
             if self.decennial_census_year == 2010:
@@ -95,6 +104,8 @@ class RmsCrime(Feature):
                 geo_id=point_to_geo_id(
                     df.loc[:, ["oid", "geometry"]],
                     self.decennial_census_year,
+                    n_jobs=geolocation_jobs,
+                    cache_path=self.feature_cache_path,
                 )
             )
         else:
@@ -125,3 +136,12 @@ class RmsCrime(Feature):
         if "rms_crime" in features:
             n_rms_crimes = self.assign_geo_column(target_geo_grain).groupby("geo").oid.count()
             return n_rms_crimes.reindex(self.index).to_frame(name="rms_crime").fillna(0)
+
+    def construct_feature_sql(self, store: "EventStore", target_geo_grain: str) -> pd.DataFrame:
+        """construct_feature() from the incidents in an EventStore, ingested with all_offenses=True. The whitelist filter
+        and the count by geo run in DuckDB, so nothing is loaded into pandas
+        """
+        n_rms_crimes = self.count_events_sql(
+            store, target_geo_grain, "regexp_matches(offense_description, ?)", ["|".join(self.WHITELIST_STRINGS)]
+        )
+        return n_rms_crimes.reindex(self.index).to_frame(name="rms_crime").fillna(0)
@@ -2,7 +2,6 @@ import re
 from logging import warn
 from typing import List, Optional, Union
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
@@ -17,6 +16,8 @@ class SmartBusStops(Feature):
         "stop_id",
     ]
     TYPES_bus_stops = [float, float, int]
+    SOURCE_SCHEMA = dict(zip(COLS_bus_stops, TYPES_bus_stops))
+    POINT_COLUMNS = ("stop_lon", "stop_lat")
 
     def __init__(
         self,
@@ -48,16 +49,9 @@ class SmartBusStops(Feature):
 
         # use a generator function to select rows we want in chunks rather than loading everything into memory at once
 
-        df = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_bus_stops,
-            dtype=dict(zip(self.COLS_bus_stops, self.TYPES_bus_stops)),
-        )
+        df = self.fetch_raw_data(sample_rows)
 
-        stops = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.stop_lon, df.stop_lat), crs="epsg:4326").rename(
-            columns={"stop_id": "oid"}
-        )
+        stops = self.points_from_source(df).rename(columns={"stop_id": "oid"})
         stops = (
             stops.assign(
                 block_id=point_to_geo_id(
@@ -2,7 +2,6 @@ import re
 from logging import warn
 from typing import List, Optional, Union
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
@@ -18,6 +17,9 @@ class VacantPropertyRegistrations(Feature):
         "date_status",
         "ObjectId",
     ]
+    TYPES_VACANT_PROPERTIES = [float, float, str, str, int]
+    SOURCE_SCHEMA = dict(zip(COLS_VACANT_PROPERTIES, TYPES_VACANT_PROPERTIES))
+    POINT_COLUMNS = ("lon", "lat")
 
     def __init__(
         self,
@@ -43,15 +45,9 @@ class VacantPropertyRegistrations(Feature):
         sample_rows: Optional[int] = None,
     ) -> None:
 
-        df = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_VACANT_PROPERTIES,
-        )
+        df = self.fetch_raw_data(sample_rows)
 
-        registrations = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.lon, df.lat), crs="epsg:4326").rename(
-            columns={"ObjectId": "oid"}
-        )
+        registrations = self.points_from_source(df).rename(columns={"ObjectId": "oid"})
         registrations = (
             registrations.assign(
                 block_id=point_to_geo_id(
@@ -83,5 +79,5 @@ class VacantPropertyRegistrations(Feature):
 
         By default, will load and cleanse data if not already done
         """
-        stations = self.assign_geo_column(target_geo_grain).groupby("geo").oid.count()
+        stations = self.count_by_geo(target_geo_grain, "oid")
         return stations.reindex(self.index).fillna(0).rename("vacant_properties")
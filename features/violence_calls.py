@@ -1,13 +1,15 @@
 import re
 from logging import warn
-from typing import List, Optional, Tuple, Union
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
-import geopandas as gpd
 import pandas as pd
 from util_detroit import point_to_geo_id
 
 from features.feature_constructor import Feature, cleanse_decorator, data_loader
 
+if TYPE_CHECKING:
+    from event_store import EventStore
+
 
 class ViolenceCalls(Feature):
     """A count of 911 calls received in the city of detroit"""
@@ -40,6 +42,8 @@ class ViolenceCalls(Feature):
         "latitude",
     ]
     TYPES_911 = [str, str, float, str, str, str, int, float, float]
+    SOURCE_SCHEMA = dict(zip(COLS_911, TYPES_911))
+    POINT_COLUMNS = ("longitude", "latitude")
 
     def __init__(
         self,
@@ -62,11 +66,37 @@ class ViolenceCalls(Feature):
         super_str = super().__repr__()
         return "Violence calls feature\n\n" + super_str
 
+    def read_raw_data(
+        self,
+        sample_rows: Optional[int] = None,
+        call_whitelist_strings: Optional[Union[List[str], str]] = "close_proxy",
+    ) -> pd.DataFrame:
+        """Calls whose description matches the whitelist, filtered in the Arrow reader before conversion to pandas.
+        All calls if call_whitelist_strings is None
+        """
+        call_whitelist_pattern = self.call_whitelist_pattern(call_whitelist_strings)
+        return self.read_source_csv(
+            sample_rows,
+            filters=[] if call_whitelist_pattern is None else [("calldescription", "contains", call_whitelist_pattern)],
+            parse_dates=["call_timestamp"],
+        )
+
+    def call_whitelist_pattern(self, call_whitelist_strings: Optional[Union[List[str], str]]) -> Optional[str]:
+        """Regex matching descriptions of whitelisted calls, None for no whitelist"""
+        if call_whitelist_strings is None:
+            return None
+        if call_whitelist_strings == "close_proxy":
+            call_whitelist_strings = self.CLOSE_PROXY_CALL_STRINGS
+        elif call_whitelist_strings == "near_proxy":
+            call_whitelist_strings = self.NEAR_PROXY_CALL_STRINGS + self.CLOSE_PROXY_CALL_STRINGS
+        return "|".join(call_whitelist_strings)
+
     def load_data(
         self,
         sample_rows: Optional[int] = None,
         use_lat_long: bool = False,
         call_whitelist_strings: Optional[Union[List[str], str]] = "close_proxy",
+        geolocation_jobs: int = 1,
     ) -> None:
         """Bring in the granular data as an attribute of the class of type gpd.GeoDataframe: self.data
 
@@ -74,32 +104,12 @@ class ViolenceCalls(Feature):
             sample_rows -- This is a big file (~4M rows). Getting 100k rows is enough to play with, but defaults to full load
             use_lat_long -- use coordinates and census tracts rather than assigned ID. If using 2010 census, it's more accurate to use their block_id
             call_whitelist_strings: determines the whitelist filter on call descriptions. Pass 'close_proxy', 'near_proxy', or a list of custom whitelist strings
+                None keeps all calls, e.g. for ingest_events()
+            geolocation_jobs -- processes for point_to_geo_id with use_lat_long, worth it for millions of rows
         """
 
-        # use a generator function to select rows we want in chunks rather than loading everything into memory at once
-
-        if call_whitelist_strings == "close_proxy":
-            call_whitelist_strings = self.CLOSE_PROXY_CALL_STRINGS
-        elif call_whitelist_strings == "near_proxy":
-            call_whitelist_strings = self.NEAR_PROXY_CALL_STRINGS + self.CLOSE_PROXY_CALL_STRINGS
-        expr = re.compile("|".join(call_whitelist_strings))
-        generator = pd.read_csv(
-            self.data_path + self.meta.get("filename"),
-            nrows=sample_rows,
-            usecols=self.COLS_911,
-            parse_dates=["call_timestamp"],
-            chunksize=1e4,
-            dtype=dict(zip(self.COLS_911, self.TYPES_911)),
-        )
-
-        calls = pd.concat(
-            [x.loc[lambda x: x.calldescription.str.contains(expr)] for x in generator],
-            ignore_index=True,
-        )
-
-        calls = gpd.GeoDataFrame(
-            calls, geometry=gpd.points_from_xy(calls.longitude, calls.latitude), crs="epsg:4326"
-        ).rename(columns={"block_id": "geo_id"})
+        calls = self.fetch_raw_data(sample_rows, call_whitelist_strings=call_whitelist_strings)
+        calls = self.points_from_source(calls).rename(columns={"block_id": "geo_id"})
         if use_lat_long:
             if self.decennial_census_year == 2010:
                 warn("More accurate to use their block_id for 2010 census context")
@@ -107,6 +117,8 @@ class ViolenceCalls(Feature):
                 geo_id=point_to_geo_id(
                     calls.loc[:, ["oid", "geometry"]],
                     self.decennial_census_year,
+                    n_jobs=geolocation_jobs,
+                    cache_path=self.feature_cache_path,
                 )
             )
         self.data = calls
@@ -132,5 +144,21 @@ class ViolenceCalls(Feature):
         if features is None:
             features = self.meta.get("supported_features")
         if "violence_calls" in features:
-            n_violent_calls = self.assign_geo_column(target_geo_grain).groupby("geo").oid.count()
+            n_violent_calls = self.count_by_geo(target_geo_grain, "oid")
             return n_violent_calls.reindex(self.index).to_frame(name="violence_calls").fillna(0)
+
+    def construct_feature_sql(
+        self,
+        store: "EventStore",
+        target_geo_grain: str,
+        call_whitelist_strings: Optional[Union[List[str], str]] = "close_proxy",
+    ) -> pd.DataFrame:
+        """construct_feature() from the calls in an EventStore, ingested with call_whitelist_strings=None. The whitelist
+        filter and the count by geo run in DuckDB, so nothing is loaded into pandas
+        """
+        where, params = "TRUE", []
+        call_whitelist_pattern = self.call_whitelist_pattern(call_whitelist_strings)
+        if call_whitelist_pattern is not None:
+            where, params = "regexp_matches(calldescription, ?)", [call_whitelist_pattern]
+        n_violent_calls = self.count_events_sql(store, target_geo_grain, where, params)
+        return n_violent_calls.reindex(self.index).to_frame(name="violence_calls").fillna(0)
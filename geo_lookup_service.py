@@ -0,0 +1,190 @@
+"""Long-lived local service that maps (x, y) points to census geo ids
+
+Loading census blocks and building their spatial index is the slow part of point_to_geo_id. This service does it once
+per census year and then answers lookups over HTTP on localhost, using only the standard library for transport.
+
+Run it with:
+    python geo_lookup_service.py --port 8765 --years 2010 2020 --data-path .
+
+and query it with GeoLookupClient:
+    client = GeoLookupClient(port=8765)
+    client.lookup(-83.05, 42.35, year=2010)
+    client.lookup_batch(xs, ys, year=2020)
+
+Endpoints:
+    GET  /health                          -> {"years": [2010, 2020]}
+    GET  /lookup?x=<lon>&y=<lat>&year=<y> -> {"block": ..., "block_group": ..., "tract": ...}
+    POST /lookup {"x": [...], "y": [...], "year": <y>} -> {"block": [...], "block_group": [...], "tract": [...]}
+
+Points outside every block return null ids.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+import geopandas as gpd
+import numpy as np
+from constants import GEO_GRAIN_LEN_MAP
+from detroit_geos import get_detroit_census_geos
+from shapely.geometry import Point
+
+from util_detroit import point_to_geo_id
+
+# response keys, and how many digits to drop from a block id to get there
+LOOKUP_GRAINS = {
+    "block": 0,
+    "block_group": GEO_GRAIN_LEN_MAP["block"] - GEO_GRAIN_LEN_MAP["block group"],
+    "tract": GEO_GRAIN_LEN_MAP["block"] - GEO_GRAIN_LEN_MAP["tract"],
+}
+
+
+class GeoLookup:
+    """Keeps census block polygons and their spatial index resident for each census year
+
+    Arguments:
+        years -- census years to load
+        data_path -- path to the census block data, passed to get_detroit_census_geos
+        blocks -- optional dict of census year to block GeoDataFrame, to avoid a load
+    """
+
+    def __init__(
+        self,
+        years: Sequence[int] = (2010, 2020),
+        data_path: Optional[str] = ".",
+        blocks: Optional[Dict[int, gpd.GeoDataFrame]] = None,
+    ) -> None:
+        if blocks is None:
+            blocks = {year: get_detroit_census_geos(year, data_path) for year in years}
+        self.blocks = {}
+        for year, df in blocks.items():
+            df = df.loc[:, ["geo_id", "geometry"]].reset_index(drop=True)
+            # build the spatial index now rather than on the first request
+            df.sindex
+            self.blocks[year] = df
+        self.block_ids = {year: df.geo_id.to_numpy() for year, df in self.blocks.items()}
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(self.blocks)
+
+    def _get_blocks(self, year: int) -> gpd.GeoDataFrame:
+        if year not in self.blocks:
+            raise ValueError(f"census year {year} not loaded, must be one of {self.years}")
+        return self.blocks[year]
+
+    def lookup(self, x: float, y: float, year: int) -> Dict[str, Optional[int]]:
+        """Geo ids for a single point, using the spatial index directly to skip the sjoin overhead"""
+        blocks = self._get_blocks(year)
+        matches = blocks.sindex.query(Point(x, y), predicate="within")
+        # points in more than one block get the smallest geo id, as in lookup_batch
+        block_id = np.min(self.block_ids[year][matches]) if len(matches) else np.nan
+        return {grain: _to_json_id(ids[0]) for grain, ids in _block_to_grains(np.array([block_id])).items()}
+
+    def lookup_batch(self, x: Iterable[float], y: Iterable[float], year: int) -> Dict[str, List[Optional[int]]]:
+        """Geo ids for many points at once, via point_to_geo_id"""
+        blocks = self._get_blocks(year)
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if x.shape != y.shape:
+            raise ValueError("x and y must be the same length")
+        points = gpd.GeoDataFrame({"oid": np.arange(len(x))}, geometry=gpd.points_from_xy(x, y), crs=blocks.crs)
+        block_ids = point_to_geo_id(points, year, blocks=blocks).to_numpy(dtype=float)
+        return {grain: [_to_json_id(v) for v in ids] for grain, ids in _block_to_grains(block_ids).items()}
+
+
+def _block_to_grains(block_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    return {grain: block_ids // 10**n_chars for grain, n_chars in LOOKUP_GRAINS.items()}
+
+
+def _to_json_id(geo_id: float) -> Optional[int]:
+    return None if np.isnan(geo_id) else int(geo_id)
+
+
+def make_handler(geo_lookup: GeoLookup):
+    class GeoLookupHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                return self._respond(200, {"years": geo_lookup.years})
+            if url.path != "/lookup":
+                return self._respond(404, {"error": f"unknown path {url.path}"})
+            query = parse_qs(url.query)
+            try:
+                result = geo_lookup.lookup(float(query["x"][0]), float(query["y"][0]), int(query["year"][0]))
+            except (KeyError, ValueError) as e:
+                return self._respond(400, {"error": str(e)})
+            self._respond(200, result)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/lookup":
+                return self._respond(404, {"error": f"unknown path {self.path}"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                result = geo_lookup.lookup_batch(body["x"], body["y"], int(body["year"]))
+            except (KeyError, ValueError, TypeError) as e:
+                return self._respond(400, {"error": str(e)})
+            self._respond(200, result)
+
+        def _respond(self, status: int, payload: Dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # one line per request is too chatty at high QPS
+            pass
+
+    return GeoLookupHandler
+
+
+def make_server(geo_lookup: GeoLookup, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Returns a threaded HTTP server for geo_lookup. port=0 picks a free port, see server.server_address"""
+    return ThreadingHTTPServer((host, port), make_handler(geo_lookup))
+
+
+def serve_in_thread(geo_lookup: GeoLookup, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Starts the service on a daemon thread, convenient in notebooks and tests. Stop it with server.shutdown()"""
+    server = make_server(geo_lookup, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class GeoLookupClient:
+    """Small client for the geo lookup service"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, timeout: float = 30) -> None:
+        self.url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def health(self) -> Dict:
+        with urlopen(f"{self.url}/health", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def lookup(self, x: float, y: float, year: int = 2020) -> Dict[str, Optional[int]]:
+        with urlopen(f"{self.url}/lookup?x={x!r}&y={y!r}&year={year}", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def lookup_batch(self, x: Iterable[float], y: Iterable[float], year: int = 2020) -> Dict[str, List[Optional[int]]]:
+        body = json.dumps({"x": [float(v) for v in x], "y": [float(v) for v in y], "year": year}).encode("utf-8")
+        request = Request(f"{self.url}/lookup", data=body, headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve lat/long to census geo id lookups on localhost")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--years", type=int, nargs="+", default=[2010, 2020])
+    parser.add_argument("--data-path", default=".")
+    args = parser.parse_args()
+
+    server = make_server(GeoLookup(args.years, args.data_path), args.host, args.port)
+    print(f"serving geo lookups for {args.years} on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
@@ -0,0 +1,178 @@
+"""Census polygons as flat, memory-mapped arrays, so processes share one copy and build shapely geometries on demand
+
+A store is a directory of .npy files in shapely's ragged array layout for multipolygons:
+    coords.npy            (n coordinates, 2) float64, every ring's vertices back to back
+    ring_offsets.npy      coordinate index where each ring starts, plus the total
+    part_offsets.npy      ring index where each polygon part starts, plus the total
+    geometry_offsets.npy  part index where each geo starts, plus the total
+    geo_ids.npy           float geo_id of each geo
+    bounds.npy            (n geos, 4) xmin, ymin, xmax, ymax of each geo
+and a meta.json with the crs. Arrays are opened with np.load(mmap_mode="r"): opening a store reads no coordinates, and
+every process that opens it shares the operating system's page cache instead of holding its own polygons. Bounding
+box queries run on the arrays alone. Only geometries() and to_gpd() build shapely objects, for just the geos asked for.
+
+    store = get_geometry_store(2010, "block")
+    nearby = store.query_bbox(-83.1, 42.33, -83.0, 42.36)
+    store.to_gpd(nearby)
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+GEOMETRY_STORE_ARRAYS = ("coords", "ring_offsets", "part_offsets", "geometry_offsets", "geo_ids", "bounds")
+
+
+class GeometryStore:
+    """Read-only view of a geometry store directory written by write_geometry_store()"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        for name in GEOMETRY_STORE_ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        with open(os.path.join(path, "meta.json"), "rt") as f:
+            self.crs = json.load(f)["crs"]
+
+    def __repr__(self) -> str:
+        return f"GeometryStore({self.path!r}): {len(self)} geos, {len(self.coords)} coordinates"
+
+    def __len__(self) -> int:
+        return len(self.geo_ids)
+
+    def query_bbox(self, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        """Positions of the geos whose bounding box intersects the box"""
+        b = self.bounds
+        return np.flatnonzero((b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin))
+
+    def locate(self, xy: np.ndarray, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Position of the geo containing each (x, y) point, -1 for none
+
+        Only the geos at positions candidates (all of them if None) are built and tested. Points inside more than one
+        geo get the one with the smallest geo_id.
+        """
+        import shapely
+
+        candidates = np.arange(len(self)) if candidates is None else np.asarray(candidates, dtype=np.int64)
+        positions = np.full(len(xy), -1, dtype=np.int64)
+        if len(candidates) == 0 or len(xy) == 0:
+            return positions
+        tree = shapely.STRtree(self.geometries(candidates))
+        point_index, geo_index = tree.query(shapely.points(xy), predicate="within")
+        # rank candidates by geo_id, so the smallest rank among a point's matches is the smallest geo_id
+        by_geo_id = np.argsort(np.asarray(self.geo_ids)[candidates], kind="stable")
+        rank = np.empty_like(by_geo_id)
+        rank[by_geo_id] = np.arange(len(by_geo_id))
+        matched = np.full(len(xy), len(candidates), dtype=np.int64)
+        np.minimum.at(matched, point_index, rank[geo_index])
+        found = matched < len(candidates)
+        positions[found] = candidates[by_geo_id[matched[found]]]
+        return positions
+
+    def geometries(self, index: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Shapely geometries of the geos at positions index (all of them if None). Single part geos are Polygons"""
+        import shapely
+
+        if index is None:
+            coords, offsets = self.coords, (self.ring_offsets, self.part_offsets, self.geometry_offsets)
+            n_parts = np.diff(self.geometry_offsets)
+        else:
+            coords, offsets, n_parts = self._gather(np.asarray(index, dtype=np.int64))
+        geometries = shapely.from_ragged_array(
+            shapely.GeometryType.MULTIPOLYGON, np.asarray(coords), tuple(np.asarray(o) for o in offsets)
+        )
+        single = n_parts == 1
+        geometries[single] = shapely.get_geometry(geometries[single], 0)
+        return geometries
+
+    def to_gpd(self, index: Optional[Sequence[int]] = None) -> "gpd.GeoDataFrame":
+        """GeoDataFrame with geo_id and geometry columns, like get_detroit_census_geos()"""
+        import geopandas as gpd
+
+        geo_ids = np.array(self.geo_ids if index is None else self.geo_ids[np.asarray(index, dtype=np.int64)])
+        return gpd.GeoDataFrame({"geo_id": geo_ids}, geometry=self.geometries(index), crs=self.crs)
+
+    def _gather(self, index: np.ndarray):
+        """Ragged arrays of just the geos at index, with offsets rebased to them"""
+        parts = _ranges(self.geometry_offsets[index], self.geometry_offsets[index + 1])
+        rings = _ranges(self.part_offsets[parts], self.part_offsets[parts + 1])
+        ring_lengths = self.ring_offsets[rings + 1] - self.ring_offsets[rings]
+        coords = self.coords[_ranges(self.ring_offsets[rings], self.ring_offsets[rings + 1])]
+        n_parts = self.geometry_offsets[index + 1] - self.geometry_offsets[index]
+        n_rings = self.part_offsets[parts + 1] - self.part_offsets[parts]
+        offsets = tuple(np.concatenate([[0], np.cumsum(n)]) for n in (ring_lengths, n_rings, n_parts))
+        return coords, offsets, n_parts
+
+
+def write_geometry_store(geos: "gpd.GeoDataFrame", path: str) -> GeometryStore:
+    """Writes the geo_id and (multi)polygon geometry of geos as a geometry store in the directory path
+
+    The store is written to a temporary directory and renamed into place, so processes never see a partial store.
+    """
+    import shapely
+
+    geometry_type, coords, offsets = shapely.to_ragged_array(geos.geometry.values)
+    if geometry_type == shapely.GeometryType.POLYGON:
+        offsets = (*offsets, np.arange(len(geos) + 1))
+    elif geometry_type != shapely.GeometryType.MULTIPOLYGON:
+        raise ValueError("geometries must be polygons or multipolygons")
+    arrays = {
+        "coords": coords,
+        "ring_offsets": offsets[0],
+        "part_offsets": offsets[1],
+        "geometry_offsets": offsets[2],
+        "geo_ids": geos.geo_id.to_numpy(dtype=float),
+        "bounds": shapely.bounds(geos.geometry.values),
+    }
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_path, "meta.json"), "wt") as f:
+        json.dump({"crs": None if geos.crs is None else geos.crs.to_string()}, f)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # another process finished the same store first
+        shutil.rmtree(tmp_path)
+    return GeometryStore(path)
+
+
+def get_geometry_store(
+    decennial_census_year: int,
+    target_geo_grain: str = "block",
+    data_path: Optional[str] = ".",
+    cache_path: Optional[str] = "cache",
+) -> GeometryStore:
+    """Opens the geometry store of a census year and grain in cache_path, writing it from get_detroit_census_geos on
+    first use
+    """
+    path = f"{cache_path.rstrip('/')}/geometry_{decennial_census_year}_{target_geo_grain.replace(' ', '_')}"
+    if os.path.isfile(os.path.join(path, "meta.json")):
+        return GeometryStore(path)
+    from detroit_geos import get_detroit_census_geos
+
+    geos = get_detroit_census_geos(decennial_census_year, data_path, target_geo_grain)
+    return write_geometry_store(geos, path)
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)]) without the loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    # step of 1 within a range, and a jump from the end of one range to the start of the next
+    steps = np.ones(total, dtype=np.int64)
+    range_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    nonempty = lengths > 0
+    steps[range_starts[nonempty]] = np.asarray(starts)[nonempty] - np.concatenate(
+        [[0], np.asarray(ends)[nonempty][:-1] - 1]
+    )
+    return np.cumsum(steps)
@@ -0,0 +1,175 @@
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from constants import AREA_CRS, GRID_BOUNDS
+from detroit_geos import get_detroit_census_geos
+from scipy import sparse
+from shapely.geometry import Polygon, box
+
+from crosswalk import BlockCrosswalk
+
+GRID_GRAIN_PATTERN = re.compile(r"^(grid|hex) (\d+(?:\.\d+)?)m$")
+# cell ids are row * GRID_ID_ROW_MULTIPLIER + col, so they stay floats like every other geo_id
+GRID_ID_ROW_MULTIPLIER = 10**5
+
+
+class GridSpec:
+    """A uniform grid of square or hexagonal cells over GRID_BOUNDS, in AREA_CRS (ground) meters
+
+    Grid grains are named "grid <size>m" (squares with sides of size meters) and "hex <size>m" (pointy-top hexagons
+    whose centers are size meters apart, i.e. flat-to-flat width of size). Binning a point is arithmetic on its
+    projected coordinates, no spatial join.
+    """
+
+    def __init__(self, target_geo_grain: str) -> None:
+        match = GRID_GRAIN_PATTERN.match(target_geo_grain)
+        if match is None:
+            raise ValueError("grid grains must look like 'grid 250m' or 'hex 250m'")
+        self.grain = target_geo_grain
+        self.kind = match.group(1)
+        self.cell_size = float(match.group(2))
+        self.x_min, self.y_min, self.x_max, self.y_max = GRID_BOUNDS
+        if self.kind == "grid":
+            self.n_cols = int(np.ceil((self.x_max - self.x_min) / self.cell_size))
+            self.n_rows = int(np.ceil((self.y_max - self.y_min) / self.cell_size))
+        else:
+            # circumradius of the hexagon
+            self.radius = self.cell_size / np.sqrt(3)
+            self.n_cols = int(np.ceil((self.x_max - self.x_min) / self.cell_size)) + 1
+            self.n_rows = int(np.ceil((self.y_max - self.y_min) / (1.5 * self.radius))) + 1
+        if max(self.n_cols, self.n_rows) >= GRID_ID_ROW_MULTIPLIER:
+            raise ValueError(f"cell size {self.cell_size:g}m is too small for the grid bounds")
+
+    def __repr__(self) -> str:
+        return f"{self.grain}: {self.n_rows} x {self.n_cols} cells"
+
+    def cell_ids(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Cell id of each projected point, nan outside of the grid"""
+        x = np.asarray(x, dtype=float) - self.x_min
+        y = np.asarray(y, dtype=float) - self.y_min
+        if self.kind == "grid":
+            col = np.floor(x / self.cell_size)
+            row = np.floor(y / self.cell_size)
+        else:
+            row, col = self._hex_row_col(x, y)
+        inside = (col >= 0) & (col < self.n_cols) & (row >= 0) & (row < self.n_rows)
+        return np.where(inside, row * GRID_ID_ROW_MULTIPLIER + col, np.nan)
+
+    def _hex_row_col(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pointy-top hex binning: fractional axial coordinates, cube rounding, then odd-row offset coordinates"""
+        q = (np.sqrt(3) / 3 * x - y / 3) / self.radius
+        r = (2 / 3 * y) / self.radius
+        s = -q - r
+        q_round, r_round, s_round = np.round(q), np.round(r), np.round(s)
+        q_diff, r_diff, s_diff = np.abs(q_round - q), np.abs(r_round - r), np.abs(s_round - s)
+        fix_q = (q_diff > r_diff) & (q_diff > s_diff)
+        fix_r = ~fix_q & (r_diff > s_diff)
+        q_round = np.where(fix_q, -r_round - s_round, q_round)
+        r_round = np.where(fix_r, -q_round - s_round, r_round)
+        col = q_round + (r_round - np.mod(r_round, 2)) / 2
+        return r_round, col
+
+    def cell_polygons(self, cell_ids: np.ndarray) -> gpd.GeoDataFrame:
+        cell_ids = np.asarray(cell_ids, dtype=float)
+        row, col = np.divmod(cell_ids, GRID_ID_ROW_MULTIPLIER)
+        if self.kind == "grid":
+            x0 = self.x_min + col * self.cell_size
+            y0 = self.y_min + row * self.cell_size
+            polygons = [box(x, y, x + self.cell_size, y + self.cell_size) for x, y in zip(x0, y0)]
+        else:
+            x_center = self.x_min + self.cell_size * (col + 0.5 * np.mod(row, 2))
+            y_center = self.y_min + 1.5 * self.radius * row
+            angles = np.radians(30 + 60 * np.arange(6))
+            dx, dy = self.radius * np.cos(angles), self.radius * np.sin(angles)
+            polygons = [Polygon(np.column_stack([x + dx, y + dy])) for x, y in zip(x_center, y_center)]
+        return gpd.GeoDataFrame({"geo_id": cell_ids}, geometry=polygons, crs=AREA_CRS)
+
+    def detroit_cells(self, decennial_census_year: int, data_path: Optional[str] = ".") -> gpd.GeoDataFrame:
+        """Polygons of every cell that intersects a census block, sorted by cell id"""
+        blocks = get_detroit_census_geos(decennial_census_year, data_path).to_crs(AREA_CRS)
+        x_min, y_min, x_max, y_max = blocks.total_bounds
+        # candidate cells from a bounding box grid of points spaced at half a cell, then exact intersection
+        step = self.cell_size / 2
+        xs, ys = np.meshgrid(
+            np.arange(x_min - step, x_max + 2 * step, step), np.arange(y_min - step, y_max + 2 * step, step)
+        )
+        candidates = np.unique(self.cell_ids(xs.ravel(), ys.ravel()))
+        cells = self.cell_polygons(candidates[~np.isnan(candidates)])
+        intersecting = gpd.sjoin(cells, blocks.loc[:, ["geometry"]], how="inner", predicate="intersects").index.unique()
+        return cells.loc[intersecting].sort_values("geo_id").reset_index(drop=True)
+
+
+def is_grid_grain(target_geo_grain: str) -> bool:
+    return isinstance(target_geo_grain, str) and GRID_GRAIN_PATTERN.match(target_geo_grain) is not None
+
+
+def lon_lat_to_area_crs(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """AREA_CRS coordinates of lon/lat arrays, with a reused transformer rather than reprojecting a GeoSeries"""
+    return _area_crs_transformer().transform(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+
+
+@lru_cache(maxsize=None)
+def _area_crs_transformer():
+    from pyproj import Transformer
+
+    return Transformer.from_crs("EPSG:4326", AREA_CRS, always_xy=True)
+
+
+def projected_xy(geometry: gpd.GeoSeries) -> Tuple[np.ndarray, np.ndarray]:
+    """Point coordinates in AREA_CRS meters, lon/lat if geometry has no crs"""
+    if geometry.crs is not None and geometry.crs.to_epsg() not in (4326, _area_crs_epsg()):
+        geometry = geometry.to_crs(AREA_CRS)
+    x, y = geometry.x.to_numpy(), geometry.y.to_numpy()
+    if geometry.crs is None or geometry.crs.to_epsg() == 4326:
+        return lon_lat_to_area_crs(x, y)
+    return x, y
+
+
+def _area_crs_epsg() -> int:
+    return int(AREA_CRS.split(":")[1])
+
+
+def point_to_cell_id(geometry: gpd.GeoSeries, target_geo_grain: str) -> pd.Series:
+    """Grid cell id for each point, indexed like geometry"""
+    x, y = projected_xy(geometry)
+    return pd.Series(GridSpec(target_geo_grain).cell_ids(x, y), index=geometry.index, name="geo_id")
+
+
+def get_grid_index(target_geo_grain: str, decennial_census_year: int, data_path: Optional[str] = ".") -> pd.Index:
+    cells = GridSpec(target_geo_grain).detroit_cells(decennial_census_year, data_path)
+    return pd.Index(cells.geo_id.to_numpy(), name=target_geo_grain)
+
+
+@lru_cache(maxsize=None)
+def cell_block_crosswalk(
+    target_geo_grain: str, decennial_census_year: int, data_path: Optional[str] = "."
+) -> BlockCrosswalk:
+    """Area-weighted crosswalk from census blocks to the cells of a grid grain
+
+    convert() on it takes block-level features to cells. reverse() takes cell-level features to blocks.
+    Memoized, since features at grid grains all share it.
+    """
+    blocks = get_detroit_census_geos(decennial_census_year, data_path).to_crs(AREA_CRS)
+    cells = GridSpec(target_geo_grain).detroit_cells(decennial_census_year, data_path)
+    pieces = gpd.overlay(
+        blocks.loc[:, ["geo_id", "geometry"]].rename(columns={"geo_id": "from_id"}),
+        cells.rename(columns={"geo_id": "to_id"}),
+        how="intersection",
+        keep_geom_type=True,
+    )
+    block_ids = blocks.geo_id.to_numpy(dtype=float)
+    cell_ids = cells.geo_id.to_numpy(dtype=float)
+    overlap = sparse.csr_matrix(
+        (
+            pieces.geometry.area.to_numpy(),
+            (pd.Index(cell_ids).get_indexer(pieces.to_id), pd.Index(block_ids).get_indexer(pieces.from_id)),
+        ),
+        shape=(len(cell_ids), len(block_ids)),
+    )
+    return BlockCrosswalk(
+        overlap, block_ids, cell_ids, decennial_census_year, decennial_census_year, "area", target_geo_grain
+    )
@@ -0,0 +1,211 @@
+"""Bootstrap and permutation inference for OLS fits on the transform_1 output, as batched linear algebra
+
+Every resample of an OLS fit is a reweighting of the same rows: a bootstrap draw gives row i the number of times it was
+drawn, a permutation reorders y. So instead of refitting in a loop:
+    bootstrap -- the p x p Gram matrices of a whole batch of draws are one matrix product, weights @ (x_i * x_j), and
+        the batch is solved with one stacked np.linalg.solve
+    permutation -- all permuted outcomes share X, so they are the columns of one right hand side of a single QR solve
+
+Batches run on a thread pool (BLAS releases the GIL), seeded per batch so results don't depend on n_jobs.
+
+    df, df0 = transform_1(feat_df)
+    draws = bootstrap(df, n_resamples=5000, cluster_grain="tract")
+    summarize_draws(draws, ols_coefficients(df))
+    permutation_test(df, n_permutations=5000)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from constants import GEO_GRAIN_LEN_MAP
+
+
+def design_matrix(
+    df: pd.DataFrame,
+    outcome: str = "call_rate",
+    columns: Optional[Sequence[str]] = None,
+    intercept: bool = True,
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """(y, X, column names) from a modeling frame like the transform_1 output, the patsy "outcome ~ a + b + ..." design
+
+    columns defaults to every column but the outcome. Rows must be complete, transform_1 output already is.
+    """
+    if columns is None:
+        columns = [c for c in df.columns if c != outcome]
+    y = df[outcome].to_numpy(dtype=float)
+    X = df.loc[:, list(columns)].to_numpy(dtype=float)
+    names = list(columns)
+    if intercept:
+        X = np.column_stack([np.ones(len(X)), X])
+        names = ["Intercept"] + names
+    if not (np.isfinite(y).all() and np.isfinite(X).all()):
+        raise ValueError("outcome and columns must not contain missing or infinite values")
+    return y, X, names
+
+
+def ols_coefficients(
+    df: pd.DataFrame, outcome: str = "call_rate", columns: Optional[Sequence[str]] = None, intercept: bool = True
+) -> pd.Series:
+    y, X, names = design_matrix(df, outcome, columns, intercept)
+    return pd.Series(np.linalg.lstsq(X, y, rcond=None)[0], index=names, name="coefficient")
+
+
+def spatial_clusters(geo_ids: Sequence[float], cluster_grain: str = "tract") -> np.ndarray:
+    """Cluster label of each geo: the id of the cluster_grain geo containing it, from the leading digits of the id"""
+    geo_ids = np.asarray(geo_ids, dtype=float)
+    n_digits = np.floor(np.log10(geo_ids)).astype(int) + 1
+    n_drop = n_digits - GEO_GRAIN_LEN_MAP.get(cluster_grain)
+    if (n_drop < 0).any():
+        raise ValueError(f"geo ids must be at the {cluster_grain} grain or finer")
+    return geo_ids // 10.0**n_drop
+
+
+def bootstrap(
+    df: pd.DataFrame,
+    outcome: str = "call_rate",
+    columns: Optional[Sequence[str]] = None,
+    n_resamples: int = 2000,
+    cluster_grain: Optional[str] = None,
+    clusters: Optional[Sequence] = None,
+    intercept: bool = True,
+    seed: int = 0,
+    n_jobs: Optional[int] = None,
+    batch_size: int = 256,
+) -> pd.DataFrame:
+    """OLS coefficients refit on n_resamples bootstrap draws of the rows of df, one row per draw
+
+    Arguments:
+        cluster_grain -- resample whole "tract"s or "block group"s of the geo_id index instead of single rows, the
+            spatial block bootstrap, so spatially correlated errors don't understate the spread
+        clusters -- cluster label of each row, for any other clustering (e.g. grid cells). Overrides cluster_grain
+        n_jobs -- threads solving batches in parallel, defaults to the number of cores
+        batch_size -- draws per batch, bounds memory at about batch_size * len(df) floats
+    """
+    y, X, names = design_matrix(df, outcome, columns, intercept)
+    if clusters is None and cluster_grain is not None:
+        clusters = spatial_clusters(df.index, cluster_grain)
+    if clusters is None:
+        cluster_index, n_clusters = np.arange(len(y)), len(y)
+    else:
+        labels, cluster_index = np.unique(np.asarray(clusters), return_inverse=True)
+        n_clusters = len(labels)
+
+    scale = _column_scale(X)
+    Xs = X / scale
+    n, p = Xs.shape
+    # row-wise outer products, so a batch of Gram matrices is a single product with the weights
+    xx = (Xs[:, :, None] * Xs[:, None, :]).reshape(n, p * p)
+    xy = Xs * y[:, None]
+
+    def solve_batch(rng: np.random.Generator, size: int) -> np.ndarray:
+        drawn = rng.integers(0, n_clusters, (size, n_clusters)) + n_clusters * np.arange(size)[:, None]
+        counts = np.bincount(drawn.ravel(), minlength=size * n_clusters).reshape(size, n_clusters)
+        weights = counts[:, cluster_index].astype(float)
+        gram = (weights @ xx).reshape(size, p, p)
+        return _solve_stacked(gram, weights @ xy)
+
+    draws = _run_batches(solve_batch, n_resamples, seed, n_jobs, batch_size) / scale
+    return pd.DataFrame(draws, columns=names)
+
+
+def permutation_test(
+    df: pd.DataFrame,
+    outcome: str = "call_rate",
+    columns: Optional[Sequence[str]] = None,
+    n_permutations: int = 2000,
+    intercept: bool = True,
+    seed: int = 0,
+    n_jobs: Optional[int] = None,
+    batch_size: int = 256,
+    return_null: bool = False,
+):
+    """Freedman-Lane permutation p-values for every OLS coefficient
+
+    For each coefficient, the residuals of the model without it are permuted and added back to that model's fitted
+    values, and the full model is refit on every permuted outcome at once. p-values are two-sided on the t statistic.
+    The intercept gets no p-value.
+
+    Returns a DataFrame with coefficient, t and p_value per column, and with return_null=True also the null t
+    statistics (n_permutations x columns).
+    """
+    y, X, names = design_matrix(df, outcome, columns, intercept)
+    n, p = X.shape
+    q, r = np.linalg.qr(X)
+    xtx_inv_diag = np.sum(np.linalg.inv(r) ** 2, axis=1)
+
+    def t_statistics(Y: np.ndarray) -> np.ndarray:
+        """t statistics of every coefficient, for every column of Y"""
+        qty = q.T @ Y
+        beta = np.linalg.solve(r, qty)
+        # residual sum of squares is what the projection onto X doesn't explain
+        rss = np.sum(Y**2, axis=0) - np.sum(qty**2, axis=0)
+        return beta / np.sqrt(np.outer(xtx_inv_diag, rss / (n - p)))
+
+    observed_beta = np.linalg.solve(r, q.T @ y)
+    observed_t = t_statistics(y[:, None])[:, 0]
+
+    # the intercept has no permutation null, permuting residuals can't move their mean
+    tested = [j for j in range(p) if not (intercept and j == 0)]
+    reduced = []
+    for j in tested:
+        Z = np.delete(X, j, axis=1)
+        fitted = Z @ np.linalg.lstsq(Z, y, rcond=None)[0]
+        reduced.append((fitted, y - fitted))
+
+    def permute_batch(rng: np.random.Generator, size: int) -> np.ndarray:
+        orders = np.argsort(rng.random((size, n)), axis=1)
+        null_t = np.full((size, p), np.nan)
+        for j, (fitted, residuals) in zip(tested, reduced):
+            null_t[:, j] = t_statistics(fitted[:, None] + residuals[orders].T)[j]
+        return null_t
+
+    null_t = _run_batches(permute_batch, n_permutations, seed, n_jobs, batch_size)
+    p_values = (1 + np.sum(np.abs(null_t) >= np.abs(observed_t), axis=0)) / (1 + n_permutations)
+    p_values[np.isnan(null_t[0])] = np.nan
+    summary = pd.DataFrame({"coefficient": observed_beta, "t": observed_t, "p_value": p_values}, index=names)
+    if return_null:
+        return summary, pd.DataFrame(null_t, columns=names)
+    return summary
+
+
+def summarize_draws(draws: pd.DataFrame, estimate: Optional[pd.Series] = None, alpha: float = 0.05) -> pd.DataFrame:
+    """Bootstrap standard errors and percentile confidence intervals, one row per coefficient"""
+    summary = pd.DataFrame(
+        {
+            "std_error": draws.std(ddof=1),
+            f"ci_{alpha / 2:g}": draws.quantile(alpha / 2),
+            f"ci_{1 - alpha / 2:g}": draws.quantile(1 - alpha / 2),
+        }
+    )
+    if estimate is not None:
+        summary.insert(0, "coefficient", estimate.reindex(summary.index))
+    return summary
+
+
+def _column_scale(X: np.ndarray) -> np.ndarray:
+    """Column norms (1 for all zero columns), dividing by them keeps the Gram matrices well conditioned"""
+    scale = np.sqrt(np.sum(X**2, axis=0) / len(X))
+    return np.where(scale > 0, scale, 1.0)
+
+
+def _solve_stacked(gram: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+    """Solves gram[b] @ beta[b] = rhs[b] for every b, with a pseudo-inverse for batches with a singular draw"""
+    try:
+        return np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(gram) @ rhs[:, :, None])[:, :, 0]
+
+
+def _run_batches(
+    solve_batch: Callable[[np.random.Generator, int], np.ndarray],
+    n_total: int,
+    seed: int,
+    n_jobs: Optional[int],
+    batch_size: int,
+) -> np.ndarray:
+    """Stacks solve_batch(rng, size) over batches covering n_total draws, each batch with its own seeded generator"""
+    sizes = [min(batch_size, n_total - start) for start in range(0, n_total, batch_size)]
+    generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(len(sizes))]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return np.concatenate(list(executor.map(solve_batch, generators, sizes)), axis=0)
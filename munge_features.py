@@ -1,80 +1,188 @@
+import pickle
+from typing import BinaryIO, List, Optional, Sequence
+
 import numpy as np
 import pandas as pd
-from sklearn.impute import SimpleImputer
+
+COLS_TO_LOG_1 = [
+    "greenlight_density",
+    "rental_density",
+    "bus_density",
+    "per_household_income",
+    "liquor_license_density",
+    "vacant_property_density",
+]
+COLS_TO_DROP_1 = [
+    "population",
+    "violence_calls",
+    "households",
+    "married_families",
+    "non_family_households",
+    "smart_bus_stops",
+    "bus_stops",
+    "rental_counts",
+    "greenlights",
+    "area",
+    "per_capita_income",
+    "non_family_household_prop",
+    "liquor_licenses",
+    "vacant_properties",
+]
+# columns created by Transformer1, in the order transform_1 always assigned them
+DERIVED_COLS_1 = [
+    "call_rate",
+    "married_household_prop",
+    "non_family_household_prop",
+    "area",
+    "people_per_household",
+    "greenlight_density",
+    "rental_density",
+    "bus_density",
+    "per_household_income",
+    "vacant_property_density",
+    "liquor_license_density",
+]
+
+
+class Transformer1:
+    """Fitted version of transform_1: learns the imputation medians once, then applies them to any grain or year
+
+    fit() records the input column order, the medians used to impute raw features, and the medians used to impute the
+    derived (post-log) features. transform() reorders the input into one float matrix and does every step as numpy
+    array operations, so a frozen transformer applied to new geographies is reproducible and does not refit anything.
+
+    Arguments:
+        cols_to_log -- derived columns transformed with log(x + 1)
+        cols_to_drop -- columns dropped from the output, if present
+        call_rate_years -- number of years of 911 calls, used to convert violence_calls to calls per 1k people per year
+        min_population -- geos with fewer people are dropped
+    """
+
+    def __init__(
+        self,
+        cols_to_log: Sequence[str] = COLS_TO_LOG_1,
+        cols_to_drop: Sequence[str] = COLS_TO_DROP_1,
+        call_rate_years: float = 4.5,
+        min_population: int = 10,
+    ) -> None:
+        self.cols_to_log = list(cols_to_log)
+        self.cols_to_drop = list(cols_to_drop)
+        self.call_rate_years = call_rate_years
+        self.min_population = min_population
+        self.input_columns = None
+        self.input_medians = None
+        self.output_columns = None
+        self.output_medians = None
+
+    def __repr__(self) -> str:
+        if self.input_columns is None:
+            return "Transformer1, not fitted"
+        return f"Transformer1 fitted on {len(self.input_columns)} columns, returning {len(self.output_columns)} columns"
+
+    def fit(self, feat_df: pd.DataFrame) -> "Transformer1":
+        """Learns column order and imputation medians from feat_df, the concatenated output of feature classes"""
+        self.input_columns = list(feat_df.columns)
+        new_columns = [c for c in DERIVED_COLS_1 if c not in self.input_columns]
+        self.output_columns = [c for c in self.input_columns + new_columns if c not in self.cols_to_drop]
+
+        x = self._filtered_matrix(feat_df)[0]
+        self.input_medians = _nanmedian(x)
+        pre_log = self._derive(self._impute(x, self.input_medians))
+        self.output_medians = _nanmedian(self._log(pre_log))
+        return self
+
+    def transform(self, feat_df: pd.DataFrame, return_untransformed: bool = False):
+        """Applies the fitted transform to feat_df
+
+        Returns the modeling dataframe. With return_untransformed=True, also returns the derived features before the
+        log transform and second imputation, matching the (df, df0) return of transform_1.
+        """
+        if self.input_columns is None:
+            raise ValueError("Transformer1 must be fit before calling transform")
+        x, index = self._filtered_matrix(feat_df)
+        pre_log = self._derive(self._impute(x, self.input_medians))
+        out = self._impute(self._log(pre_log), self.output_medians)
+
+        df = pd.DataFrame(out, index=index, columns=self.output_columns)
+        if return_untransformed:
+            return df, pd.DataFrame(pre_log, index=index, columns=self.output_columns)
+        return df
+
+    def fit_transform(self, feat_df: pd.DataFrame, return_untransformed: bool = False):
+        return self.fit(feat_df).transform(feat_df, return_untransformed=return_untransformed)
+
+    def save(self, fn: str) -> BinaryIO:
+        """Pickles the fitted transformer to fn"""
+        with open(fn, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, fn: str) -> "Transformer1":
+        with open(fn, "rb") as f:
+            transformer = pickle.load(f)
+        if not isinstance(transformer, cls):
+            raise ValueError(f"{fn} does not contain a {cls.__name__}")
+        return transformer
+
+    def _filtered_matrix(self, feat_df: pd.DataFrame):
+        missing = [c for c in self.input_columns if c not in feat_df.columns]
+        if missing:
+            raise ValueError(f"feat_df is missing columns the transformer was fit on: {missing}")
+        x = feat_df.loc[:, self.input_columns].to_numpy(dtype=float)
+        col = self.input_columns.index
+        keep = (x[:, col("population")] >= self.min_population) & (x[:, col("households")] > 0)
+        return x[keep], feat_df.index[keep]
+
+    def _derive(self, x: np.ndarray) -> np.ndarray:
+        """Computes the derived columns and returns the output matrix in self.output_columns order"""
+        c = {name: x[:, i] for i, name in enumerate(self.input_columns)}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            area = c["population_density"] / c["population"]
+            c.update(
+                # Convert to calls per 1k people per year
+                call_rate=1000 * (c["violence_calls"] / c["population"]) / self.call_rate_years,
+                married_household_prop=np.nan_to_num(c["married_families"], nan=0) / c["households"],
+                non_family_household_prop=c["non_family_households"] / c["households"],
+                area=area,
+                people_per_household=np.minimum(c["population"] / c["households"], 5),
+                greenlight_density=c["greenlights"] / area,
+                rental_density=c["rental_counts"] / area,
+                bus_density=c["bus_stops"] / area,
+                vacant_property_density=c["vacant_properties"] / area,
+                liquor_license_density=c["liquor_licenses"] / area,
+            )
+        return np.column_stack([c[name] for name in self.output_columns])
+
+    def _log(self, x: np.ndarray) -> np.ndarray:
+        x = x.copy()
+        log_idx = [self.output_columns.index(name) for name in self.cols_to_log]
+        x[:, log_idx] = np.log(x[:, log_idx] + 1)
+        return x
+
+    @staticmethod
+    def _impute(x: np.ndarray, medians: np.ndarray) -> np.ndarray:
+        return np.where(np.isnan(x), medians, x)
+
+
+def _nanmedian(x: np.ndarray) -> np.ndarray:
+    """Column medians ignoring nans, without the all-nan RuntimeWarning"""
+    medians = np.full(x.shape[1], np.nan)
+    has_values = ~np.all(np.isnan(x), axis=0)
+    medians[has_values] = np.nanmedian(x[:, has_values], axis=0)
+    return medians
 
 
 def transform_1(
     feat_df,
-    cols_to_log=[
-        "greenlight_density",
-        "rental_density",
-        "bus_density",
-        "per_household_income",
-        "liquor_license_density",
-        "vacant_property_density",
-    ],
+    cols_to_log: Optional[List[str]] = COLS_TO_LOG_1,
 ):
     """The _1 is an id, just add transformers if you want to keep this one around
+
+    Fits a Transformer1 on feat_df and applies it. Use Transformer1 directly to reuse the fit on other data.
     Args:
         feat_df (pandas.DataFrame): The dataframe comprised of simply concatenated feature dataframes output by a feature class
     Returns:
         pd.DataFrame: A dataframe ready to modeling
+        pd.DataFrame: The derived features before the log transform
     """
-
-    df = feat_df.copy().loc[lambda x: (x.population >= 10) & (x.households > 0)]
-    imputer = SimpleImputer(strategy="median")
-
-    cols_with_nulls = df.isna().sum().loc[lambda x: x > 0].index
-    df.loc[:, cols_with_nulls] = imputer.fit_transform(
-        df.loc[
-            :,
-            cols_with_nulls,
-        ]
-    )
-
-    df0 = df.assign(
-        # Convert to calls per 1k people per year
-        call_rate=lambda x: 1000 * (x.violence_calls / x.population) / 4.5,
-        married_household_prop=lambda x: (x.married_families.fillna(0)) / x.households,
-        non_family_household_prop=lambda x: x.non_family_households / x.households,
-        area=lambda df: df.population_density / df.population,
-        people_per_household=lambda x: (x.population / x.households).clip(upper=5),
-        greenlight_density=lambda x: x.greenlights / x.area,
-        rental_density=lambda x: x.rental_counts / x.area,
-        bus_density=lambda x: x.bus_stops / x.area,
-        per_household_income=lambda x: x.per_household_income,
-        vacant_property_density=lambda x: x.vacant_properties / x.area,
-        liquor_license_density=lambda x: x.liquor_licenses / x.area,
-        # liquor_license_density=lambda x: pd.qcut(x.liquor_licenses / x.area, 3),
-    ).drop(
-        columns=[
-            "population",
-            "violence_calls",
-            "households",
-            "married_families",
-            "non_family_households",
-            "smart_bus_stops",
-            "bus_stops",
-            "rental_counts",
-            "greenlights",
-            "area",
-            "per_capita_income",
-            "non_family_household_prop",
-            "liquor_licenses",
-            "vacant_properties",
-        ]
-    )
-    df = df0.copy()
-    df[cols_to_log] = df[cols_to_log].apply(lambda x: np.log(x + 1))
-
-    cols_with_nulls = df.isna().sum().loc[lambda x: x > 0].index
-
-    if len(cols_with_nulls) > 0:
-        df.loc[:, cols_with_nulls] = imputer.fit_transform(
-            df.loc[
-                :,
-                cols_with_nulls,
-            ]
-        )
-
-    return df, df0
+    return Transformer1(cols_to_log=cols_to_log).fit_transform(feat_df, return_untransformed=True)
@@ -0,0 +1,198 @@
+import os
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from constants import AREA_CRS
+from detroit_geos import get_detroit_census_geos
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+GRAPH_KINDS = ("queen", "rook", "distance")
+
+
+class SpatialGraph:
+    """Neighbor graph over the census geos of one year and grain, stored as a CSR adjacency matrix
+
+    adjacency[i, j] == 1 when geo j is a neighbor of geo i. A geo is never its own neighbor.
+    Spatial lags of feature columns are sparse products, see self.lag().
+
+    Build with SpatialGraph.build() or get_spatial_graph(), which caches the result.
+
+    Arguments:
+        adjacency -- sparse matrix of shape (len(geo_ids), len(geo_ids))
+        geo_ids -- geo ids in row/column order
+        decennial_census_year -- census year of the geos
+        target_geo_grain -- grain of the geos
+        kind -- "queen", "rook" or "distance"
+        distance -- distance band in meters, for kind="distance"
+    """
+
+    def __init__(
+        self,
+        adjacency: sparse.spmatrix,
+        geo_ids: np.ndarray,
+        decennial_census_year: int,
+        target_geo_grain: str,
+        kind: str = "queen",
+        distance: Optional[float] = None,
+    ) -> None:
+        if adjacency.shape != (len(geo_ids), len(geo_ids)):
+            raise ValueError("adjacency must be of shape (len(geo_ids), len(geo_ids))")
+        self.adjacency = sparse.csr_matrix(adjacency)
+        self.geo_ids = np.asarray(geo_ids, dtype=float)
+        self.decennial_census_year = decennial_census_year
+        self.target_geo_grain = target_geo_grain
+        self.kind = kind
+        self.distance = distance
+
+    def __repr__(self) -> str:
+        kind = f"{self.distance:g}m distance band" if self.kind == "distance" else self.kind
+        n_neighbors = self.adjacency.nnz / max(len(self.geo_ids), 1)
+        return (
+            f"{kind} graph over {len(self.geo_ids)} {self.decennial_census_year} {self.target_geo_grain}s, "
+            f"{n_neighbors:.1f} neighbors on average"
+        )
+
+    @classmethod
+    def build(
+        cls,
+        decennial_census_year: int,
+        target_geo_grain: str,
+        kind: str = "queen",
+        distance: Optional[float] = None,
+        data_path: Optional[str] = ".",
+        geos: Optional[gpd.GeoDataFrame] = None,
+    ) -> "SpatialGraph":
+        """Builds the graph from the polygons returned by get_detroit_census_geos
+
+        Arguments:
+            kind -- "queen" neighbors share at least a point, "rook" neighbors share a boundary segment, "distance"
+                neighbors have centroids within distance meters of each other
+            distance -- distance band in meters, required for kind="distance"
+            geos -- optional GeoDataFrame with geo_id and geometry columns, to avoid a load
+        """
+        if kind not in GRAPH_KINDS:
+            raise ValueError(f"kind must be one of {GRAPH_KINDS}")
+        if (kind == "distance") != (distance is not None):
+            raise ValueError("distance must be passed if and only if kind='distance'")
+        if geos is None:
+            geos = get_detroit_census_geos(decennial_census_year, data_path, target_geo_grain)
+        geos = geos.to_crs(AREA_CRS).reset_index(drop=True)
+        n = geos.shape[0]
+
+        if kind == "distance":
+            tree = cKDTree(np.column_stack([geos.geometry.centroid.x, geos.geometry.centroid.y]))
+            pairs = tree.query_pairs(distance, output_type="ndarray")
+            left, right = np.concatenate([pairs[:, 0], pairs[:, 1]]), np.concatenate([pairs[:, 1], pairs[:, 0]])
+        else:
+            left, right = _query_bulk(geos.sindex, geos.geometry, "intersects")
+            not_self = left != right
+            left, right = left[not_self], right[not_self]
+            if kind == "rook":
+                boundary = geos.geometry.boundary
+                shared = boundary.iloc[left].reset_index(drop=True).intersection(
+                    boundary.iloc[right].reset_index(drop=True)
+                )
+                has_edge = shared.length.to_numpy() > 0
+                left, right = left[has_edge], right[has_edge]
+
+        adjacency = sparse.csr_matrix((np.ones(len(left)), (left, right)), shape=(n, n))
+        adjacency.sum_duplicates()
+        adjacency.data[:] = 1
+        return cls(adjacency, geos.geo_id.to_numpy(), decennial_census_year, target_geo_grain, kind, distance)
+
+    def save(self, fn: str) -> None:
+        np.savez_compressed(
+            fn,
+            data=self.adjacency.data,
+            indices=self.adjacency.indices,
+            indptr=self.adjacency.indptr,
+            geo_ids=self.geo_ids,
+            decennial_census_year=np.array(self.decennial_census_year),
+            target_geo_grain=np.array(self.target_geo_grain),
+            kind=np.array(self.kind),
+            distance=np.array(np.nan if self.distance is None else self.distance),
+        )
+
+    @classmethod
+    def load(cls, fn: str) -> "SpatialGraph":
+        with np.load(fn) as f:
+            n = len(f["geo_ids"])
+            distance = float(f["distance"])
+            return cls(
+                sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=(n, n)),
+                f["geo_ids"],
+                int(f["decennial_census_year"]),
+                str(f["target_geo_grain"]),
+                str(f["kind"]),
+                None if np.isnan(distance) else distance,
+            )
+
+    def n_neighbors(self) -> pd.Series:
+        return pd.Series(
+            np.diff(self.adjacency.indptr), index=pd.Index(self.geo_ids, name=self.target_geo_grain), name="n_neighbors"
+        )
+
+    def lag(self, df: pd.DataFrame, row_standardize: bool = True, suffix: str = "_lag") -> pd.DataFrame:
+        """Spatial lag of every column of df, indexed by geo_id at this graph's grain
+
+        row_standardize=True returns the mean over neighbors with a known value, otherwise the sum over neighbors
+        (treating unknown values as 0). Geos without neighbors get a null mean and a sum of 0.
+        """
+        is_series = isinstance(df, pd.Series)
+        df = df.to_frame() if is_series else df
+        x = df.reindex(self.geo_ids).to_numpy(dtype=float)
+        known = ~np.isnan(x)
+        lagged = self.adjacency @ np.where(known, x, 0)
+        if row_standardize:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                lagged = lagged / (self.adjacency @ known.astype(float))
+        lagged = pd.DataFrame(
+            lagged, index=pd.Index(self.geo_ids, name=df.index.name), columns=[f"{c}{suffix}" for c in df.columns]
+        )
+        return lagged.iloc[:, 0] if is_series else lagged
+
+
+def _query_bulk(sindex, geometry: gpd.GeoSeries, predicate: str):
+    """(input index, tree index) pairs, for geopandas versions before and after sindex.query accepted arrays"""
+    query_bulk = getattr(sindex, "query_bulk", None)
+    if query_bulk is not None:
+        return query_bulk(geometry, predicate=predicate)
+    return sindex.query(geometry, predicate=predicate)
+
+
+def get_spatial_graph(
+    decennial_census_year: int,
+    target_geo_grain: str,
+    kind: str = "queen",
+    distance: Optional[float] = None,
+    data_path: Optional[str] = ".",
+    cache_path: Optional[str] = "cache",
+) -> SpatialGraph:
+    """Loads the graph from cache_path, building and caching it on first use"""
+    # distance bands depend on the crs they were measured in, so caches from another AREA_CRS aren't reused
+    kind_name = f"distance{distance:g}_{AREA_CRS.split(':')[1]}" if kind == "distance" else kind
+    fn = f"{cache_path.rstrip('/')}/graph_{decennial_census_year}_{target_geo_grain.replace(' ', '_')}_{kind_name}.npz"
+    if os.path.isfile(fn):
+        return SpatialGraph.load(fn)
+    graph = SpatialGraph.build(decennial_census_year, target_geo_grain, kind, distance, data_path)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    graph.save(fn)
+    return graph
+
+
+def spatial_lag_features(
+    feature,
+    target_geo_grain: str,
+    kind: str = "queen",
+    distance: Optional[float] = None,
+    row_standardize: bool = True,
+    cache_path: Optional[str] = "cache",
+) -> pd.DataFrame:
+    """Spatial lag of a feature's cached output, e.g. the mean violence_calls of each block's neighbors"""
+    graph = get_spatial_graph(
+        feature.decennial_census_year, target_geo_grain, kind, distance, feature.data_path, cache_path
+    )
+    return graph.lag(feature.load_cached_features(target_geo_grain), row_standardize=row_standardize)
@@ -0,0 +1,174 @@
+import admin_geos
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from admin_geos import get_admin_geos, get_block_assignment, point_to_admin_id
+from features.feature_constructor import Feature, data_loader
+from shapely.geometry import box
+
+from crosswalk import BlockCrosswalk
+
+NEIGHBORHOOD = """
+  <Placemark>
+    <ExtendedData><SchemaData schemaUrl="#neighborhoods">
+        <SimpleData name="nhood_num">{nhood_num}</SimpleData>
+        <SimpleData name="council_district">{council_district}</SimpleData>
+    </SchemaData></ExtendedData>
+    <Polygon><outerBoundaryIs><LinearRing>
+        <coordinates>{west},42.3 {east},42.3 {east},42.4 {west},42.4 {west},42.3</coordinates>
+    </LinearRing></outerBoundaryIs></Polygon>
+  </Placemark>"""
+
+# three 0.05 degree wide neighborhoods side by side, the first two in council district 5
+KML = """<?xml version="1.0" encoding="utf-8" ?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+<Schema name="neighborhoods" id="neighborhoods">
+    <SimpleField name="nhood_num" type="int"></SimpleField>
+    <SimpleField name="council_district" type="int"></SimpleField>
+</Schema>
+<Folder>{placemarks}
+</Folder>
+</Document>
+</kml>
+""".format(
+    placemarks="".join(
+        NEIGHBORHOOD.format(nhood_num=nhood_num, council_district=council_district, west=west, east=east)
+        for nhood_num, council_district, west, east in [
+            (3, 5, -83.15, -83.1),
+            (1, 5, -83.1, -83.05),
+            (2, 6, -83.05, -83.0),
+        ]
+    )
+)
+
+BLOCK_IDS = [261635001001000.0, 261635001001001.0, 261635001001002.0]
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    (tmp_path / "Current_City_of_Detroit_Neighborhoods.kml").write_text(KML)
+    # the first block lies in neighborhood 1, the second straddles neighborhoods 1 and 2 evenly, the third is outside
+    blocks = gpd.GeoDataFrame(
+        {"geo_id": BLOCK_IDS},
+        geometry=[
+            box(-83.09, 42.31, -83.07, 42.33),
+            box(-83.06, 42.31, -83.04, 42.33),
+            box(-82.9, 42.31, -82.88, 42.33),
+        ],
+        crs="epsg:4326",
+    )
+    monkeypatch.setattr(admin_geos, "get_detroit_census_geos", lambda *args, **kwargs: blocks)
+    monkeypatch.setattr("detroit_geos.get_detroit_census_geos", lambda *args, **kwargs: blocks)
+    return str(tmp_path)
+
+
+class TestAdminGeos:
+    def test_get_admin_geos(self, data_path):
+        neighborhoods = get_admin_geos("neighborhood", data_path)
+        assert neighborhoods.geo_id.tolist() == [1.0, 2.0, 3.0]
+        districts = get_admin_geos("council district", data_path)
+        assert districts.geo_id.tolist() == [5.0, 6.0]
+        assert districts.geometry[0].normalize().equals(box(-83.15, 42.3, -83.05, 42.4).normalize())
+        with pytest.raises(ValueError):
+            get_admin_geos("ward", data_path)
+
+    def test_point_to_admin_id(self, data_path):
+        points = gpd.GeoSeries(
+            gpd.points_from_xy([-83.07, -83.03, -83.05, -82.9], [42.35] * 4), index=[10, 11, 12, 13], crs="epsg:4326"
+        )
+        geo_ids = point_to_admin_id(points, "neighborhood", data_path)
+        # the third point is on the border of neighborhoods 1 and 2, the fourth is outside the city
+        assert geo_ids.index.tolist() == [10, 11, 12, 13]
+        assert geo_ids.tolist()[:3] == [1.0, 2.0, 1.0]
+        assert np.isnan(geo_ids[13])
+
+    def test_block_assignment_and_cache(self, data_path, tmp_path, monkeypatch):
+        cache_path = str(tmp_path / "cache")
+        assignment = get_block_assignment("neighborhood", 2010, data_path, cache_path)
+        assert (tmp_path / "cache" / "assignment_2010_neighborhood.npz").is_file()
+        weights = pd.DataFrame(
+            assignment.additive_weights().toarray(), index=assignment.to_ids, columns=assignment.from_ids
+        )
+        assert weights[BLOCK_IDS[0]].tolist() == pytest.approx([1, 0, 0])
+        assert weights[BLOCK_IDS[1]].tolist() == pytest.approx([0.5, 0.5, 0], abs=1e-3)
+        assert weights[BLOCK_IDS[2]].sum() == 0
+
+        monkeypatch.setattr(admin_geos, "build_block_assignment", None)
+        cached = get_block_assignment("neighborhood", 2010, data_path, cache_path)
+        assert isinstance(cached, BlockCrosswalk)
+        assert (cached.additive_weights() != assignment.additive_weights()).nnz == 0
+
+
+class Events(Feature):
+    """Events at a block, or at a point when given coordinates"""
+
+    def __init__(self, events, **kwargs):
+        min_geo_grain = "lat/long" if "longitude" in events else "block"
+        super().__init__(meta={"min_geo_grain": min_geo_grain}, decennial_census_year=2010, verbose=False, **kwargs)
+        self.events = events
+
+    def load_data(self):
+        self.data = self.events
+
+    def cleanse_data(self):
+        if self.meta["min_geo_grain"] == "block":
+            self.clean_data = self.data
+            return
+        self.clean_data = gpd.GeoDataFrame(
+            self.data, geometry=gpd.points_from_xy(self.data.longitude, self.data.latitude), crs="epsg:4326"
+        )
+
+    @data_loader
+    def construct_feature(self, target_geo_grain):
+        return self.count_by_geo(target_geo_grain, "oid").rename("events").reindex(self.index, fill_value=0)
+
+
+class TractCounts(Feature):
+    """Households and income of the blocks' tract, copied onto each block at the block grain"""
+
+    def __init__(self, **kwargs):
+        meta = {"min_geo_grain": "tract", "intensive_features": ("income",)}
+        super().__init__(meta=meta, decennial_census_year=2010, verbose=False, **kwargs)
+
+    def load_data(self):
+        self.data = pd.DataFrame({"geo_id": [26163500100.0], "households": [90.0], "income": [40_000.0]})
+
+    def cleanse_data(self):
+        self.clean_data = self.data
+
+    @data_loader
+    def construct_feature(self, target_geo_grain):
+        return self.assign_geo_column(target_geo_grain).set_index("geo").reindex(self.index).drop(columns=["geo_id"])
+
+
+class TestRollUp:
+    def test_block_features_roll_up_by_area_share(self, data_path, tmp_path):
+        events = pd.DataFrame({"geo_id": [BLOCK_IDS[0], BLOCK_IDS[1], BLOCK_IDS[1], BLOCK_IDS[2]], "oid": range(4)})
+        feature = Events(events, data_path=data_path, feature_cache_path=str(tmp_path / "cache"))
+        counts = feature.construct_feature("neighborhood")
+        assert counts.index.name == "neighborhood"
+        # the straddling block's two events are split evenly, the block outside the city is dropped
+        assert counts.loc[[1.0, 2.0, 3.0]].tolist() == pytest.approx([2, 1, 0], abs=1e-2)
+
+    def test_point_features_are_binned(self, data_path, tmp_path):
+        # all three events are in the straddling block, two of them on the neighborhood 2 side
+        events = pd.DataFrame({"longitude": [-83.055, -83.045, -83.041], "latitude": 42.32, "oid": range(3)})
+        feature = Events(events, data_path=data_path, feature_cache_path=str(tmp_path / "cache"))
+        counts = feature.construct_feature("neighborhood")
+        assert counts.index.tolist() == [1.0, 2.0, 3.0]
+        assert counts.tolist() == [1, 2, 0]
+        assert feature.construct_feature("council district").tolist() == [1, 2]
+
+    def test_tract_features_are_split_before_rolling_up(self, data_path, tmp_path):
+        feature = TractCounts(data_path=data_path, feature_cache_path=str(tmp_path / "cache"))
+        assert feature.construct_feature("block").households.tolist() == [90, 90, 90]
+        # the tract's three blocks have equal areas: neighborhood 1 gets the first and half the second, 2 the other half
+        rolled_up = feature.construct_feature("neighborhood")
+        assert rolled_up.households.loc[[1.0, 2.0, 3.0]].tolist() == pytest.approx([45, 15, 0], abs=0.1)
+        assert rolled_up.income.loc[[1.0, 2.0]].tolist() == pytest.approx([40_000, 40_000])
+
+        feature.cache_features(grains=("block",))
+        cached = feature.load_cached_features("neighborhood")
+        pd.testing.assert_frame_equal(cached, rolled_up)
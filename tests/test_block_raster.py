@@ -0,0 +1,28 @@
+import geopandas as gpd
+import numpy as np
+from block_raster import BOUNDARY, OUTSIDE, BlockRaster, build_block_raster
+from geometry_store import write_geometry_store
+from shapely.geometry import Polygon, box
+
+
+class TestBlockRaster:
+    def test_classify_matches_exact_lookup(self, tmp_path):
+        with_hole = Polygon([(0, 0), (40, 0), (40, 40), (0, 40)], [[(10, 10), (20, 10), (20, 20), (10, 20)]])
+        blocks = gpd.GeoDataFrame(
+            {"geo_id": [261635001001000.0, 261635001001001.0, 261635001001002.0]},
+            geometry=[with_hole, box(40, 0, 80, 40), box(0, 50, 30, 80)],
+            crs="EPSG:3857",
+        )
+        store = write_geometry_store(blocks, str(tmp_path / "store"))
+        raster = build_block_raster(store, resolution=1.0)
+        xy = np.random.default_rng(0).uniform(-5, 85, (5000, 2))
+        classified = raster.classify(xy[:, 0], xy[:, 1])
+        exact = store.locate(xy)
+        decided = classified != BOUNDARY
+        assert (classified[decided] == exact[decided]).all()
+        assert decided.mean() > 0.8
+        assert (classified[(xy[:, 0] > 12) & (xy[:, 0] < 18) & (xy[:, 1] > 12) & (xy[:, 1] < 18)] == OUTSIDE).all()
+
+        raster.save(str(tmp_path / "raster"))
+        loaded = BlockRaster.load(str(tmp_path / "raster"))
+        assert (loaded.classify(xy[:, 0], xy[:, 1]) == classified).all()
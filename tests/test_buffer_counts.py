@@ -0,0 +1,56 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from buffer_counts import buffer_count_tensor, buffer_counts
+
+
+class TestBufferCounts:
+    def test_tensor_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        locations, events = rng.uniform(0, 2000, (20, 2)), rng.uniform(0, 2000, (5000, 2))
+        event_times, reference_times = rng.uniform(0, 1000, 5000), rng.uniform(200, 800, 20)
+        radii, windows = (50, 100, 250), [(-100, 0), (0, 100), (-50, 50)]
+        tensor = buffer_count_tensor(locations, events, radii, event_times, windows, reference_times)
+        distance = np.sqrt(((locations[:, None, :] - events[None, :, :]) ** 2).sum(axis=-1))
+        relative_times = event_times[None, :] - reference_times[:, None]
+        for a, radius in enumerate(radii):
+            for k, (start, end) in enumerate(windows):
+                expected = ((distance <= radius) & (relative_times >= start) & (relative_times < end)).sum(axis=1)
+                assert (tensor[:, a, k] == expected).all()
+
+        after = buffer_count_tensor(locations, events, radii, event_times, [(-100, 100)], reference_times, True)
+        assert (after[:, :, 0] == tensor[:, :, 1]).all()
+        with pytest.raises(ValueError):
+            buffer_count_tensor(locations, events, (100, 50))
+
+    def test_missing_coordinates(self):
+        rng = np.random.default_rng(0)
+        locations, events = rng.uniform(0, 2000, (20, 2)), rng.uniform(0, 2000, (500, 2))
+        expected = buffer_count_tensor(locations, events, (100, 250))
+        events_with_missing = np.vstack([events, [[np.nan, np.nan], [np.nan, 10.0]]])
+        locations_with_missing = np.vstack([locations, [[np.nan, np.nan]]])
+        tensor = buffer_count_tensor(locations_with_missing, events_with_missing, (100, 250))
+        assert (tensor[:20] == expected).all()
+        assert (tensor[20] == 0).all()
+        assert (buffer_count_tensor(locations_with_missing[20:], events, (100, 250)) == 0).all()
+
+    def test_buffer_counts_frame(self):
+        locations = gpd.GeoDataFrame(
+            {"live_date": pd.to_datetime(["2020-01-10", "2020-01-20"])},
+            geometry=gpd.points_from_xy([-83.05, -83.0], [42.35, 42.35]),
+            crs="epsg:4326",
+        )
+        # about 80 m north of the first location, before and after its live date
+        events = gpd.GeoDataFrame(
+            {"call_timestamp": pd.to_datetime(["2020-01-01", "2020-01-15"])},
+            geometry=gpd.points_from_xy([-83.05, -83.05], [42.3507, 42.3507]),
+            crs="epsg:4326",
+        )
+        counts = buffer_counts(
+            locations, events, (50, 100), [(-30, 0), (0, 30)], "live_date", "call_timestamp"
+        )
+        assert counts.loc[0, (50, "-30 to 0 days")] == 0
+        assert counts.loc[0, (100, "-30 to 0 days")] == 1
+        assert counts.loc[0, (100, "0 to 30 days")] == 1
+        assert (counts.loc[1] == 0).all()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from count_models import count_design, fit_count_model, fit_many
+from scipy import optimize
+
+
+@pytest.fixture()
+def count_data():
+    rng = np.random.default_rng(0)
+    n = 2000
+    X = np.column_stack([np.ones(n), rng.normal(size=(n, 2))])
+    offset = np.log(rng.integers(50, 2000, n) * 4.5)
+    mu = np.exp(offset + X @ np.array([-5.0, 0.3, -0.2]))
+    Y = np.column_stack([rng.poisson(mu), rng.negative_binomial(2, 2 / (2 + mu))]).astype(float)
+    return X, Y, offset
+
+
+class TestCountModels:
+    def test_poisson_matches_direct_fit(self, count_data):
+        X, Y, offset = count_data
+        results = fit_count_model(X, Y, offset, family="poisson")
+
+        def negative_loglik(beta: np.ndarray) -> float:
+            eta = offset + X @ beta
+            return -np.sum(Y[:, 0] * eta - np.exp(eta))
+
+        direct = optimize.minimize(negative_loglik, np.array([-5.0, 0, 0]), method="BFGS", options={"gtol": 1e-8}).x
+        assert results.converged.all()
+        assert np.allclose(results.params["y0"], direct, atol=1e-5)
+
+    def test_nb2_recovers_dispersion(self, count_data):
+        X, Y, offset = count_data
+        results = fit_count_model(X, Y, offset, family="nb2", outcomes=["poisson", "overdispersed"])
+        assert results.converged.all()
+        assert results.alpha["poisson"] < 0.05
+        assert results.alpha["overdispersed"] == pytest.approx(0.5, rel=0.2)
+        assert np.allclose(results.params["overdispersed"], [-5.0, 0.3, -0.2], atol=0.1)
+        assert set(results.summary("overdispersed").columns) >= {"coefficient", "std_error", "p_value"}
+
+    def test_fit_many_matches_single_fits(self, count_data):
+        X, Y, offset = count_data
+        many = fit_many({"full": (X, Y, offset), "reduced": (X[:, :2], Y, offset)}, family="nb2", n_jobs=2)
+        pd.testing.assert_frame_equal(many["reduced"].params, fit_count_model(X[:, :2], Y, offset, "nb2").params)
+
+    def test_count_design(self):
+        index = pd.Index([1.0, 2.0, 3.0], name="geo_id")
+        df = pd.DataFrame({"a": [0.1, 0.2, 0.3], "call_rate": [1.0, 2.0, 3.0]}, index=index)
+        counts = pd.DataFrame({"violence_calls": [3, 2, 1]}, index=index[::-1])
+        Y, X, offset, names = count_design(df, counts, pd.Series([10.0, 20.0, 30.0], index=index), years=4.5)
+        assert names == ["Intercept", "a"]
+        assert Y[:, 0].tolist() == [1, 2, 3]
+        assert np.allclose(offset, np.log([45, 90, 135]))
+        with pytest.raises(ValueError):
+            count_design(df, counts, pd.Series([0.0, 20.0, 30.0], index=index))
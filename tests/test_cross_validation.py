@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from cross_validation import all_subsets, cross_validate_subsets, spatial_folds
+
+
+class TestCrossValidation:
+    def test_spatial_folds_keep_tracts_together(self):
+        geo_ids = 261635000000000.0 + np.repeat(np.arange(20), 10) * 10**4 + np.tile(np.arange(10), 20)
+        folds = spatial_folds(geo_ids, n_folds=4)
+        assert set(folds) == {0, 1, 2, 3}
+        assert (pd.Series(folds).groupby(geo_ids // 10**4).nunique() == 1).all()
+
+    def test_scores_match_direct_fits(self):
+        rng = np.random.default_rng(0)
+        n = 300
+        df = pd.DataFrame(rng.normal(size=(n, 3)), columns=["a", "b", "c"]).assign(
+            call_rate=lambda x: 1 + 2 * x.a - x.c + rng.normal(size=n)
+        )
+        folds = np.arange(n) % 3
+        scores = cross_validate_subsets(df, folds, all_subsets(["a", "b", "c"]))
+        assert scores.shape[0] == 7
+        assert scores.features.iloc[0] in ("a + c", "a + b + c")
+
+        sse = 0
+        for fold in range(3):
+            train, test = df[folds != fold], df[folds == fold]
+            A = np.column_stack([np.ones(len(train)), train.a])
+            beta = np.linalg.lstsq(A, train.call_rate, rcond=None)[0]
+            sse += np.sum((test.call_rate - beta[0] - beta[1] * test.a) ** 2)
+        assert np.isclose(scores.set_index("features").loc["a", "mse"], sse / n)
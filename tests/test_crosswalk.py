@@ -0,0 +1,92 @@
+import crosswalk
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from constants import AREA_CRS
+from crosswalk import BlockCrosswalk, convert_cached_features, get_block_crosswalk
+from features.feature_constructor import Feature
+from shapely.geometry import box
+
+# 2010 blocks A and B, 1 km squares side by side. 2020 blocks C, D and E split the same 2 km strip at 500 m and 1700 m
+A, B = 261635001001000.0, 261635001002000.0
+C, D, E = 261635001001000.0, 261635001001001.0, 261635001002000.0
+BLOCKS = {
+    2010: gpd.GeoDataFrame(
+        {"geo_id": [A, B]},
+        geometry=[box(320_000, 4_690_000, 321_000, 4_691_000), box(321_000, 4_690_000, 322_000, 4_691_000)],
+    ),
+    2020: gpd.GeoDataFrame(
+        {"geo_id": [C, D, E]},
+        geometry=[
+            box(320_000, 4_690_000, 320_500, 4_691_000),
+            box(320_500, 4_690_000, 321_700, 4_691_000),
+            box(321_700, 4_690_000, 322_000, 4_691_000),
+        ],
+    ),
+}
+
+
+@pytest.fixture(autouse=True)
+def synthetic_blocks(monkeypatch):
+    def get_detroit_census_geos(decennial_census_year, *args, **kwargs):
+        return BLOCKS[decennial_census_year].set_crs(AREA_CRS).to_crs("epsg:4326")
+
+    monkeypatch.setattr(crosswalk, "get_detroit_census_geos", get_detroit_census_geos)
+
+
+class TestBlockCrosswalk:
+    def test_convert_conserves_counts(self):
+        area = BlockCrosswalk.build(2010, 2020)
+        converted = area.convert(pd.Series([10.0, 20.0], index=[A, B], name="calls"))
+        assert converted.to_numpy() == pytest.approx([5, 5 + 14, 6])
+        assert converted.sum() == pytest.approx(30)
+
+    def test_population_weights(self):
+        # 100 people in C, 1200 spread evenly over D, none in E
+        population = pd.Series([100.0, 1200.0, 0.0], index=[C, D, E])
+        people = BlockCrosswalk.build(2010, 2020, "population", population=population)
+        df = pd.DataFrame({"calls": [12.0, 20.0], "income": [10.0, 30.0]}, index=[A, B])
+        converted = people.convert(df, intensive_columns=["income"])
+        # A has 100 people in C and 500 in D, B has 700 in D and none in E
+        assert converted.calls.to_numpy() == pytest.approx([2, 10 + 20, 0])
+        assert converted.income.to_numpy()[:2] == pytest.approx([10, (500 * 10 + 700 * 30) / 1200])
+        assert np.isnan(converted.income.to_numpy()[2])
+
+    def test_reverse_and_at_grain(self):
+        area = BlockCrosswalk.build(2010, 2020)
+        back = area.reverse()
+        assert (back.from_year, back.to_year) == (2020, 2010)
+        assert back.convert(pd.Series([5.0, 19.0, 6.0], index=[C, D, E])).sum() == pytest.approx(30)
+        block_groups = area.at_grain("block group")
+        assert block_groups.grain == "block group"
+        assert (block_groups.from_ids == [A // 1000, B // 1000]).all()
+        assert (block_groups.to_ids == [C // 1000, E // 1000]).all()
+        # C and D make up block group 1 of 2020, E block group 2
+        expected = np.array([[1000, 700], [0, 300]]) * 1000.0
+        assert np.allclose(block_groups.overlap.toarray(), expected, rtol=1e-6)
+        with pytest.raises(ValueError):
+            block_groups.at_grain("tract")
+
+    def test_npz_cache_round_trip(self, tmp_path, monkeypatch):
+        built = get_block_crosswalk(2010, 2020, cache_path=str(tmp_path))
+        assert (tmp_path / "crosswalk_2010_2020_area.npz").is_file()
+        monkeypatch.setattr(BlockCrosswalk, "build", None)
+        loaded = get_block_crosswalk(2010, 2020, cache_path=str(tmp_path))
+        assert repr(loaded) == repr(built)
+        assert abs(loaded.overlap - built.overlap).max() == 0
+        assert (loaded.from_ids == built.from_ids).all() and (loaded.to_ids == built.to_ids).all()
+
+    def test_convert_cached_features(self, tmp_path):
+        feature = Feature(
+            meta={"min_geo_grain": "block", "intensive_features": ("income",)},
+            decennial_census_year=2010,
+            feature_cache_path=str(tmp_path),
+        )
+        cached = pd.DataFrame({"calls": [10.0, 20.0], "income": [10.0, 30.0]}, index=pd.Index([A, B], name="block"))
+        feature.construct_feature = lambda target_geo_grain: cached
+        feature.cache_features(grains=("block",))
+        converted = convert_cached_features(feature, 2020, "block", cache_path=str(tmp_path))
+        assert converted.calls.to_numpy() == pytest.approx([5, 19, 6])
+        assert converted.income.to_numpy() == pytest.approx([10, (500 * 10 + 700 * 30) / 1200, 30])
+        assert convert_cached_features(feature, 2010, "block", cache_path=str(tmp_path)).equals(cached)
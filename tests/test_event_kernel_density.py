@@ -0,0 +1,47 @@
+import features.event_kernel_density as event_kernel_density
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from constants import AREA_CRS
+from features.event_kernel_density import EventKernelDensity
+from features.feature_constructor import Feature
+from shapely.geometry import box
+
+
+@pytest.fixture
+def event_feature():
+    return Feature(meta={"min_geo_grain": "lat/long", "supported_features": ("calls",)}, decennial_census_year=2010)
+
+
+class TestEventKernelDensity:
+    def test_uniform_events_give_flat_intensity(self, event_feature):
+        kde = EventKernelDensity(event_feature, bandwidths=(50, 100), cell_size=25, verbose=False)
+        # one event per 25 m cell over 4 km x 4 km: 1600 events per sq km
+        centers = np.arange(12.5, 4000, 25)
+        x, y = np.meshgrid(320_000 + centers, 4_690_000 + centers)
+        kde.data = pd.DataFrame({"x": x.ravel(), "y": y.ravel()})
+        edges = np.arange(0, 4025, 25)
+        rasters = kde.kernel_density_rasters(320_000 + edges, 4_690_000 + edges)
+        # away from the edges, where no kernel mass is lost
+        for raster in rasters.values():
+            assert np.allclose(raster[20:-20, 20:-20], len(kde.data) / 16, rtol=1e-6)
+
+    def test_block_means_add_up_to_event_count(self, event_feature, monkeypatch):
+        blocks = gpd.GeoDataFrame(
+            {"geo_id": [261635001001000.0, 261635001001001.0, 261635001001002.0, 261635001001003.0]},
+            geometry=[
+                box(320_000 + dx, 4_690_000 + dy, 321_000 + dx, 4_691_000 + dy) for dx in (0, 1000) for dy in (0, 1000)
+            ],
+            crs=AREA_CRS,
+        )
+        monkeypatch.setattr(event_kernel_density, "get_detroit_census_geos", lambda *args, **kwargs: blocks)
+        kde = EventKernelDensity(event_feature, bandwidths=(50,), cell_size=25, data_path="elsewhere", verbose=False)
+        assert kde.data_path == "elsewhere/"
+        rng = np.random.default_rng(0)
+        kde.data = pd.DataFrame({"x": rng.uniform(320_400, 321_600, 300), "y": rng.uniform(4_690_400, 4_691_600, 300)})
+        kde.index = pd.Index(blocks.geo_id, name="block")
+        intensity = kde.construct_feature("block").calls_kde_50m
+        # mean events per sq km times each block's 1 sq km
+        assert intensity.sum() == pytest.approx(300, rel=1e-3)
+        assert (intensity > 0).all()
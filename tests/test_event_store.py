@@ -0,0 +1,58 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from features.violence_calls import ViolenceCalls
+
+pytest.importorskip("duckdb")
+from event_store import EventStore  # noqa: E402
+
+
+@pytest.fixture
+def calls():
+    return gpd.GeoDataFrame(
+        {
+            "calldescription": ["SHOTS FIRED", "NOISE", "ASSAULT", None, "DV", "SHOT"],
+            "geo_id": [
+                261635001001000.0,
+                261635001001000.0,
+                261635001001001.0,
+                261635001002000.0,
+                261635001002000.0,
+                261635001002000.0,
+            ],
+            "oid": [1, 2, 3, 4, 5, 6],
+        },
+        geometry=gpd.points_from_xy([-83.0] * 6, [42.3] * 6),
+        crs="epsg:4326",
+    )
+
+
+class TestEventStore:
+    def test_ingest_and_query(self, calls, tmp_path):
+        with EventStore(str(tmp_path / "events.duckdb")) as store:
+            assert store.ingest("calls", calls) == 6
+            assert store.tables() == ["calls"]
+            assert "geometry" not in store.query("SELECT * FROM calls").columns
+            counts = store.count_by_geo("calls", 3, "oid <= ?", [6])
+            pd.testing.assert_series_equal(counts, calls.assign(geo=calls.geo_id // 1000).groupby("geo").oid.count())
+            assert store.ingest("calls", calls.head(2), replace=False) == 2
+            assert store.query("SELECT count(*) AS n FROM calls").n[0] == 8
+        with pytest.raises(ValueError):
+            EventStore(str(tmp_path / "events.duckdb"), read_only=True).count_by_geo("calls", -1)
+
+    @pytest.mark.parametrize("call_whitelist_strings", ["close_proxy", "near_proxy"])
+    def test_construct_feature_sql(self, calls, call_whitelist_strings, tmp_path):
+        index = pd.Index([261635001001.0, 261635001002.0, 261635001003.0], name="block group")
+        pattern = ViolenceCalls().call_whitelist_pattern(call_whitelist_strings)
+        feature = ViolenceCalls(verbose=False)
+        feature.index = index
+        feature.data = feature.clean_data = calls.loc[calls.calldescription.str.contains(pattern, na=False)]
+        expected = feature.construct_feature("block group")
+
+        with EventStore(str(tmp_path / "events.duckdb")) as store:
+            store.ingest(feature.event_table(), calls)
+            sql_feature = ViolenceCalls(verbose=False)
+            sql_feature.index = index
+            pd.testing.assert_frame_equal(
+                sql_feature.construct_feature_sql(store, "block group", call_whitelist_strings), expected
+            )
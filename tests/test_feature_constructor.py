@@ -1,5 +1,8 @@
+import pandas as pd
 import pytest
 from features.feature_constructor import Feature
+from features.household_types_ages import HouseholdTypesAges
+from features.violence_calls import ViolenceCalls
 
 from tests.conftest import BLOCKS_PER_YEAR_GEO
 
@@ -17,6 +20,109 @@ class TestFeastureConstructor:
     def test_assign_geo_column(self):
         pass
 
+    @pytest.mark.parametrize("unique", [False, True])
+    def test_count_by_geo_backends(self, unique):
+        clean_data = pd.DataFrame(
+            {
+                "geo_id": [261635001001000.0, 261635001001000.0, 261635001001001.0, 261635001002000.0],
+                "number": ["a", "a", None, "b"],
+            }
+        )
+        counts = {}
+        for backend in ("pandas", "polars"):
+            if backend == "polars":
+                pytest.importorskip("polars")
+            ftr = Feature(meta={"min_geo_grain": "block"}, decennial_census_year=2010, backend=backend)
+            ftr.clean_data = clean_data
+            counts[backend] = ftr.count_by_geo("block group", "number", unique=unique)
+            assert counts[backend].tolist() == ([1, 1] if unique else [2, 1])
+        if "polars" in counts:
+            pd.testing.assert_series_equal(counts["polars"], counts["pandas"])
+        with pytest.raises(ValueError):
+            Feature(meta={"min_geo_grain": "block"}, backend="spark")
+
+    def test_checkpoint(self, tmp_path):
+        pd.DataFrame(
+            {
+                "calldescription": ["SHOTS FIRED", "NOISE", "ASSAULT"],
+                "call_timestamp": ["2020-01-01 10:00:00", "2020-01-02 10:00:00", "2020-01-03 10:00:00"],
+                "block_id": [261635001001000.0, 261635001001000.0, 261635001002000.0],
+                "category": "a",
+                "officerinitiated": "No",
+                "priority": "1",
+                "oid": [1, 2, 3],
+                "longitude": -83.0,
+                "latitude": 42.3,
+            }
+        ).to_csv(tmp_path / "calls_for_service_from_jimmy.csv", index=False)
+
+        def build(**kwargs):
+            ftr = ViolenceCalls(
+                data_path=str(tmp_path),
+                feature_cache_path=str(tmp_path / "cache"),
+                checkpoint=True,
+                verbose=False,
+                **kwargs,
+            )
+            ftr.index = pd.Index([261635001001.0, 261635001002.0], name="block group")
+            return ftr
+
+        first = build()
+        expected = first.construct_feature("block group")
+        assert expected.violence_calls.tolist() == [1, 1]
+        restarted = build(load_data_kwargs={"call_whitelist_strings": "close_proxy"})
+        assert restarted.read_checkpoint()
+        pd.testing.assert_frame_equal(restarted.clean_data, first.clean_data)
+        pd.testing.assert_frame_equal(restarted.construct_feature("block group"), expected)
+        assert not build(load_data_kwargs={"call_whitelist_strings": None}).read_checkpoint()
+
+    def test_features_are_pushed_into_load(self, tmp_path, monkeypatch):
+        rows = [["GEO_ID", "NAME", "P022001", "P022002"], ["id", "Geographic Area Name", "Total", " !!Total!!A"]]
+        rows += [[f"1000000US26163500100100{i}", f"Block {i}", f"{2 * i}(r1234)", str(i)] for i in range(3)]
+        pd.DataFrame(rows).to_csv(
+            tmp_path / "DECENNIALSF12010.P22_data_with_overlays_2022-02-10T193949.csv", header=False, index=False
+        )
+        monkeypatch.setattr(HouseholdTypesAges, "remove_geos_outside_detroit", lambda self, df: df)
+        ftr = HouseholdTypesAges(data_path=str(tmp_path), verbose=False)
+        ftr.index = pd.Index([261635001001.0], name="block group")
+
+        assert ftr.construct_feature("block group", features=[" !!Total!!A"]).columns.tolist() == [" !!Total!!A"]
+        assert ftr.data.columns.tolist() == ["geo_id", " !!Total!!A"]
+        assert ftr.loaded_features == (" !!Total!!A",)
+        # Total wasn't loaded, so the data is reloaded with it
+        assert ftr.construct_feature("block group", features="Total").Total.tolist() == [6]
+        assert ftr.data.columns.tolist() == ["geo_id", "Total"]
+        assert ftr.construct_feature("block group").columns.tolist() == ["Total", " !!Total!!A"]
+        with pytest.raises(ValueError):
+            HouseholdTypesAges(data_path=str(tmp_path)).load_data(features=["Nope"])
+
+    def test_disaggregate(self, monkeypatch):
+        blocks = [261635001001000.0, 261635001001001.0, 261635001002000.0, 261635002001000.0, 261635002001001.0]
+        monkeypatch.setattr(
+            "detroit_geos.get_detroit_census_geos", lambda *args, **kwargs: pd.DataFrame({"geo_id": blocks})
+        )
+        ftr = Feature(meta={"min_geo_grain": "tract", "intensive_features": ("income",)}, decennial_census_year=2010)
+        # the second tract has no population
+        ftr.clean_data = pd.DataFrame(
+            {"geo_id": [26163500100.0, 26163500200.0], "households": [100.0, 30.0], "income": [50.0, 70.0]}
+        )
+        block_population = pd.Series([10.0, 30.0, 60.0, 0.0, 0.0], index=blocks)
+
+        ftr.index = pd.Index(blocks + [261635003001000.0], name="block")
+        by_block = ftr.disaggregate("block", block_population)
+        assert by_block.households.tolist()[:5] == [10, 30, 60, 15, 15]
+        assert by_block.income.tolist()[:5] == [50, 50, 50, 70, 70]
+        # a block outside every source tract is unknown
+        assert by_block.iloc[5].isna().all()
+
+        ftr.index = pd.Index([261635001001.0, 261635001002.0, 261635002001.0], name="block group")
+        by_block_group = ftr.disaggregate("block group", block_population)
+        assert by_block_group.households.tolist() == [40, 60, 30]
+        assert by_block_group.households.sum() == ftr.clean_data.households.sum()
+        assert by_block_group.income.tolist() == [50, 50, 70]
+        with pytest.raises(ValueError):
+            ftr.disaggregate("tract", block_population)
+
     @pytest.mark.parametrize("decennial_census_year", [2010, 2020])
     @pytest.mark.parametrize("target_geo_grain", ["block", "block group", "tract"])
     def test_generate_index(self, decennial_census_year, target_geo_grain, partial_geo_data):
@@ -0,0 +1,52 @@
+import urllib.error
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+from geo_lookup_service import GeoLookup, GeoLookupClient, serve_in_thread
+
+BLOCK_IDS = [261635001001000.0, 261635001001001.0, 261635002002000.0]
+
+
+@pytest.fixture(scope="module")
+def client():
+    blocks = gpd.GeoDataFrame(
+        {"geo_id": BLOCK_IDS},
+        geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1), box(0, 1, 2, 2)],
+        crs="epsg:4326",
+    )
+    server = serve_in_thread(GeoLookup(blocks={2010: blocks}))
+    yield GeoLookupClient(port=server.server_address[1])
+    server.shutdown()
+
+
+class TestGeoLookupService:
+    def test_health(self, client):
+        assert client.health() == {"years": [2010]}
+
+    def test_lookup(self, client):
+        assert client.lookup(0.5, 0.5, year=2010) == {
+            "block": 261635001001000,
+            "block_group": 261635001001,
+            "tract": 26163500100,
+        }
+
+    def test_lookup_batch(self, client):
+        result = client.lookup_batch([0.5, 1.5, 0.5, 5], [0.5, 0.5, 1.5, 5], year=2010)
+        assert result["block"] == [int(x) for x in BLOCK_IDS] + [None]
+        assert result["tract"] == [26163500100, 26163500100, 26163500200, None]
+
+    def test_unknown_year(self, client):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            client.lookup(0.5, 0.5, year=2020)
+        assert e.value.code == 400
+
+    def test_overlapping_blocks_get_the_smallest_geo_id(self):
+        # the larger geo id comes first in the spatial index
+        blocks = gpd.GeoDataFrame(
+            {"geo_id": BLOCK_IDS[1::-1]}, geometry=[box(0, 0, 2, 2), box(0, 0, 1, 1)], crs="epsg:4326"
+        )
+        geo_lookup = GeoLookup(blocks={2010: blocks})
+        assert geo_lookup.lookup(0.5, 0.5, 2010)["block"] == int(BLOCK_IDS[0])
+        assert geo_lookup.lookup_batch([0.5], [0.5], 2010)["block"] == [int(BLOCK_IDS[0])]
@@ -0,0 +1,38 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+from geometry_store import GeometryStore, _ranges, write_geometry_store
+from shapely.geometry import MultiPolygon, Polygon, box
+
+
+@pytest.fixture()
+def geos():
+    with_hole = Polygon([(0, 0), (4, 0), (4, 4), (0, 4)], [[(1, 1), (2, 1), (2, 2), (1, 2)]])
+    return gpd.GeoDataFrame(
+        {"geo_id": [261635001001000.0, 261635001001001.0, 261635001001002.0]},
+        geometry=[with_hole, MultiPolygon([box(5, 0, 6, 1), box(7, 0, 8, 1)]), box(0, 5, 1, 6)],
+        crs="epsg:4326",
+    )
+
+
+class TestGeometryStore:
+    def test_round_trip(self, geos, tmp_path):
+        write_geometry_store(geos, str(tmp_path / "store"))
+        store = GeometryStore(str(tmp_path / "store"))
+        assert isinstance(store.coords, np.memmap)
+        round_trip = store.to_gpd()
+        assert round_trip.crs == geos.crs
+        assert (round_trip.geo_id == geos.geo_id).all()
+        assert all(a.equals(b) for a, b in zip(round_trip.geometry, geos.geometry))
+        assert [g.geom_type for g in round_trip.geometry] == ["Polygon", "MultiPolygon", "Polygon"]
+
+    def test_subset_and_bbox_query(self, geos, tmp_path):
+        store = write_geometry_store(geos, str(tmp_path / "store"))
+        assert store.query_bbox(4.5, -1, 9, 0.5).tolist() == [1]
+        subset = store.geometries([2, 1])
+        assert subset[0].equals(geos.geometry[2]) and subset[1].equals(geos.geometry[1])
+
+    def test_ranges(self):
+        starts, ends = np.array([3, 7, 7, 0]), np.array([5, 7, 9, 2])
+        expected = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        assert _ranges(starts, ends).tolist() == expected.tolist()
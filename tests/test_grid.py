@@ -0,0 +1,93 @@
+import geopandas as gpd
+import grid
+import numpy as np
+import pandas as pd
+import pytest
+from constants import AREA_CRS
+from features.feature_constructor import Feature, data_loader
+from grid import GridSpec, cell_block_crosswalk, point_to_cell_id
+from shapely.geometry import box
+
+
+class TestGridSpec:
+    @pytest.mark.parametrize("target_geo_grain", ["grid 250m", "hex 500m"])
+    def test_cell_ids_match_polygon_sjoin(self, target_geo_grain):
+        spec = GridSpec(target_geo_grain)
+        rng = np.random.default_rng(0)
+        x, y = rng.uniform(320_000, 325_000, 2000), rng.uniform(4_690_000, 4_695_000, 2000)
+        cell_ids = spec.cell_ids(x, y)
+        points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs=AREA_CRS)
+        # every cell around the points, so each point falls in exactly one candidate polygon
+        row, col = np.divmod(np.unique(cell_ids), grid.GRID_ID_ROW_MULTIPLIER)
+        neighbors = [(row + dr) * grid.GRID_ID_ROW_MULTIPLIER + col + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+        cells = spec.cell_polygons(np.unique(np.concatenate(neighbors)))
+        joined = gpd.sjoin(points, cells, how="left", predicate="within")
+        assert not joined.index.duplicated().any()
+        assert (joined.geo_id.to_numpy() == cell_ids).all()
+
+    def test_cells_are_sized_in_ground_meters(self):
+        assert GridSpec("grid 250m").cell_polygons([0.0]).area.iloc[0] == pytest.approx(250**2)
+        hexagon = GridSpec("hex 500m").cell_polygons([0.0]).area.iloc[0]
+        assert hexagon == pytest.approx(np.sqrt(3) / 2 * 500**2)
+        # lon/lat points are binned in ground meters: 0.01 degrees of latitude is ~1.11 km
+        points = gpd.GeoSeries(gpd.points_from_xy([-83.05, -83.05], [42.35, 42.36]), crs="epsg:4326")
+        cell_ids = point_to_cell_id(points, "grid 100m")
+        assert np.diff(np.divmod(cell_ids.to_numpy(), grid.GRID_ID_ROW_MULTIPLIER)[0])[0] in (11, 12)
+        x, y = grid.projected_xy(points.to_crs(AREA_CRS))
+        assert (GridSpec("grid 100m").cell_ids(x, y) == cell_ids.to_numpy()).all()
+
+
+@pytest.fixture
+def blocks(monkeypatch):
+    # two blocks of one tract, 400 m x 250 m and 200 m x 200 m
+    blocks = gpd.GeoDataFrame(
+        {"geo_id": [261635001001000.0, 261635001001001.0]},
+        geometry=[box(300_600, 4_680_000, 301_000, 4_680_250), box(301_100, 4_680_100, 301_300, 4_680_300)],
+        crs=AREA_CRS,
+    )
+    monkeypatch.setattr(grid, "get_detroit_census_geos", lambda *args, **kwargs: blocks)
+    monkeypatch.setattr("detroit_geos.get_detroit_census_geos", lambda *args, **kwargs: blocks)
+    return blocks
+
+
+class Households(Feature):
+    """Households of the blocks' tract"""
+
+    def __init__(self, **kwargs):
+        super().__init__(meta={"min_geo_grain": "tract"}, decennial_census_year=2010, verbose=False, **kwargs)
+
+    def load_data(self):
+        self.data = pd.DataFrame({"geo_id": [26163500100.0], "households": [70.0]})
+
+    def cleanse_data(self):
+        self.clean_data = self.data
+
+    @data_loader
+    def construct_feature(self, target_geo_grain):
+        return self.assign_geo_column(target_geo_grain).set_index("geo").reindex(self.index).drop(columns=["geo_id"])
+
+
+class TestCellBlockCrosswalk:
+    def test_weights_are_block_area_shares(self, blocks, tmp_path):
+        crosswalk = cell_block_crosswalk("grid 250m", 2010, str(tmp_path))
+        weights = pd.DataFrame(
+            crosswalk.additive_weights().toarray(), index=crosswalk.to_ids, columns=crosswalk.from_ids
+        )
+        assert np.allclose(weights.sum(axis=0), 1)
+        # the first block spans columns 2 and 3 of row 40: 150 m and 250 m of its 400 m width
+        first = weights.iloc[:, 0]
+        assert first[40 * grid.GRID_ID_ROW_MULTIPLIER + 2] == pytest.approx(150 / 400)
+        assert first[40 * grid.GRID_ID_ROW_MULTIPLIER + 3] == pytest.approx(250 / 400)
+        # the second block is split in quarters across rows 40-41 and columns 4-5, at x = 301 250 and y = 4 680 250
+        second = weights.iloc[:, 1]
+        expected = {(40, 4): 0.75 * 0.75, (40, 5): 0.25 * 0.75, (41, 4): 0.75 * 0.25, (41, 5): 0.25 * 0.25}
+        for (row, col), share in expected.items():
+            assert second[row * grid.GRID_ID_ROW_MULTIPLIER + col] == pytest.approx(share)
+
+    def test_tract_counts_roll_up_to_cells(self, blocks, tmp_path):
+        households = Households(data_path=str(tmp_path)).construct_feature("grid 250m").households
+        assert households.index.name == "grid 250m"
+        assert households.sum() == pytest.approx(70)
+        # the tract's households are split 5:2 by block area, then the first block's 50 by its columns' shares
+        assert households[40 * grid.GRID_ID_ROW_MULTIPLIER + 2] == pytest.approx(50 * 150 / 400)
+        assert households[40 * grid.GRID_ID_ROW_MULTIPLIER + 3] == pytest.approx(50 * 250 / 400)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+from inference import bootstrap, ols_coefficients, permutation_test, spatial_clusters, summarize_draws
+
+
+@pytest.fixture()
+def model_df():
+    rng = np.random.default_rng(0)
+    n = 500
+    # block ids in 25 tracts
+    geo_ids = 261635000000000.0 + rng.integers(0, 25, n) * 10**4 + np.arange(n)
+    X = rng.normal(size=(n, 3))
+    y = 2 + X @ np.array([1.0, 0.0, -0.5]) + rng.normal(size=n)
+    return pd.DataFrame(X, columns=["a", "b", "c"], index=pd.Index(geo_ids, name="geo_id")).assign(call_rate=y)
+
+
+class TestInference:
+    def test_bootstrap_matches_analytic_std_error(self, model_df):
+        draws = bootstrap(model_df, n_resamples=1000, n_jobs=2, batch_size=128)
+        summary = summarize_draws(draws, ols_coefficients(model_df))
+        assert draws.shape == (1000, 4)
+        assert np.allclose(summary.std_error, 1 / np.sqrt(len(model_df)), rtol=0.3)
+        assert (summary["ci_0.025"] < summary.coefficient).all()
+
+    def test_bootstrap_is_reproducible_across_jobs(self, model_df):
+        one = bootstrap(model_df, n_resamples=300, cluster_grain="tract", n_jobs=1, batch_size=100)
+        many = bootstrap(model_df, n_resamples=300, cluster_grain="tract", n_jobs=3, batch_size=100)
+        pd.testing.assert_frame_equal(one, many)
+
+    def test_spatial_clusters(self, model_df):
+        assert len(np.unique(spatial_clusters(model_df.index, "tract"))) <= 25
+
+    def test_permutation_test(self, model_df):
+        summary = permutation_test(model_df, n_permutations=500)
+        assert np.isnan(summary.loc["Intercept", "p_value"])
+        assert summary.loc["a", "p_value"] < 0.01
+        assert summary.loc["b", "p_value"] > 0.01
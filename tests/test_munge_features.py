@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+from munge_features import Transformer1, transform_1
+
+FEATURE_COLUMNS = [
+    "population",
+    "population_density",
+    "violence_calls",
+    "per_capita_income",
+    "per_household_income",
+    "households",
+    "married_families",
+    "non_family_households",
+    "out_of_state_rental_ownership",
+    "bus_stops",
+    "smart_bus_stops",
+    "rental_counts",
+    "greenlights",
+    "liquor_licenses",
+    "vacant_properties",
+]
+
+
+@pytest.fixture()
+def feat_df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.uniform(1, 1000, (200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    df.loc[rng.random(200) < 0.1, "per_household_income"] = np.nan
+    df.loc[rng.random(200) < 0.1, "population"] = 3
+    return df
+
+
+class TestTransformer1:
+    def test_matches_baseline_transform_1(self):
+        # geo 12 has too few people and geo 13 no households, geo 11 has an income and a married count to impute
+        feat_df = pd.DataFrame(
+            {
+                "population": [100.0, 200.0, 5.0, 400.0, 50.0],
+                "population_density": [1000.0, 4000.0, 50.0, 2000.0, 250.0],
+                "violence_calls": [9.0, 45.0, 1.0, 10.0, 0.0],
+                "per_capita_income": [20_000.0, 15_000.0, 30_000.0, 25_000.0, np.nan],
+                "per_household_income": [40_000.0, np.nan, 50_000.0, 60_000.0, 20_000.0],
+                "households": [40.0, 50.0, 2.0, 0.0, 20.0],
+                "married_families": [10.0, np.nan, 1.0, 0.0, 5.0],
+                "non_family_households": [20.0, 10.0, 1.0, 0.0, 4.0],
+                "out_of_state_rental_ownership": [1.0, 0.0, 0.0, 2.0, 3.0],
+                "bus_stops": [2.0, 0.0, 1.0, 1.0, 1.0],
+                "smart_bus_stops": [1.0, 1.0, 0.0, 0.0, 0.0],
+                "rental_counts": [3.0, 8.0, 0.0, 1.0, 0.0],
+                "greenlights": [0.0, 1.0, 0.0, 0.0, 2.0],
+                "liquor_licenses": [1.0, 0.0, 0.0, 3.0, 1.0],
+                "vacant_properties": [5.0, 2.0, 0.0, 0.0, 9.0],
+            },
+            index=pd.Index([10.0, 11.0, 12.0, 13.0, 14.0], name="block group"),
+        )
+        # the original transform_1: median imputation over the kept geos, then the derived columns, area being
+        # population_density / population. Geo 11 gets the median income 30 000 and 7.5 married families
+        expected_untransformed = pd.DataFrame(
+            {
+                "population_density": [1000.0, 4000.0, 250.0],
+                "per_household_income": [40_000.0, 30_000.0, 20_000.0],
+                "out_of_state_rental_ownership": [1.0, 0.0, 3.0],
+                "call_rate": [20.0, 50.0, 0.0],
+                "married_household_prop": [0.25, 0.15, 0.25],
+                "people_per_household": [2.5, 4.0, 2.5],
+                "greenlight_density": [0.0, 0.05, 0.4],
+                "rental_density": [0.3, 0.4, 0.0],
+                "bus_density": [0.2, 0.0, 0.2],
+                "vacant_property_density": [0.5, 0.1, 1.8],
+                "liquor_license_density": [0.1, 0.0, 0.2],
+            },
+            index=pd.Index([10.0, 11.0, 14.0], name="block group"),
+        )
+        expected = expected_untransformed.copy()
+        logged = ["greenlight_density", "rental_density", "bus_density", "per_household_income"]
+        logged += ["liquor_license_density", "vacant_property_density"]
+        expected[logged] = np.log(expected[logged] + 1)
+
+        df, df0 = transform_1(feat_df)
+        pd.testing.assert_frame_equal(df0, expected_untransformed, check_dtype=False)
+        pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+        transformed = Transformer1().fit_transform(feat_df)
+        pd.testing.assert_frame_equal(transformed, expected, check_dtype=False)
+
+    def test_frozen_transform_uses_fitted_medians(self, feat_df, tmp_path):
+        transformer = Transformer1().fit(feat_df)
+        transformer.save(tmp_path / "transformer.pkl")
+        frozen = Transformer1.load(tmp_path / "transformer.pkl")
+        new_geos = feat_df.iloc[:5].assign(per_household_income=np.nan, population=100)
+        income_idx = frozen.output_columns.index("per_household_income")
+        expected = np.log(frozen.input_medians[frozen.input_columns.index("per_household_income")] + 1)
+        assert np.allclose(frozen.transform(new_geos).iloc[:, income_idx], expected)
+
+    def test_transform_requires_fit(self, feat_df):
+        with pytest.raises(ValueError):
+            Transformer1().transform(feat_df)
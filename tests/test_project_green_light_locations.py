@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from features.project_green_light_locations import ProjectGreenlightLocations
+
+
+class TestProjectGreenlightLocations:
+    def test_active_cameras(self):
+        feature = ProjectGreenlightLocations(decennial_census_year=2010, verbose=False)
+        feature.index = pd.Index([261635001001000.0, 261635001001001.0], name="block")
+        feature.data = feature.clean_data = pd.DataFrame(
+            {
+                "geo_id": [261635001001000.0, 261635001001000.0, 261635001001001.0],
+                "oid": [1, 2, 3],
+                "live_date": ["2016/01/02 00:00:00+00", "2016/01/04 00:00:00+00", "2016/03/01 00:00:00+00"],
+            }
+        )
+        active, camera_days = feature.active_cameras("block", freq="D", start="2016-01-01", end="2016-01-05")
+        assert active.iloc[0].tolist() == [0, 1, 1, 2, 2]
+        assert camera_days.iloc[0].tolist() == [0, 1, 2, 4, 6]
+        assert (active.iloc[1] == 0).all()
+
+        active, camera_days = feature.active_cameras("block", freq="M", start="2016-01", end="2016-03")
+        assert active.iloc[:, -1].tolist() == [2, 1]
+        # 30 + 28 days for the January cameras through January, then all of February and March
+        assert camera_days.iloc[0].tolist() == [58, 58 + 2 * 29, 58 + 2 * 29 + 2 * 31]
+        assert np.array_equal(camera_days.iloc[1], [0, 0, 31])
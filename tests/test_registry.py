@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from features.feature_constructor import Feature
+from features.registry import FEATURE_REGISTRY, import_feature_class, make_feature, registered_classes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestRegistry:
+    @pytest.mark.parametrize("column", list(FEATURE_REGISTRY))
+    def test_import_feature_class(self, column):
+        class_path, _, _ = FEATURE_REGISTRY[column]
+        assert issubclass(import_feature_class(class_path), Feature)
+
+    @pytest.mark.parametrize("column", list(FEATURE_REGISTRY))
+    def test_years_and_kwargs(self, column):
+        _, kwargs, years = FEATURE_REGISTRY[column]
+        for year in years:
+            assert make_feature(column, year).decennial_census_year == year
+        if column in ("violence_calls", "rms_crime"):
+            # the source's block ids are 2010 blocks, other years need the points geolocated
+            assert years == (2010,) or kwargs.get("load_data_kwargs", {}).get("use_lat_long")
+
+    def test_registered_classes(self):
+        entries = registered_classes(["per_capita_income", "per_household_income", "bus_stops"])
+        assert [class_path for class_path, _, _ in entries] == [
+            "features.income:Income",
+            "features.ddot_bus_stops:DDotBusStops",
+        ]
+        with pytest.raises(ValueError):
+            registered_classes(["not_a_feature"])
+
+
+class TestLazyImports:
+    # seconds to import a feature module in a fresh interpreter, most of it is pandas
+    IMPORT_BUDGET = 2.0
+    HEAVY_MODULES = ("geopandas", "shapely", "scipy", "sklearn", "detroit_geos")
+
+    def imported_modules(self, statement: str) -> dict:
+        code = (
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            f"{statement}\n"
+            "print(json.dumps({'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}))"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+        return json.loads(out.stdout.splitlines()[-1])
+
+    @pytest.mark.parametrize(
+        "statement",
+        ["import features.cli", "from features import ViolenceCalls", "import features.rms_crime", "import util_detroit"],
+    )
+    def test_import_skips_heavy_dependencies(self, statement):
+        result = self.imported_modules(statement)
+        assert not set(self.HEAVY_MODULES) & set(result["modules"])
+        assert result["seconds"] < self.IMPORT_BUDGET
+
+    def test_package_attribute_is_the_feature_class(self):
+        import features
+        from features.violence_calls import ViolenceCalls
+
+        assert features.ViolenceCalls is ViolenceCalls
+        with pytest.raises(AttributeError):
+            features.NotAFeature
@@ -0,0 +1,58 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from constants import AREA_CRS
+from shapely.geometry import box
+from spatial_graph import SpatialGraph
+
+
+@pytest.fixture
+def grid_geos():
+    """3 x 3 blocks of 1 km squares, numbered row by row, in lon/lat"""
+    return gpd.GeoDataFrame(
+        {"geo_id": 261635001001000.0 + np.arange(9)},
+        geometry=[
+            box(320_000 + 1000 * col, 4_690_000 + 1000 * row, 321_000 + 1000 * col, 4_691_000 + 1000 * row)
+            for row in range(3)
+            for col in range(3)
+        ],
+        crs=AREA_CRS,
+    ).to_crs("epsg:4326")
+
+
+def build(geos, kind="queen", distance=None):
+    return SpatialGraph.build(2010, "block", kind, distance, geos=geos)
+
+
+class TestSpatialGraph:
+    def test_queen_and_rook_neighbors(self, grid_geos):
+        # corners, edges and the center of the 3 x 3 grid
+        assert build(grid_geos, "queen").n_neighbors().tolist() == [3, 5, 3, 5, 8, 5, 3, 5, 3]
+        assert build(grid_geos, "rook").n_neighbors().tolist() == [2, 3, 2, 3, 4, 3, 2, 3, 2]
+
+    def test_distance_band_is_in_ground_meters(self, grid_geos):
+        # neighboring centroids are 1000 m apart, diagonal ones 1414 m
+        assert build(grid_geos, "distance", 990).n_neighbors().sum() == 0
+        assert build(grid_geos, "distance", 1010).n_neighbors().tolist() == [2, 3, 2, 3, 4, 3, 2, 3, 2]
+        assert build(grid_geos, "distance", 1420).n_neighbors().tolist() == [3, 5, 3, 5, 8, 5, 3, 5, 3]
+
+    def test_save_load_round_trip(self, grid_geos, tmp_path):
+        graph = build(grid_geos, "distance", 1010)
+        graph.save(str(tmp_path / "graph.npz"))
+        loaded = SpatialGraph.load(str(tmp_path / "graph.npz"))
+        assert (loaded.adjacency != graph.adjacency).nnz == 0
+        assert (loaded.geo_ids == graph.geo_ids).all()
+        assert (loaded.kind, loaded.distance, loaded.target_geo_grain) == ("distance", 1010, "block")
+        build(grid_geos).save(str(tmp_path / "queen.npz"))
+        assert SpatialGraph.load(str(tmp_path / "queen.npz")).distance is None
+
+    def test_lag(self, grid_geos):
+        graph = build(grid_geos, "rook")
+        x = pd.Series(np.arange(9.0), index=graph.geo_ids, name="x")
+        summed = graph.lag(x, row_standardize=False)
+        assert summed.name == "x_lag"
+        assert np.allclose(summed.to_numpy(), graph.adjacency @ x.to_numpy())
+        mean = graph.lag(x)
+        assert np.allclose(mean.to_numpy(), graph.adjacency @ x.to_numpy() / graph.n_neighbors().to_numpy())
+        assert mean.iloc[4] == pytest.approx((1 + 3 + 5 + 7) / 4)
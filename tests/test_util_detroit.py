@@ -0,0 +1,217 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from features.feature_constructor import Feature
+from features.household_types_ages import HouseholdTypesAges
+from features.violence_calls import ViolenceCalls
+from shapely.geometry import box
+from util_detroit import kml_to_gpd, load_with_prefetch, point_to_geo_id, read_csv_columnar, read_csv_lazy, read_kml
+
+KML = """<?xml version="1.0" encoding="utf-8" ?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+<Schema name="neighborhoods" id="neighborhoods">
+    <SimpleField name="nhood_num" type="int"></SimpleField>
+    <SimpleField name="nhood_name" type="string"></SimpleField>
+</Schema>
+<Folder>
+  <Placemark>
+    <ExtendedData><SchemaData schemaUrl="#neighborhoods">
+        <SimpleData name="nhood_num">1</SimpleData>
+        <SimpleData name="nhood_name">Midtown</SimpleData>
+    </SchemaData></ExtendedData>
+    <Polygon><outerBoundaryIs><LinearRing>
+        <coordinates>-83.1,42.3,0 -83.0,42.3,0 -83.0,42.4,0 -83.1,42.4,0 -83.1,42.3,0</coordinates>
+    </LinearRing></outerBoundaryIs></Polygon>
+  </Placemark>
+  <Placemark>
+    <ExtendedData><SchemaData schemaUrl="#neighborhoods">
+        <SimpleData name="nhood_num">2</SimpleData>
+        <SimpleData name="nhood_name">Corktown</SimpleData>
+    </SchemaData></ExtendedData>
+    <MultiGeometry>
+        <Polygon><outerBoundaryIs><LinearRing><coordinates>-83.2,42.3 -83.1,42.3 -83.1,42.4 -83.2,42.3</coordinates>
+        </LinearRing></outerBoundaryIs></Polygon>
+        <Polygon><outerBoundaryIs><LinearRing><coordinates>-83.3,42.3 -83.2,42.3 -83.2,42.4 -83.3,42.3</coordinates>
+        </LinearRing></outerBoundaryIs></Polygon>
+    </MultiGeometry>
+  </Placemark>
+</Folder>
+</Document>
+</kml>
+"""
+
+
+class TestKmlToGpd:
+    def test_read_kml(self, tmp_path):
+        fn = tmp_path / "neighborhoods.kml"
+        fn.write_text(KML)
+        gdf = read_kml(str(fn))
+        assert gdf.nhood_num.tolist() == [1, 2]
+        assert gdf.nhood_name.tolist() == ["Midtown", "Corktown"]
+        assert gdf.geom_type.tolist() == ["Polygon", "MultiPolygon"]
+        assert gdf.crs.to_epsg() == 4326
+
+    def test_cache(self, tmp_path):
+        fn = tmp_path / "neighborhoods.kml"
+        fn.write_text(KML)
+        gdf = kml_to_gpd(str(fn))
+        assert os.path.isfile(tmp_path / "neighborhoods.parquet")
+        cached = kml_to_gpd(str(tmp_path / "neighborhoods"))
+        assert cached.equals(gdf)
+
+
+class TestReadCsvColumnar:
+    def test_schema_and_filters(self, tmp_path):
+        fn = str(tmp_path / "calls.csv")
+        pd.DataFrame(
+            {
+                "calldescription": ["SHOTS FIRED", "NOISE", "ASSAULT", None],
+                "oid": [1, 2, 3, 4],
+                "priority": ["1", "2", "1", "3"],
+                "unused": [0.0, 1.0, 2.0, 3.0],
+            }
+        ).to_csv(fn, index=False)
+        df = read_csv_columnar(
+            fn,
+            columns=["calldescription", "oid", "priority"],
+            dtypes={"calldescription": str, "oid": int, "priority": str},
+            filters=[("calldescription", "contains", "SHOTS|ASSAULT"), ("priority", "==", "1")],
+        )
+        assert df.columns.tolist() == ["calldescription", "oid", "priority"]
+        assert df.oid.tolist() == [1, 3]
+        assert read_csv_columnar(fn, sample_rows=2).shape == (2, 4)
+
+    def test_empty_fields_match_pandas(self, tmp_path):
+        fn = tmp_path / "permits.csv"
+        fn.write_text('status,number,owner,X\nActive,10,"Smith",1.0\n,,"",2.0\nExpired,12,,\n"",13,Jones,4.0\n')
+        df = read_csv_columnar(str(fn), dtypes={"status": str, "number": float, "owner": str})
+        pd.testing.assert_frame_equal(df, pd.read_csv(fn, dtype={"status": str, "number": float, "owner": str}))
+        assert df.status.isna().tolist() == [False, True, False, True]
+
+    def test_lazy_reader_matches(self, tmp_path):
+        pytest.importorskip("polars")
+        fn = tmp_path / "licenses.csv"
+        fn.write_text("status,number,X\nActive,10,1.0\nExpired,11,2.0\n,,3.0\nActive,13,4.0\n")
+        fn = str(fn)
+        kwargs = dict(
+            columns=["status", "number"],
+            dtypes={"status": str, "number": int, "X": float},
+            sample_rows=3,
+            filters=[("status", "notnull"), ("status", "in", ["Active", "Expired"])],
+        )
+        lazy, eager = read_csv_lazy(fn, **kwargs), read_csv_columnar(fn, **kwargs)
+        assert lazy.columns.tolist() == eager.columns.tolist() == ["status", "number"]
+        assert lazy.status.tolist() == eager.status.tolist() == ["Active", "Expired"]
+        assert lazy.number.tolist() == eager.number.tolist() == [10, 11]
+
+
+class TestPointToGeoId:
+    def test_parallel_matches_serial(self, tmp_path):
+        # a 4 x 4 grid of blocks plus one overlapping the first, so some points are in two blocks
+        cells = [box(x, y, x + 1, y + 1) for x in range(4) for y in range(4)] + [box(0, 0, 0.5, 0.5)]
+        blocks = gpd.GeoDataFrame(
+            {"geo_id": 261635001001000.0 + np.array(list(range(1, 17)) + [0])}, geometry=cells, crs="epsg:4326"
+        )
+        rng = np.random.default_rng(0)
+        xy = rng.uniform(-0.5, 4.5, (2000, 2))
+        # points without coordinates sort last, into the same strip as valid points
+        missing = rng.choice(len(xy), 20, replace=False)
+        xy[missing] = np.nan
+        points = gpd.GeoDataFrame(
+            {"oid": np.arange(len(xy))}, geometry=gpd.points_from_xy(xy[:, 0], xy[:, 1]), crs="epsg:4326"
+        ).set_index(np.arange(len(xy))[::-1] * 2)
+        serial = point_to_geo_id(points, blocks=blocks)
+        parallel = point_to_geo_id(points, blocks=blocks, n_jobs=2)
+        pd.testing.assert_series_equal(serial, parallel, check_dtype=False)
+        assert serial.isna().sum() > len(missing)
+        assert serial.iloc[missing].isna().all()
+        assert (serial[(xy[:, 0] < 0.5) & (xy[:, 1] < 0.5) & (xy.min(axis=1) > 0)] == 261635001001000.0).all()
+
+    @pytest.mark.parametrize("kwargs", [{}, {"n_jobs": 2}, {"use_raster": True}])
+    def test_overlapping_blocks_get_the_smallest_geo_id(self, kwargs, tmp_path, monkeypatch):
+        # the larger block comes first, so sjoin's first match would be the larger geo_id
+        blocks = gpd.GeoDataFrame(
+            {"geo_id": [261635001001002.0, 261635001001001.0]},
+            geometry=[box(-83.01, 42.3, -83.0, 42.31), box(-83.008, 42.302, -83.004, 42.306)],
+            crs="epsg:4326",
+        )
+        points = gpd.GeoDataFrame(
+            {"oid": [1, 2, 3]}, geometry=gpd.points_from_xy([-83.006, -83.002, -82.9], [42.304] * 3), crs="epsg:4326"
+        )
+        if kwargs.get("use_raster"):
+            monkeypatch.setattr("detroit_geos.get_detroit_census_geos", lambda *args, **kwargs: blocks)
+        else:
+            kwargs = dict(kwargs, blocks=blocks)
+        geo_ids = point_to_geo_id(points, 2010, cache_path=str(tmp_path), **kwargs)
+        assert geo_ids.tolist()[:2] == [261635001001001.0, 261635001001002.0]
+        assert np.isnan(geo_ids.iloc[2])
+
+
+class SampledEvents(Feature):
+    """Not prefetchable, but takes sample_rows"""
+
+    def load_data(self, sample_rows=None):
+        self.data = pd.read_csv(self.data_path + "calls_for_service_from_jimmy.csv", nrows=sample_rows)
+
+
+class TestLoadWithPrefetch:
+    @pytest.fixture
+    def data_path(self, tmp_path, monkeypatch):
+        pd.DataFrame(
+            {
+                "calldescription": ["SHOTS FIRED", "NOISE", "ASSAULT", "SHOTS FIRED"],
+                "call_timestamp": [f"2020-01-0{day} 10:00:00" for day in range(1, 5)],
+                "block_id": [261635001001000.0, 261635001001000.0, 261635001002000.0, 261635001002000.0],
+                "category": "a",
+                "officerinitiated": "No",
+                "priority": "1",
+                "oid": [1, 2, 3, 4],
+                "longitude": -83.0,
+                "latitude": 42.3,
+            }
+        ).to_csv(tmp_path / "calls_for_service_from_jimmy.csv", index=False)
+        rows = [["GEO_ID", "NAME", "P022001", "P022002"], ["id", "Geographic Area Name", "Total", " !!Total!!A"]]
+        rows += [[f"1000000US26163500100100{i}", f"Block {i}", f"{2 * i}(r1234)", str(i)] for i in range(3)]
+        pd.DataFrame(rows).to_csv(
+            tmp_path / "DECENNIALSF12010.P22_data_with_overlays_2022-02-10T193949.csv", header=False, index=False
+        )
+        monkeypatch.setattr(HouseholdTypesAges, "remove_geos_outside_detroit", lambda self, df: df)
+        return str(tmp_path)
+
+    @staticmethod
+    def features(data_path):
+        features = [ViolenceCalls(data_path=data_path, verbose=False), HouseholdTypesAges(data_path=data_path)]
+        for ftr in features:
+            ftr.index = pd.Index([261635001001.0, 261635001002.0], name="block group")
+        return features
+
+    @pytest.mark.parametrize("sample_rows", [None, 3])
+    def test_matches_load_data(self, data_path, sample_rows):
+        prefetched = load_with_prefetch(self.features(data_path), max_workers=2, sample_rows=sample_rows)
+        calls, households = self.features(data_path)
+        calls.load_data(sample_rows=sample_rows)
+        # household types has no sample_rows, it is always read in full
+        households.load_data()
+        for ftr, expected in zip(prefetched, [calls, households]):
+            pd.testing.assert_frame_equal(
+                ftr.construct_feature("block group"), expected.construct_feature("block group")
+            )
+        assert prefetched[0].construct_feature("block group").violence_calls.tolist() == (
+            [1, 2] if sample_rows is None else [1, 1]
+        )
+
+        sampled = SampledEvents(meta={"min_geo_grain": "block"}, data_path=data_path)
+        load_with_prefetch([sampled], sample_rows=sample_rows)
+        assert len(sampled.data) == (4 if sample_rows is None else sample_rows)
+
+    def test_read_errors_surface(self, data_path, monkeypatch):
+        def read_raw_data(self, sample_rows=None, call_whitelist_strings="close_proxy"):
+            raise OSError("truncated file")
+
+        monkeypatch.setattr(ViolenceCalls, "read_raw_data", read_raw_data)
+        with pytest.raises(OSError, match="truncated file"):
+            load_with_prefetch(self.features(data_path))